@@ -25,4 +25,28 @@ FILE_CONFIG = {
     'raw_data_dir': str(RAW_DATA_DIR),  # 原始数据目录
     'processed_data_dir': str(PROCESSED_DATA_DIR),  # 处理后数据目录
     'output_data_dir': str(OUTPUT_DATA_DIR),  # 输出数据目录
-} 
\ No newline at end of file
+} 
+
+# 批量导入配置（python -m tools.docx_tools.ingest）
+# 每个文件在独立的工作进程中转换，超时的文件所在进程被终止；
+# 清单文件记录已导入文件的内容哈希，内容未变的文件再次导入时跳过
+INGEST_CONFIG = {
+    'workers': None,                           # 工作进程数，None 时为 CPU 核数
+    'timeout': 600,                            # 单个文件的转换超时（秒）
+    'manifest_name': '.ingest_manifest.json',  # 清单文件名，位于 pkl 输出目录
+}
+
+# 主观用词扫描配置（tools/hard_criteria/scan_colloquial_word.py）
+# words 为需要报告的主观用词，同一位置重叠时取最长的词；ignore 中的词命中时不报告，
+# 用于排除"我国"等包含主观用词但属于规范书面语的词
+COLLOQUIAL_WORD_CONFIG = {
+    'words': ['我们', '我', '咱们', '本人'],
+    'ignore': ['我国', '我校', '我院', '我省', '我市', '自我', '敌我'],
+}
+
+# 论文容器配置（tools/docx_tools/paper_store.py）
+# 导入结果保存为 .paper 文件（SQLite），读取时不执行 pickle 代码；
+# 旧的 pkl 文件需先用 python -m tools.docx_tools.paper_store 转换，或将 allow_legacy_pickle 设为 True
+PAPER_STORE_CONFIG = {
+    'allow_legacy_pickle': False,   # 是否允许直接读取旧的 pkl 文件（只对可信的文件开启）
+}
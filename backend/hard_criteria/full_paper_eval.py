@@ -4,39 +4,42 @@
 评估论文所有章节，并基于章节评估结果进行整体评估
 
 用法:
-    python full_paper_eval.py <输入文件路径> [--model MODEL_NAME] [--output OUTPUT_PATH]
+    python full_paper_eval.py <输入文件或目录路径> [--model MODEL_NAME] [--output OUTPUT_PATH]
     
 示例:
     python full_paper_eval.py data/raw/docx/paper.docx --model deepseek-chat
-    python full_paper_eval.py data/processed/docx/paper.pkl --output results/paper_eval.json
+    python full_paper_eval.py data/processed/docx/paper.paper --output results/paper_eval.json
+    python full_paper_eval.py data/processed/docx/paper.paper --no-cache
+    python full_paper_eval.py data/processed/docx/paper.paper --resume
+    python full_paper_eval.py data/processed/docx --max-workers 16
 """
 
 import os
 import sys
 import json
 import argparse
+import copy
 import logging
 import time
 import re
-import pickle
-import shutil
-import subprocess
-from typing import Dict, List, Any, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from pathlib import Path
 
 # 添加项目根目录到路径
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
-# 设置工具目录的相对路径
-TOOLS_DIR = os.path.join(project_root, "backend", "hard_metrics", "tools", "docx_tools")
-
 # 导入项目模块
 try:
     from models.deepseek import request_deepseek
     from models.gemini import request_gemini
     from models.qwen import request_qwen
+    from models.async_engine import infer_many_sync
+    from models.response_cache import set_cache_bypass
+    from tools.dag_scheduler import DagScheduler
+    from tools.docx_tools.paper_store import PAPER_EXT, PaperReader, is_paper_file, read_paper
+    from tools.eval_journal import EvalJournal, journal_path_for
+    from tools.prompt_budget import content_budget, split_content, token_counter
     from prompts.chapter_prompt import p_chapter_assessment
     from prompts.overall_prompt import p_overall_assessment
     from tools.logger import get_logger
@@ -48,6 +51,9 @@ except ImportError as e:
 # 设置日志记录器
 logger = get_logger(__name__)
 
+# 可直接评估的输入文件格式，.pkl 为旧格式
+INPUT_EXTS = ('.docx', PAPER_EXT, '.pkl')
+
 def extract_json_from_response(response: str) -> Optional[Dict[str, Any]]:
     """
     从模型响应中提取JSON数据
@@ -116,173 +122,86 @@ def check_dependencies() -> bool:
     for dir_path in dirs:
         os.makedirs(dir_path, exist_ok=True)
     
-    # 检查docx转换工具是否存在
-    docx2md_path = os.path.join(TOOLS_DIR, "docx2md.py")
-    md2pkl_path = os.path.join(TOOLS_DIR, "md2pkl.py")
-    
-    if not (os.path.exists(docx2md_path) and os.path.exists(md2pkl_path)):
-        logger.error(f"缺少必要的文档处理工具。请确保以下文件存在:")
-        logger.error(f"- {docx2md_path}")
-        logger.error(f"- {md2pkl_path}")
-        return False
+    # 检查docx转换依赖是否可用，仅评估.paper文件时不需要
+    try:
+        import docx  # noqa: F401
+    except ImportError:
+        logger.warning("未安装 python-docx，无法处理.docx输入，请运行: pip install python-docx")
         
     return True
 
-def process_docx_file(docx_path: str) -> Optional[str]:
+def process_docx_file(docx_path: str, document: Optional[Any] = None) -> Optional[str]:
     """
-    处理docx文件，将其转换为pkl格式
+    处理docx文件，将其转换为论文容器（.paper）
+    
+    转换在当前进程内完成，可被多个线程同时调用。
     
     Args:
         docx_path: docx文件路径
+        document: 已解析的文档IR（tools.docx_tools.docx_ir.DocumentIR），提供时不再重新解析docx
     
     Returns:
-        Optional[str]: 生成的pkl文件路径，如果处理失败则返回None
+        Optional[str]: 生成的.paper文件路径，如果处理失败则返回None
     """
     logger.info(f"处理文档文件: {docx_path}")
     
-    if not os.path.exists(docx_path):
-        logger.error(f"未找到文件: {docx_path}")
-        return None
-    
-    if not docx_path.lower().endswith('.docx'):
-        logger.error(f"文件 {docx_path} 不是.docx格式")
-        return None
-        
-    # 确保所有必要的目录都存在
     raw_docx_dir = os.path.join(project_root, "data", "raw", "docx")
     processed_dir = os.path.join(project_root, "data", "processed", "docx")
     
-    # 创建必要的目录
-    os.makedirs(raw_docx_dir, exist_ok=True)
-    os.makedirs(processed_dir, exist_ok=True)
-    
-    # 如果不在目标位置，将 docx 文件复制到 data/raw/docx
-    filename = os.path.basename(docx_path)
-    dest_docx_path = os.path.join(raw_docx_dir, filename)
-    
-    if docx_path != dest_docx_path:
-        shutil.copy(docx_path, dest_docx_path)
-        logger.info(f"已复制 {docx_path} 到 {dest_docx_path}")
-    
-    # 将 docx 转换为 md
-    md_filename = os.path.splitext(filename)[0] + ".md"
-    md_path = os.path.join(raw_docx_dir, md_filename)
-    image_dir = os.path.join(raw_docx_dir, "images")
-    
-    # 确保图片目录存在
-    os.makedirs(image_dir, exist_ok=True)
-    
-    # 使用 docx2md.py 进行转换
-    docx2md_path = os.path.join(TOOLS_DIR, "docx2md.py")
-    cmd = f"{sys.executable} \"{docx2md_path}\" \"{dest_docx_path}\" -o \"{md_path}\" -i \"{image_dir}\""
-    logger.info(f"正在将 docx 转换为 md...")
-    
-    try:
-        subprocess.run(cmd, shell=True, check=True)
-        logger.info(f"已创建 Markdown 文件: {md_path}")
-    except subprocess.SubprocessError as e:
-        logger.error(f"将 docx 转换为 md 失败: {e}")
-        return None
-    
-    # 使用项目的工具将 md 转换为 pkl
     try:
-        # 创建一个直接调用函数的临时脚本
-        temp_script = os.path.join(project_root, "temp_md2pkl.py")
+        from tools.docx_tools.ingest import ingest_docx
         
-        # 获取绝对路径以避免路径问题
-        abs_md_path = os.path.abspath(md_path)
-        pkl_filename = f"{os.path.splitext(filename)[0]}.pkl"
-        abs_pkl_path = os.path.abspath(os.path.join(processed_dir, pkl_filename))
-        
-        # 修复字符串字面量的路径格式（将反斜杠替换为双反斜杠）
-        abs_md_path_str = abs_md_path.replace("\\", "\\\\")
-        abs_pkl_path_str = abs_pkl_path.replace("\\", "\\\\")
-        
-        # 创建一个导入原始模块并使用我们路径调用其函数的简单脚本
-        with open(temp_script, "w", encoding="utf-8") as f:
-            f.write(f"""import sys
-sys.path.append(r'{TOOLS_DIR}')
-from md2pkl import read_md, extract_abstracts, extract_reference, extract_chapters
-import pickle
-
-def main():
-    # 使用带有转义反斜杠的显式字符串
-    md = read_md(r'{abs_md_path}')
-    zh_abs, en_abs = extract_abstracts(md)
-    ref = extract_reference(md)
-    chapters = extract_chapters(md)
-    data = {{
-        'zh_abs': zh_abs,
-        'en_abs': en_abs,
-        'ref': ref,
-        'chapters': chapters
-    }}
-    with open(r'{abs_pkl_path}', 'wb') as f:
-        pickle.dump(data, f)
-
-if __name__ == '__main__':
-    main()
-""")
-        
-        # 运行临时脚本
-        subprocess.run([sys.executable, temp_script], check=True)
-        logger.info(f"已将 md 转换为 pkl 并保存到 {abs_pkl_path}")
-        
-        # 清理
-        os.remove(temp_script)
+        logger.info(f"正在将 docx 转换为 md...")
+        if document is not None:
+            name = os.path.splitext(os.path.basename(docx_path))[0]
+            paper = ingest_docx(document, name=name, image_root=os.path.join(raw_docx_dir, "images"))
+        else:
+            paper = ingest_docx(docx_path, image_root=os.path.join(raw_docx_dir, "images"))
         
-        return abs_pkl_path
+        # 图像保存在按内容寻址的共享存储中，同名上传不会相互覆盖
+        md_path = paper.save_markdown(os.path.join(raw_docx_dir, f"{paper.name}.md"))
+        logger.info(f"已创建 Markdown 文件: {md_path}")
         
+        paper_path = paper.save_paper(os.path.join(processed_dir, f"{paper.name}{PAPER_EXT}"))
+        logger.info(f"已将 md 转换为 .paper 并保存到 {paper_path}")
+        return paper_path
+    except (FileNotFoundError, ValueError) as e:
+        logger.error(str(e))
+        return None
     except Exception as e:
-        logger.error(f"将 md 转换为 pkl 失败: {e}")
+        logger.error(f"将 docx 转换为 .paper 失败: {e}")
         return None
 
-def load_chapters(pkl_file: str) -> List[Dict[str, Any]]:
+def load_chapters(paper_file: str) -> List[Dict[str, Any]]:
     """
-    从PKL文件中加载所有章节信息
+    从论文容器（.paper）中加载所有章节信息
+    
+    只读取章节名与正文，不读取图像列表；旧的 .pkl 文件按 PAPER_STORE_CONFIG 决定是否读取。
     
     Args:
-        pkl_file: PKL文件路径
+        paper_file: .paper 文件路径
         
     Returns:
         List[Dict[str, Any]]: 章节信息列表
     """
     try:
-        logger.info(f"正在从PKL文件加载章节内容: {pkl_file}")
-        with open(pkl_file, 'rb') as f:
-            data = pickle.load(f)
+        logger.info(f"正在加载章节内容: {paper_file}")
+        if is_paper_file(paper_file):
+            with PaperReader(paper_file) as paper:
+                raw_chapters = list(paper.iter_chapters(with_images=False))
+        else:
+            raw_chapters = read_paper(paper_file)['chapters']
             
-        if 'chapters' not in data or not isinstance(data['chapters'], list) or not data['chapters']:
-            raise ValueError("PKL文件中没有找到有效的章节数据")
+        if not raw_chapters:
+            raise ValueError("文件中没有找到有效的章节数据")
             
         chapters = []
-        for i, chapter in enumerate(data['chapters'], 1):
-            title = None
-            content = None
-            
-            if isinstance(chapter, dict):
-                # 获取章节标题
-                if 'chapter_name' in chapter and chapter['chapter_name']:
-                    title = chapter['chapter_name']
-                elif 'title' in chapter and chapter['title']:
-                    title = chapter['title']
-                elif 'heading' in chapter and chapter['heading']:
-                    title = chapter['heading']
-                
-                # 获取章节内容
-                if 'content' in chapter and chapter['content']:
-                    content = chapter['content']
-                elif 'text_content' in chapter and chapter['text_content']:
-                    content = chapter['text_content']
-            elif isinstance(chapter, str):
-                content = chapter
-                title = f"章节 {i}"
-                
-            if content:
+        for i, chapter in enumerate(raw_chapters, 1):
+            if chapter['content']:
                 chapters.append({
                     "index": i,
-                    "title": title or f"章节 {i}",
-                    "content": content
+                    "title": chapter['chapter_name'] or f"章节 {i}",
+                    "content": chapter['content']
                 })
             
         logger.info(f"已加载 {len(chapters)} 个章节")
@@ -307,7 +226,7 @@ def request_model(prompt: str, model_name: str) -> Dict[str, Any]:
 
     try:
         if model_name.startswith("deepseek"):
-            response = request_deepseek(prompt, model_name)
+            response = request_deepseek(prompt, model=model_name)
             return {'input': prompt, 'output': response}
         elif model_name == "gemini":
             response = request_gemini(prompt)
@@ -336,10 +255,60 @@ def generate_chapter_prompt(chapter: Dict[str, Any]) -> str:
     content_with_title = f"# {title}\n\n{content}"
     return p_chapter_assessment.replace("{content}", content_with_title)
 
+def generate_chapter_prompts(chapter: Dict[str, Any], model_name: str) -> List[str]:
+    """
+    生成章节评估提示词，超出模型 max_length 的章节在 ## / ### 标题处切分为多个提示词
+    
+    Args:
+        chapter: 章节信息
+        model_name: 使用的模型
+        
+    Returns:
+        List[str]: 提示词列表，章节未超出预算时只有一个
+    """
+    title = chapter["title"]
+    content = chapter["content"]
+    counter = token_counter(model_name)
+    budget = content_budget(p_chapter_assessment, model_name, counter)
+    if counter(f"# {title}\n\n{content}") <= budget:
+        return [generate_chapter_prompt(chapter)]
+    
+    # 为每段的标题与“第i/n部分”标注预留预算
+    parts = split_content(content, budget - counter(f"# {title}（第00/00部分）\n\n"), counter)
+    logger.info(f"章节 {chapter['index']} 超出模型上下文预算，切分为 {len(parts)} 段评估")
+    return [
+        p_chapter_assessment.replace("{content}", f"# {title}（第{i}/{len(parts)}部分）\n\n{part}")
+        for i, part in enumerate(parts, 1)
+    ]
+
+def merge_chapter_evaluations(eval_parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并同一章节各段的评估结果
+    
+    Args:
+        eval_parts: 各段提取出的评估数据
+        
+    Returns:
+        Dict[str, Any]: 合并后的评估数据，列表字段按出现顺序去重
+    """
+    merged = {
+        "summary": "\n\n".join(part.get('summary', '') for part in eval_parts if part.get('summary')),
+    }
+    for key in ('strengths', 'weaknesses', 'suggestions'):
+        items = []
+        for part in eval_parts:
+            for item in part.get(key, []):
+                if item not in items:
+                    items.append(item)
+        merged[key] = items
+    return merged
+
 def process_chapter(chapter: Dict[str, Any], model_name: str) -> Dict[str, Any]:
     """
     处理单个章节的评估
     
+    超长章节会切分为多个子请求并发评估，再合并各段结果。
+    
     Args:
         chapter: 章节信息
         model_name: 使用的模型
@@ -353,30 +322,38 @@ def process_chapter(chapter: Dict[str, Any], model_name: str) -> Dict[str, Any]:
     logger.info(f"正在评估章节 {chapter_idx}: {chapter_title}")
     
     # 生成提示词
-    prompt = generate_chapter_prompt(chapter)
+    prompts = generate_chapter_prompts(chapter, model_name)
     
     # 调用模型
-    result = request_model(prompt, model_name)
-    
-    # 提取评估结果
-    if 'error' in result:
-        logger.error(f"章节 {chapter_idx} 评估失败: {result['error']}")
-        return {
-            "chapter": chapter_title,
-            "index": chapter_idx,
-            "error": result['error']
-        }
-    
-    # 提取JSON评估结果
-    eval_data = extract_json_from_response(result.get('output', '{}'))
-    
-    if not eval_data:
-        logger.warning(f"章节 {chapter_idx} 无法提取有效的评估结果")
-        return {
-            "chapter": chapter_title,
-            "index": chapter_idx,
-            "error": "无法提取有效的评估结果"
-        }
+    if len(prompts) == 1:
+        results = [request_model(prompts[0], model_name)]
+    else:
+        results = infer_many_sync(prompts, model_name, max_concurrency=len(prompts))
+    
+    eval_parts = []
+    for result in results:
+        # 提取评估结果
+        if 'error' in result:
+            logger.error(f"章节 {chapter_idx} 评估失败: {result['error']}")
+            return {
+                "chapter": chapter_title,
+                "index": chapter_idx,
+                "error": result['error']
+            }
+        
+        # 提取JSON评估结果
+        eval_data = extract_json_from_response(result.get('output', '{}'))
+        
+        if not eval_data:
+            logger.warning(f"章节 {chapter_idx} 无法提取有效的评估结果")
+            return {
+                "chapter": chapter_title,
+                "index": chapter_idx,
+                "error": "无法提取有效的评估结果"
+            }
+        eval_parts.append(eval_data)
+    
+    eval_data = eval_parts[0] if len(eval_parts) == 1 else merge_chapter_evaluations(eval_parts)
     
     # 构造标准格式结果
     evaluation = {
@@ -526,6 +503,22 @@ def generate_score_prompt(all_evaluations: List[Dict[str, Any]]) -> str:
 """
     return prompt
 
+# 评分失败时使用的默认评分
+DEFAULT_PAPER_SCORES = [
+    {'index': 1, 'module': '摘要', 'full_score': 5, 'score': 3},
+    {'index': 2, 'module': '选题背景和意义', 'full_score': 5, 'score': 3},
+    {'index': 3, 'module': '选题的理论意义与应用价值', 'full_score': 5, 'score': 3},
+    {'index': 4, 'module': '相关工作的国内外现状综述', 'full_score': 5, 'score': 3},
+    {'index': 5, 'module': '主要工作和贡献总结', 'full_score': 5, 'score': 3},
+    {'index': 6, 'module': '相关工作或相关技术的介绍', 'full_score': 5, 'score': 3},
+    {'index': 7, 'module': '论文的创新性', 'full_score': 25, 'score': 15},
+    {'index': 8, 'module': '实验完成度', 'full_score': 20, 'score': 12},
+    {'index': 9, 'module': '总结和展望', 'full_score': 5, 'score': 3},
+    {'index': 10, 'module': '工作量', 'full_score': 5, 'score': 3},
+    {'index': 11, 'module': '论文撰写质量', 'full_score': 10, 'score': 6},
+    {'index': 12, 'module': '参考文献', 'full_score': 5, 'score': 3},
+]
+
 def score_paper(all_evaluations: List[Dict[str, Any]], model_name: str) -> List[Dict[str, Any]]:
     """
     对论文进行打分
@@ -549,40 +542,14 @@ def score_paper(all_evaluations: List[Dict[str, Any]], model_name: str) -> List[
     if 'error' in result:
         logger.error(f"论文评分失败: {result['error']}")
         # 返回默认评分
-        return [
-            {'index': 1, 'module': '摘要', 'full_score': 5, 'score': 3},
-            {'index': 2, 'module': '选题背景和意义', 'full_score': 5, 'score': 3},
-            {'index': 3, 'module': '选题的理论意义与应用价值', 'full_score': 5, 'score': 3},
-            {'index': 4, 'module': '相关工作的国内外现状综述', 'full_score': 5, 'score': 3},
-            {'index': 5, 'module': '主要工作和贡献总结', 'full_score': 5, 'score': 3},
-            {'index': 6, 'module': '相关工作或相关技术的介绍', 'full_score': 5, 'score': 3},
-            {'index': 7, 'module': '论文的创新性', 'full_score': 25, 'score': 15},
-            {'index': 8, 'module': '实验完成度', 'full_score': 20, 'score': 12},
-            {'index': 9, 'module': '总结和展望', 'full_score': 5, 'score': 3},
-            {'index': 10, 'module': '工作量', 'full_score': 5, 'score': 3},
-            {'index': 11, 'module': '论文撰写质量', 'full_score': 10, 'score': 6},
-            {'index': 12, 'module': '参考文献', 'full_score': 5, 'score': 3},
-        ]
+        return copy.deepcopy(DEFAULT_PAPER_SCORES)
     
     # 提取JSON评分结果
     score_data = extract_json_from_response(result.get('output', '{}'))
     
     if not score_data or not isinstance(score_data, list):
         logger.warning("无法提取有效的评分结果")
-        return [
-            {'index': 1, 'module': '摘要', 'full_score': 5, 'score': 3},
-            {'index': 2, 'module': '选题背景和意义', 'full_score': 5, 'score': 3},
-            {'index': 3, 'module': '选题的理论意义与应用价值', 'full_score': 5, 'score': 3},
-            {'index': 4, 'module': '相关工作的国内外现状综述', 'full_score': 5, 'score': 3},
-            {'index': 5, 'module': '主要工作和贡献总结', 'full_score': 5, 'score': 3},
-            {'index': 6, 'module': '相关工作或相关技术的介绍', 'full_score': 5, 'score': 3},
-            {'index': 7, 'module': '论文的创新性', 'full_score': 25, 'score': 15},
-            {'index': 8, 'module': '实验完成度', 'full_score': 20, 'score': 12},
-            {'index': 9, 'module': '总结和展望', 'full_score': 5, 'score': 3},
-            {'index': 10, 'module': '工作量', 'full_score': 5, 'score': 3},
-            {'index': 11, 'module': '论文撰写质量', 'full_score': 10, 'score': 6},
-            {'index': 12, 'module': '参考文献', 'full_score': 5, 'score': 3},
-        ]
+        return copy.deepcopy(DEFAULT_PAPER_SCORES)
     
     # 验证和修正评分
     for item in score_data:
@@ -622,16 +589,196 @@ def save_scores(scores: List[Dict[str, Any]], output_path: str) -> str:
     
     return score_path
 
+def _run_unit(journal: Optional[EvalJournal], stage: str, key: Any, fingerprint: str,
+              func: Callable[[], Any], done: Callable[[Any], bool] = lambda result: True) -> Any:
+    """
+    执行一个评估单元，断点日志中已有相同输入的结果时直接复用
+
+    Args:
+        journal: 断点日志，为 None 时不记录也不恢复
+        stage: 阶段名称
+        key: 单元在阶段内的标识
+        fingerprint: 单元输入的指纹
+        func: 实际执行评估的无参函数
+        done: 判断结果是否可记为已完成
+
+    Returns:
+        Any: 评估结果
+    """
+    if journal:
+        result = journal.get(stage, key, fingerprint)
+        if result is not None:
+            logger.info(f"{stage} {key} 已在断点日志中完成，跳过")
+            return result
+    result = func()
+    if journal and done(result):
+        journal.record(stage, key, fingerprint, result)
+    return result
+
+def schedule_paper(scheduler: DagScheduler, paper_id: str, chapters: List[Dict[str, Any]],
+                   model_name: str, journal: Optional[EvalJournal] = None,
+                   with_score: bool = True) -> str:
+    """
+    将一篇论文的评估组织为 章节评估 -> 整体评估 -> 评分 的依赖图并加入调度器
+
+    整体评估与评分的优先级高于章节评估，先就绪的论文先完成，
+    其余线程继续处理其他论文的章节。
+
+    Args:
+        scheduler: 调度器
+        paper_id: 论文标识，用作任务名前缀
+        chapters: 章节信息列表
+        model_name: 使用的模型
+        journal: 断点日志，为 None 时不记录也不恢复
+        with_score: 是否进行评分环节
+
+    Returns:
+        str: 最后一个任务的名称，其结果为 (章节评估结果, 整体评估结果, 评分结果)
+    """
+    def chapter_task(chapter: Dict[str, Any]) -> Dict[str, Any]:
+        fingerprint = EvalJournal.fingerprint(model_name, chapter['title'], chapter['content'])
+        try:
+            evaluation = _run_unit(journal, "chapter", chapter['index'], fingerprint,
+                                   lambda: process_chapter(chapter, model_name))
+        except Exception as e:
+            logger.error(f"章节 {chapter['index']} 处理失败: {e}")
+            return {"chapter": chapter['title'], "index": chapter['index'], "error": str(e)}
+        logger.info(f"[{paper_id}] 章节 {chapter['index']} 评估完成")
+        return evaluation
+
+    def overall_task(*chapter_evaluations: Dict[str, Any]):
+        # 按章节序号排序
+        chapter_evaluations = sorted(chapter_evaluations, key=lambda x: x.get('index', 0))
+        fingerprint = EvalJournal.fingerprint(model_name, chapter_evaluations)
+        overall_evaluation = _run_unit(journal, "overall", 0, fingerprint,
+                                       lambda: evaluate_overall(chapter_evaluations, model_name))
+        return chapter_evaluations, overall_evaluation, None
+
+    def score_task(evaluated):
+        chapter_evaluations, overall_evaluation, _ = evaluated
+        all_evaluations = [overall_evaluation] + chapter_evaluations
+        fingerprint = EvalJournal.fingerprint(model_name, all_evaluations)
+        # 默认评分说明评分请求失败，不记为已完成
+        paper_scores = _run_unit(journal, "score", 0, fingerprint,
+                                 lambda: score_paper(all_evaluations, model_name),
+                                 done=lambda scores: scores != DEFAULT_PAPER_SCORES)
+        return chapter_evaluations, overall_evaluation, paper_scores
+
+    chapter_nodes = [
+        scheduler.add(f"{paper_id}/chapter/{chapter['index']}", chapter_task, chapter)
+        for chapter in chapters
+    ]
+    final_node = scheduler.add(f"{paper_id}/overall", overall_task, deps=chapter_nodes, priority=1)
+    if with_score:
+        final_node = scheduler.add(f"{paper_id}/score", score_task, deps=[final_node], priority=2)
+    return final_node
+
+def evaluate_papers(papers: Dict[str, Tuple[List[Dict[str, Any]], Optional[EvalJournal]]],
+                    model_name: str, max_workers: int = 1,
+                    with_score: bool = True,
+                    on_done: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    批量评估多篇论文，所有论文的评估单元共用一个全局工作队列
+
+    Args:
+        papers: 论文标识 -> (章节信息列表, 断点日志)
+        model_name: 使用的模型
+        max_workers: 同时执行的评估单元数
+        with_score: 是否进行评分环节
+        on_done: 评估单元结束时的回调，参数为 (单元名称, 结果)，
+            单元名称形如 "{论文标识}/chapter/{章节序号}"、"{论文标识}/overall"、"{论文标识}/score"
+
+    Returns:
+        Dict[str, Any]: 论文标识 -> (章节评估结果, 整体评估结果, 评分结果)，
+        评估出错的论文对应抛出的异常
+    """
+    scheduler = DagScheduler(max_workers=max_workers)
+    final_nodes = {
+        paper_id: schedule_paper(scheduler, paper_id, chapters, model_name, journal, with_score)
+        for paper_id, (chapters, journal) in papers.items()
+    }
+    logger.info(f"开始评估 {len(papers)} 篇论文, 并行度: {max_workers}")
+    results = scheduler.run(on_done)
+    return {paper_id: results[node] for paper_id, node in final_nodes.items()}
+
+def evaluate_paper(chapters: List[Dict[str, Any]], model_name: str,
+                   journal: Optional[EvalJournal] = None,
+                   max_workers: int = 1,
+                   with_score: bool = True,
+                   progress_callback: Optional[Callable[[int, int, str], None]] = None,
+                   chapter_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+    """
+    依次完成章节评估、整体评估与评分，每个阶段完成后写入断点日志
+
+    Args:
+        chapters: 章节信息列表
+        model_name: 使用的模型
+        journal: 断点日志，为 None 时不记录也不恢复
+        max_workers: 最大并行评估的章节数
+        with_score: 是否进行评分环节
+        progress_callback: 每个评估单元结束时的回调，参数为 (已完成单元数, 单元总数, 描述)，
+            章节按实际完成顺序回调
+        chapter_callback: 每个章节评估完成时的回调，参数为该章节的评估结果，可用于逐章展示结果
+
+    Returns:
+        Tuple: (章节评估结果, 整体评估结果, 评分结果)，不评分时评分结果为 None
+    """
+    on_done = None
+    if progress_callback or chapter_callback:
+        titles = {f"paper/chapter/{chapter['index']}": chapter['title'] for chapter in chapters}
+        total = len(chapters) + (2 if with_score else 1)
+        completed = 0
+
+        def on_done(name: str, result: Any) -> None:
+            nonlocal completed
+            completed += 1
+            if name in titles:
+                description = f"章节 {titles[name]} 评估完成"
+                if chapter_callback and isinstance(result, dict):
+                    chapter_callback(result)
+            elif name == "paper/overall":
+                description = "整体评估完成"
+            else:
+                description = "论文评分完成"
+            if progress_callback:
+                progress_callback(completed, total, description)
+
+    logger.info(f"开始评估 {len(chapters)} 个章节, 并行度: {max_workers}")
+    result = evaluate_papers({"paper": (chapters, journal)}, model_name, max_workers, with_score, on_done)["paper"]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def collect_input_files(input_path: str) -> List[str]:
+    """
+    收集待评估的文件，目录输入时返回其中所有 .docx、.paper 与旧的 .pkl 文件
+
+    Args:
+        input_path: 文件或目录路径
+
+    Returns:
+        List[str]: 按文件名排序的文件路径列表
+    """
+    if os.path.isdir(input_path):
+        return sorted(
+            os.path.join(input_path, name) for name in os.listdir(input_path)
+            if name.lower().endswith(INPUT_EXTS) and not name.startswith('~$')
+        )
+    return [input_path]
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="论文全文评估工具")
-    parser.add_argument("input_path", help="输入文件路径，支持.docx或.pkl格式")
+    parser.add_argument("input_path", help="输入文件路径，支持.docx或.paper格式；传入目录时批量评估其中所有文件")
     parser.add_argument("--model", "-m", default="deepseek-chat", help="评估使用的模型名称 (deepseek-chat, gemini, qwen)")
-    parser.add_argument("--output", "-o", help="输出文件路径 (.json)")
-    parser.add_argument("--max-workers", "-w", type=int, default=1, help="最大并行评估的章节数")
+    parser.add_argument("--output", "-o", help="输出文件路径 (.json)，批量评估时为输出目录")
+    parser.add_argument("--max-workers", "-w", type=int, default=1, help="同时进行的评估请求数（批量评估时所有论文共享）")
     parser.add_argument("--debug", action="store_true", help="启用调试模式")
     parser.add_argument("--no-score", action="store_true", help="不进行评分环节")
+    parser.add_argument("--no-cache", action="store_true", help="跳过模型响应缓存，强制重新请求")
+    parser.add_argument("--resume", action="store_true", help="从断点日志恢复，跳过已完成的章节评估、整体评估与评分")
     args = parser.parse_args()
+    set_cache_bypass(args.no_cache)
     
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
@@ -645,111 +792,104 @@ def main():
             logger.error("依赖检查失败，无法继续")
             sys.exit(1)
         
-        pkl_file_path = args.input_path
-        
-        # 处理输入文件
-        if args.input_path.lower().endswith('.docx'):
-            logger.info("检测到.docx输入，进行文件转换")
-            pkl_file_path = process_docx_file(args.input_path)
-            if not pkl_file_path:
-                logger.error("文件转换失败，无法继续")
-                sys.exit(1)
-        elif not args.input_path.lower().endswith('.pkl'):
-            logger.error(f"不支持的输入文件格式: {args.input_path}")
-            logger.error("请提供.docx或.pkl格式的文件")
-            sys.exit(1)
-        
-        # 加载所有章节
-        chapters = load_chapters(pkl_file_path)
-        
-        if not chapters:
-            logger.error("未找到有效的章节内容")
+        input_files = collect_input_files(args.input_path)
+        batch_mode = os.path.isdir(args.input_path)
+        if not input_files:
+            logger.error(f"目录中没有找到.docx或.paper文件: {args.input_path}")
             sys.exit(1)
         
-        # 设置输出文件路径
-        if args.output:
-            output_path = args.output
-        else:
-            # 使用输入文件名作为输出文件名
-            input_name = os.path.splitext(os.path.basename(args.input_path))[0]
-            output_dir = os.path.join(project_root, "data", "output")
-            output_path = os.path.join(output_dir, f"{input_name}_eval.json")
+        papers = {}
+        output_paths = {}
+        for input_file in input_files:
+            paper_file_path = input_file
             
-        # 确保输出目录存在
-        output_dir = os.path.dirname(output_path)
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-        
-        # 评估所有章节
-        logger.info(f"开始评估 {len(chapters)} 个章节, 并行度: {args.max_workers}")
-        chapter_evaluations = []
-        
-        if args.max_workers > 1:
-            # 并行评估
-            with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
-                # 提交所有任务
-                future_to_chapter = {
-                    executor.submit(process_chapter, chapter, args.model): chapter
-                    for chapter in chapters
-                }
+            # 处理输入文件
+            if input_file.lower().endswith('.docx'):
+                logger.info("检测到.docx输入，进行文件转换")
+                paper_file_path = process_docx_file(input_file)
+                if not paper_file_path:
+                    logger.error(f"文件转换失败: {input_file}")
+                    if batch_mode:
+                        continue
+                    sys.exit(1)
+            elif not input_file.lower().endswith(INPUT_EXTS):
+                logger.error(f"不支持的输入文件格式: {input_file}")
+                logger.error("请提供.docx或.paper格式的文件")
+                sys.exit(1)
+            
+            # 加载所有章节，批量评估时跳过无法读取的文件（如被拒绝读取的旧 .pkl）
+            try:
+                chapters = load_chapters(paper_file_path)
+            except Exception as e:
+                logger.error(f"无法读取论文: {input_file}: {e}")
+                if batch_mode:
+                    continue
+                raise
+
+            if not chapters:
+                logger.error(f"未找到有效的章节内容: {input_file}")
+                if batch_mode:
+                    continue
+                sys.exit(1)
+            
+            # 设置输出文件路径，批量评估时 --output 视为输出目录
+            input_name = os.path.splitext(os.path.basename(input_file))[0]
+            if input_name in papers:
+                logger.warning(f"跳过同名文件，结果会覆盖已有输出: {input_file}")
+                continue
+            if args.output and not batch_mode:
+                output_path = args.output
+            else:
+                # 使用输入文件名作为输出文件名
+                output_dir = args.output or os.path.join(project_root, "data", "output")
+                output_path = os.path.join(output_dir, f"{input_name}_eval.json")
                 
-                # 获取结果
-                for future in as_completed(future_to_chapter):
-                    chapter = future_to_chapter[future]
-                    try:
-                        evaluation = future.result()
-                        chapter_evaluations.append(evaluation)
-                        logger.info(f"章节 {evaluation.get('index')} 评估完成")
-                    except Exception as e:
-                        logger.error(f"章节 {chapter['index']} 处理失败: {e}")
-                        chapter_evaluations.append({
-                            "chapter": chapter['title'],
-                            "index": chapter['index'],
-                            "error": str(e)
-                        })
-                    
-                # 按章节序号排序
-                chapter_evaluations.sort(key=lambda x: x.get('index', 0))
-        else:
-            # 串行评估
-            for chapter in chapters:
-                evaluation = process_chapter(chapter, args.model)
-                chapter_evaluations.append(evaluation)
-        
-        # 进行整体评估
-        overall_evaluation = evaluate_overall(chapter_evaluations, args.model)
-        
-        # 合并所有评估结果（将整体评估放在首位）
-        all_evaluations = [overall_evaluation] + chapter_evaluations
-        
-        # 保存评估结果
-        output_file = save_evaluations(all_evaluations, output_path)
-        
-        # 进行论文评分环节
-        if not args.no_score:
-            logger.info("开始对论文进行评分...")
-            paper_scores = score_paper(all_evaluations, args.model)
-            score_file = save_scores(paper_scores, output_path)
+            # 确保输出目录存在
+            output_dir = os.path.dirname(output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
             
-            # 计算总分
-            total_score = sum(item['score'] for item in paper_scores if 'score' in item)
-            total_possible = sum(item['full_score'] for item in paper_scores if 'full_score' in item)
-        else:
-            score_file = None
-            total_score = 0
-            total_possible = 100
+            # 每完成一个评估单元即写入断点日志
+            journal = EvalJournal(journal_path_for(output_path), resume=args.resume)
+            papers[input_name] = (chapters, journal)
+            output_paths[input_name] = output_path
+        
+        # 所有论文的章节评估、整体评估与评分共用一个工作队列
+        results = evaluate_papers(papers, args.model, args.max_workers, with_score=not args.no_score)
+        
+        failed = 0
+        for paper_id, result in results.items():
+            if isinstance(result, Exception):
+                logger.error(f"论文 {paper_id} 评估失败: {result}")
+                failed += 1
+                continue
+            chapter_evaluations, overall_evaluation, paper_scores = result
+            output_path = output_paths[paper_id]
+            
+            # 合并所有评估结果（将整体评估放在首位）
+            all_evaluations = [overall_evaluation] + chapter_evaluations
+            
+            # 保存评估结果
+            output_file = save_evaluations(all_evaluations, output_path)
+            
+            print(f"\n评估完成！结果已保存至: {output_file}")
+            print(f"- 整体评估: index=0, chapter='全篇'")
+            print(f"- 章节评估: {len(chapter_evaluations)} 个章节 (index=1~{len(chapter_evaluations)})")
+            
+            if paper_scores is not None:
+                score_file = save_scores(paper_scores, output_path)
+                
+                # 计算总分
+                total_score = sum(item['score'] for item in paper_scores if 'score' in item)
+                total_possible = sum(item['full_score'] for item in paper_scores if 'full_score' in item)
+                print(f"\n论文评分结果已保存至: {score_file}")
+                print(f"- 总分: {total_score}/{total_possible}")
         
         # 计算总耗时
         elapsed_time = time.time() - start_time
-        logger.info(f"评估完成，总耗时: {elapsed_time:.2f} 秒")
-        
-        print(f"\n评估完成！结果已保存至: {output_file}")
-        print(f"- 整体评估: index=0, chapter='全篇'")
-        print(f"- 章节评估: {len(chapter_evaluations)} 个章节 (index=1~{len(chapter_evaluations)})")
-        
-        if not args.no_score:
-            print(f"\n论文评分结果已保存至: {score_file}")
-            print(f"- 总分: {total_score}/{total_possible}")
+        logger.info(f"评估完成，共 {len(results)} 篇论文，失败 {failed} 篇，总耗时: {elapsed_time:.2f} 秒")
+        if failed:
+            sys.exit(1)
     
     except Exception as e:
         logger.error(f"评估过程出错: {e}")
@@ -16,7 +16,9 @@ from pipeline.finegrained_inference import infer as finegrained_infer
 from pipeline.chapter_inference import infer as chapter_infer
 from pipeline.quality_assessment import infer as quality_infer
 from pipeline.overall_assess import infer as overall_assess
+from tools.dag_scheduler import DagScheduler
 from tools.get_pkl_files import get_pkl_files
+from models.response_cache import set_cache_bypass
 from tools.logger import get_logger
 
 # 创建日志记录器
@@ -24,14 +26,18 @@ logger = get_logger(__name__)
 
 
 # ==================== 脚本执行参数 ====================
-# 输入根目录：PKL文件或包含PKL文件的目录
+# 输入根目录：.paper文件或包含.paper文件的目录（旧的PKL文件需先转换，见 tools/docx_tools/paper_store.py）
 INPUT_ROOT = "data/processed/docx"
 # 输出根目录
 OUTPUT_ROOT = "data/output/docx/deepseek"
-# api请求并行数
+# 单个文件的api请求并发数（全局RPM/TPM限流见 config/model_config.py 中的 RATE_LIMIT_CONFIG）
 PROCESSES = 16
+# 同时处理的文件数，一个文件的请求收尾时其余文件的请求继续占满并发
+PARALLEL_FILES = 4
 # 使用的模型名称
 MODEL_NAME = "deepseek-chat"
+# 是否复用 data/cache 中缓存的模型响应（设为 False 时强制重新请求）
+USE_CACHE = True
 # ==================== 脚本执行参数 ====================
 
 
@@ -40,18 +46,23 @@ def run_inference(pkl_paths: List[str], output_ROOT: str, infer_module: Callable
     运行推理任务
     
     Args:
-        pkl_paths: PKL文件路径列表
+        pkl_paths: 论文文件路径列表
         output_ROOT: 输出目录
     """
     logger.info(f"待处理文件数量: {len(pkl_paths)}")
     logger.info("开始推理...")
     
-    for pkl_path in pkl_paths:
+    def run(pkl_path: str) -> None:
         logger.info(f"处理文件: {pkl_path}...")
-        try:
-            infer_module(pkl_path, output_ROOT, PROCESSES, model_name)
-        except Exception as e:
-            logger.error(f"错误: {e}")  
+        infer_module(pkl_path, output_ROOT, PROCESSES, model_name)
+    
+    # 各文件互不依赖，由调度器的全局队列并发处理
+    scheduler = DagScheduler(max_workers=PARALLEL_FILES)
+    for pkl_path in pkl_paths:
+        scheduler.add(pkl_path, run, pkl_path)
+    for pkl_path, result in scheduler.run().items():
+        if isinstance(result, Exception):
+            logger.error(f"错误: {pkl_path}: {result}")
     logger.info("推理完成！")
 
 
@@ -59,24 +70,27 @@ def main(infer_module: Callable, model_name: str):
     # 确保输入目录存在
     os.makedirs(INPUT_ROOT, exist_ok=True)
     
-    # 获取PKL文件列表
+    # 获取论文文件列表
     pkl_files = get_pkl_files(INPUT_ROOT)
     if not pkl_files:
-        logger.error("错误: 没有找到PKL文件")
+        logger.error("错误: 没有找到.paper文件")
         logger.error(f"请检查输入路径: {INPUT_ROOT}")
+        logger.error("可先执行 python -m tools.docx_tools.ingest data/raw/docx 批量导入docx")
         sys.exit(1)
 
-    logger.info(f"找到 {len(pkl_files)} 个PKL文件:")
+    logger.info(f"找到 {len(pkl_files)} 个论文文件:")
     for pkl_file in pkl_files:
         logger.info(f"  - {pkl_file}")
     
     # 创建输出目录
     os.makedirs(OUTPUT_ROOT, exist_ok=True)
+    set_cache_bypass(not USE_CACHE)
     
     # 显示配置信息
     logger.info(f"\n配置信息:")
     logger.info(f"  - 输入路径: {INPUT_ROOT}")
     logger.info(f"  - 输出目录: {OUTPUT_ROOT}")
+    logger.info(f"  - 响应缓存: {'启用' if USE_CACHE else '跳过'}")
     
     # 运行推理
     try:
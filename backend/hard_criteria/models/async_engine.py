@@ -0,0 +1,247 @@
+"""
+异步推理引擎
+基于 AsyncOpenAI 在单个进程内并发驱动大量模型请求，
+替代流水线中仅用于等待网络 I/O 的 multiprocessing.Pool。
+
+所有请求都在一个后台线程的共享事件循环中执行，
+并由全局信号量限制进程内的在途请求数。
+
+使用方法：
+    from models.async_engine import infer_many, infer_many_sync
+
+    # 同步调用
+    results = infer_many_sync(prompts, "deepseek-chat", max_concurrency=16)
+    # 在协程中调用
+    results = await infer_many(prompts, "deepseek-chat")
+
+    # results[i] 形如 {'input': prompt, 'output': response} 或 {'input': prompt, 'error': msg}
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from config.model_config import ASYNC_ENGINE_CONFIG
+from models.client_pool import lease_async_openai_client
+from models.deepseek import DEEPSEEK_BASE_URL, format_response, get_deepseek_api_key, is_api_key_error
+from models.qwen import QWEN_BASE_URL
+from models.rate_limiter import rate_limited_async, usage_tokens
+from models.response_cache import cache_params, lookup, store
+from models.retry import ModelRequestError, call_with_retry_async
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant"
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_global_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取引擎共享的事件循环，首次调用时在后台守护线程中启动
+
+    Returns:
+        asyncio.AbstractEventLoop: 共享事件循环
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-infer-engine", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def _get_global_semaphore() -> asyncio.Semaphore:
+    """获取进程级并发信号量，仅在共享事件循环中调用"""
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(ASYNC_ENGINE_CONFIG['max_concurrency'])
+    return _global_semaphore
+
+
+async def _cached_async(params: Dict[str, Any], request) -> str:
+    """异步版 cached_response，SQLite 读写放到线程中执行以免阻塞事件循环"""
+    response = await asyncio.to_thread(lookup, params)
+    if response is not None:
+        return response
+    response = await request()
+    await asyncio.to_thread(store, params, response)
+    return response
+
+
+async def _request_deepseek_async(prompt: str, system_prompt: str, model: str, format: str) -> str:
+    """异步版 request_deepseek，返回格式、重试策略与响应缓存均与同步接口一致"""
+    params = cache_params("deepseek", model, system_prompt, prompt, format)
+    return await _cached_async(params, lambda: _create_deepseek_async(prompt, system_prompt, model, format))
+
+
+async def _create_deepseek_async(prompt: str, system_prompt: str, model: str, format: str) -> str:
+    """实际发起 deepseek 异步请求"""
+    api_key = get_deepseek_api_key()
+
+    async def create():
+        async with rate_limited_async("deepseek", system_prompt + prompt) as lease:
+            with lease_async_openai_client("deepseek", DEEPSEEK_BASE_URL, api_key) as client:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    stream=False
+                )
+            lease.record_usage(usage_tokens(response))
+        return response
+
+    try:
+        response = await call_with_retry_async(create, f"deepseek ({model})")
+    except ModelRequestError:
+        raise
+    except Exception as e:
+        if is_api_key_error(e):
+            raise ValueError(f"API密钥错误或无效: {e}")
+        raise ModelRequestError(f"Error requesting deepseek ({model}): {e}") from e
+    return format_response(response, format)
+
+
+async def _request_qwen_async(prompt: str) -> str:
+    """异步版 request_qwen，返回格式、重试策略与响应缓存均与同步接口一致"""
+    params = cache_params("qwen", "qwen-max", "You are a helpful assistant.", prompt, "json")
+    return await _cached_async(params, lambda: _create_qwen_async(prompt))
+
+
+async def _create_qwen_async(prompt: str) -> str:
+    """实际发起 qwen 异步请求"""
+    async def create():
+        async with rate_limited_async("qwen", prompt) as lease:
+            with lease_async_openai_client("qwen", QWEN_BASE_URL, os.getenv("QWEN_API_KEY")) as client:
+                completion = await client.chat.completions.create(
+                    model="qwen-max",
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    extra_body={"enable_thinking": False},
+                )
+            lease.record_usage(usage_tokens(completion))
+        return completion
+
+    try:
+        completion = await call_with_retry_async(create, "qwen (qwen-max)")
+    except ModelRequestError:
+        raise
+    except Exception as e:
+        raise ModelRequestError(f"Error requesting Qwen: {e}") from e
+    return completion.model_dump_json()
+
+
+async def request_model_async(prompt: str, model_name: str,
+                              system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                              format: str = "json") -> Dict[str, Any]:
+    """
+    异步调用单个模型请求
+
+    Args:
+        prompt: 用户提示词
+        model_name: 模型名称，deepseek-*、qwen 或 gemini
+        system_prompt: 系统提示词，仅 deepseek 使用
+        format: 返回格式，"json" 或 "md"，仅 deepseek 使用
+
+    Returns:
+        Dict[str, Any]: {'input': prompt, 'output': response} 或 {'input': prompt, 'error': msg}
+    """
+    try:
+        if model_name.startswith("deepseek"):
+            response = await _request_deepseek_async(prompt, system_prompt, model_name, format)
+        elif model_name == "gemini":
+            # google-genai 没有与 OpenAI 兼容的异步接口，放到线程中执行
+            from models.gemini import request_gemini
+            response = await asyncio.to_thread(request_gemini, prompt)
+        elif model_name == "qwen":
+            response = await _request_qwen_async(prompt)
+        else:
+            raise ValueError(f"Invalid model name: {model_name}")
+        return {'input': prompt, 'output': response}
+    except Exception as e:
+        logger.error(f"模型请求失败 ({model_name}): {e}")
+        return {'input': prompt, 'error': str(e)}
+
+
+async def _infer_many(prompts: List[str], model_name: str, system_prompt: str,
+                      format: str, max_concurrency: Optional[int]) -> List[Dict[str, Any]]:
+    """在共享事件循环中并发执行一批请求"""
+    local_semaphore = asyncio.Semaphore(max_concurrency or ASYNC_ENGINE_CONFIG['max_concurrency'])
+    global_semaphore = _get_global_semaphore()
+
+    async def run(prompt: str) -> Dict[str, Any]:
+        async with local_semaphore:
+            async with global_semaphore:
+                return await request_model_async(prompt, model_name, system_prompt, format)
+
+    return await asyncio.gather(*(run(prompt) for prompt in prompts))
+
+
+async def infer_many(prompts: List[str], model_name: str,
+                     system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                     format: str = "json",
+                     max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    并发请求一批提示词，结果顺序与输入一致
+
+    无论在哪个事件循环中 await，请求都会调度到引擎的共享事件循环执行，
+    以便复用其中的异步客户端连接池。
+
+    Args:
+        prompts: 提示词列表
+        model_name: 模型名称
+        system_prompt: 系统提示词
+        format: 返回格式，"json" 或 "md"
+        max_concurrency: 本批请求的并发上限，默认取 ASYNC_ENGINE_CONFIG['max_concurrency']
+
+    Returns:
+        List[Dict[str, Any]]: 每个提示词对应的结果字典
+    """
+    loop = get_event_loop()
+    coro = _infer_many(prompts, model_name, system_prompt, format, max_concurrency)
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def infer_many_sync(prompts: List[str], model_name: str,
+                    system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                    format: str = "json",
+                    max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    infer_many 的同步封装，阻塞直到整批请求完成
+
+    Args:
+        prompts: 提示词列表
+        model_name: 模型名称
+        system_prompt: 系统提示词
+        format: 返回格式，"json" 或 "md"
+        max_concurrency: 本批请求的并发上限
+
+    Returns:
+        List[Dict[str, Any]]: 每个提示词对应的结果字典
+
+    Raises:
+        RuntimeError: 在引擎事件循环线程内调用时抛出（会造成死锁）
+    """
+    if not prompts:
+        return []
+    loop = get_event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("不能在引擎事件循环内调用 infer_many_sync，请改用 await infer_many")
+    coro = _infer_many(prompts, model_name, system_prompt, format, max_concurrency)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
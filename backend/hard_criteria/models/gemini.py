@@ -7,27 +7,47 @@ import os
 import json
 from google import genai
 
+from models.client_pool import lease_client
+from models.rate_limiter import rate_limited
+from models.response_cache import cache_params, cached_response
+from models.retry import ModelRequestError, call_with_retry
+
 
 def request_gemini(prompt: str):
     """向 Gemini Pro 模型发送请求。
 
-    当前为简化实现：当本地未安装 google-generativeai 时返回错误信息。
-    如果已安装且设置了环境变量 GEMINI_API_KEY，则会调用 Gemini Pro 模型。
+    需要安装 google-genai 并设置环境变量 GEMINI_API_KEY。
+    超时、连接错误、429 与 5xx 会按 RETRY_CONFIG 退避重试，成功的响应写入响应缓存。
 
     Args:
         prompt: 提示内容
 
     Returns:
         str: 模型响应的 JSON 字符串
+
+    Raises:
+        ModelRequestError: 请求失败且无法通过重试恢复
     """
-    try:
-        client = genai.Client(
-            api_key=os.getenv("GEMINI_API_KEY"),
-        )
-        response = client.models.generate_content(
-            model = "gemini-2.5-flash-preview-05-20",
-            contents = prompt,
-        )
+    def request() -> str:
+        api_key = os.getenv("GEMINI_API_KEY")
+
+        def generate():
+            with rate_limited("gemini", prompt) as lease, \
+                    lease_client("gemini", "", api_key, lambda: genai.Client(api_key=api_key)) as client:
+                response = client.models.generate_content(
+                    model = "gemini-2.5-flash-preview-05-20",
+                    contents = prompt,
+                )
+                lease.record_usage(getattr(response.usage_metadata, "total_token_count", None))
+            return response
+
+        try:
+            response = call_with_retry(generate, "gemini")
+        except ModelRequestError:
+            raise
+        except Exception as e:
+            raise ModelRequestError(f"Error requesting Gemini: {e}") from e
         return json.dumps({"response": response.text}, ensure_ascii=False)
-    except Exception as e:
-        return json.dumps({"error": str(e)}, ensure_ascii=False) 
\ No newline at end of file
+
+    return cached_response(
+        cache_params("gemini", "gemini-2.5-flash-preview-05-20", "", prompt, "json"), request)
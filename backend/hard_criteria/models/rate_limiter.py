@@ -0,0 +1,321 @@
+"""
+模型请求限流器
+按模型提供方限制每分钟请求数（RPM）、每分钟 token 数（TPM）和在途请求数，
+状态保存在本地共享目录的文件中并以文件锁互斥，
+同一台机器上的多个线程、进程（包括 hard_criteria 与 soft_metrics）共用同一组令牌桶。
+
+等待的调用方按到达顺序排队（FIFO），额度不足时阻塞等待而不是直接失败。
+同一事件循环中的协程先在进程内排队，由队首的协程代为轮询状态文件，
+文件读写与加锁放在线程池中执行，不阻塞事件循环。
+
+使用方法：
+    from models.rate_limiter import rate_limited
+
+    with rate_limited("deepseek", prompt) as lease:
+        response = client.chat.completions.create(...)
+        lease.record_usage(response.usage.total_tokens)
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from config.model_config import RATE_LIMIT_CONFIG
+from tools.logger import get_logger
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+logger = get_logger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计文本的 token 数，用于请求前预扣 TPM 额度
+
+    中文字符大约 0.6 token/字，其余字符大约 0.3 token/字符，
+    请求完成后会按接口返回的实际用量校正。
+
+    Args:
+        text: 待估计的文本
+
+    Returns:
+        int: 估计的 token 数，至少为 1
+    """
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return max(1, int(cjk * 0.6 + (len(text) - cjk) * 0.3))
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """
+    从 OpenAI 兼容响应中读取实际 token 用量
+
+    Args:
+        response: chat.completions.create 的返回值
+
+    Returns:
+        Optional[int]: usage.total_tokens，响应未携带用量时返回 None
+    """
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+@contextmanager
+def _locked_state(path: str) -> Iterator[Dict[str, Any]]:
+    """以独占文件锁读取状态，退出上下文时写回"""
+    with open(path, "a+", encoding="utf-8") as f:
+        f.seek(0)
+        if os.name == "nt":
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            raw = f.read()
+            try:
+                state = json.loads(raw) if raw.strip() else {}
+            except json.JSONDecodeError:
+                logger.warning(f"限流状态文件损坏，已重置: {path}")
+                state = {}
+            yield state
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+            f.flush()
+        finally:
+            f.seek(0)
+            if os.name == "nt":
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class RateLimitLease:
+    """一次已获准的请求额度，用于在请求完成后校正 token 用量"""
+
+    def __init__(self, limiter: Optional["ProviderRateLimiter"], lease_id: str, estimated_tokens: int):
+        self.limiter = limiter
+        self.lease_id = lease_id
+        self.estimated_tokens = estimated_tokens
+        self.used_tokens: Optional[int] = None
+
+    def record_usage(self, total_tokens: Optional[int]) -> None:
+        """
+        记录接口返回的实际 token 用量
+
+        Args:
+            total_tokens: 本次请求实际消耗的 token 数（输入 + 输出），未知时传 None
+        """
+        if total_tokens is not None:
+            self.used_tokens = int(total_tokens)
+
+
+class ProviderRateLimiter:
+    """单个模型提供方的跨进程令牌桶"""
+
+    def __init__(self, provider: str, rpm: float, tpm: float, max_in_flight: int, state_dir: str):
+        self.provider = provider
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.max_in_flight = int(max_in_flight)
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, f"{provider}.json")
+        # 每个事件循环一把锁，同一循环内只有持锁的协程在状态文件中排队
+        self._async_gates: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = \
+            weakref.WeakKeyDictionary()
+        self._async_gates_lock = threading.Lock()
+
+    def _refill(self, state: Dict[str, Any], now: float) -> None:
+        """按流逝时间补充令牌，并清理过期的在途请求与排队票据"""
+        if 'updated' not in state:
+            state.update(requests=self.rpm, tokens=self.tpm, updated=now, in_flight={}, queue=[])
+        elapsed = max(0.0, now - state['updated'])
+        state['requests'] = min(self.rpm, state['requests'] + elapsed * self.rpm / 60.0)
+        state['tokens'] = min(self.tpm, state['tokens'] + elapsed * self.tpm / 60.0)
+        state['updated'] = now
+        state['in_flight'] = {k: exp for k, exp in state['in_flight'].items() if exp > now}
+        state['queue'] = [t for t in state['queue'] if t[1] > now]
+
+    def _try_acquire(self, ticket: str, tokens: int) -> Tuple[bool, float]:
+        """
+        尝试获取一次请求额度
+
+        Returns:
+            Tuple[bool, float]: (是否获准, 建议的等待秒数)
+        """
+        poll = RATE_LIMIT_CONFIG['poll_interval']
+        now = time.time()
+        with _locked_state(self.state_path) as state:
+            self._refill(state, now)
+            queue = state['queue']
+            ids = [t[0] for t in queue]
+            heartbeat = now + RATE_LIMIT_CONFIG['ticket_ttl']
+            if ticket in ids:
+                queue[ids.index(ticket)][1] = heartbeat
+            else:
+                queue.append([ticket, heartbeat])
+                ids.append(ticket)
+
+            if ids[0] != ticket:
+                return False, poll
+            if len(state['in_flight']) >= self.max_in_flight:
+                return False, poll
+
+            wait_requests = max(0.0, 1.0 - state['requests']) * 60.0 / self.rpm
+            wait_tokens = max(0.0, tokens - state['tokens']) * 60.0 / self.tpm
+            wait = max(wait_requests, wait_tokens)
+            if wait > 0:
+                return False, min(wait, poll * 5)
+
+            state['requests'] -= 1.0
+            state['tokens'] -= tokens
+            state['in_flight'][ticket] = now + RATE_LIMIT_CONFIG['lease_ttl']
+            queue.pop(0)
+            return True, 0.0
+
+    def acquire(self, tokens: int) -> RateLimitLease:
+        """
+        阻塞直到获得一次请求额度
+
+        Args:
+            tokens: 预计消耗的 token 数，超过 TPM 上限时按上限计
+
+        Returns:
+            RateLimitLease: 请求额度，请求结束后需调用 release
+        """
+        tokens = int(min(max(tokens, 1), self.tpm))
+        ticket = uuid.uuid4().hex
+        start = time.time()
+        while True:
+            granted, wait = self._try_acquire(ticket, tokens)
+            if granted:
+                break
+            time.sleep(wait * random.uniform(0.8, 1.2))
+        self._log_wait(start)
+        return RateLimitLease(self, ticket, tokens)
+
+    def _async_gate(self) -> asyncio.Lock:
+        """获取当前事件循环的进程内排队锁"""
+        loop = asyncio.get_running_loop()
+        with self._async_gates_lock:
+            gate = self._async_gates.get(loop)
+            if gate is None:
+                gate = self._async_gates[loop] = asyncio.Lock()
+            return gate
+
+    async def acquire_async(self, tokens: int) -> RateLimitLease:
+        """
+        acquire 的协程版本，等待期间不阻塞事件循环
+
+        同一事件循环中的协程按到达顺序在 asyncio.Lock 上等待，
+        只有持锁的协程在状态文件中持有票据并轮询，避免每个等待者在每个轮询周期都重写队列。
+        """
+        tokens = int(min(max(tokens, 1), self.tpm))
+        ticket = uuid.uuid4().hex
+        start = time.time()
+        async with self._async_gate():
+            while True:
+                granted, wait = await asyncio.to_thread(self._try_acquire, ticket, tokens)
+                if granted:
+                    break
+                await asyncio.sleep(wait * random.uniform(0.8, 1.2))
+        self._log_wait(start)
+        return RateLimitLease(self, ticket, tokens)
+
+    async def release_async(self, lease: RateLimitLease) -> None:
+        """release 的协程版本，文件读写在线程池中执行"""
+        await asyncio.to_thread(self.release, lease)
+
+    def release(self, lease: RateLimitLease) -> None:
+        """
+        归还在途额度，并按实际 token 用量校正令牌桶
+
+        Args:
+            lease: acquire 返回的请求额度
+        """
+        with _locked_state(self.state_path) as state:
+            self._refill(state, time.time())
+            state['in_flight'].pop(lease.lease_id, None)
+            if lease.used_tokens is not None:
+                state['tokens'] -= lease.used_tokens - lease.estimated_tokens
+
+    def _log_wait(self, start: float) -> None:
+        waited = time.time() - start
+        if waited >= 1.0:
+            logger.info(f"{self.provider} 限流等待 {waited:.1f} 秒")
+
+
+_limiters: Dict[str, Optional[ProviderRateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> Optional[ProviderRateLimiter]:
+    """
+    获取指定提供方的限流器，未配置或已禁用时返回 None
+
+    Args:
+        provider: 模型提供方，如 deepseek、qwen、gemini
+
+    Returns:
+        Optional[ProviderRateLimiter]: 限流器实例
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = RATE_LIMIT_CONFIG['providers'].get(provider)
+            if not RATE_LIMIT_CONFIG['enabled'] or not limits:
+                _limiters[provider] = None
+            else:
+                _limiters[provider] = ProviderRateLimiter(
+                    provider,
+                    rpm=limits['rpm'],
+                    tpm=limits['tpm'],
+                    max_in_flight=limits['max_in_flight'],
+                    state_dir=RATE_LIMIT_CONFIG['state_dir'],
+                )
+        return _limiters[provider]
+
+
+@contextmanager
+def rate_limited(provider: str, text: str) -> Iterator[RateLimitLease]:
+    """
+    在提供方的限流额度内执行一次请求
+
+    Args:
+        provider: 模型提供方
+        text: 请求发送的全部提示词，用于预估 token 数
+
+    Yields:
+        RateLimitLease: 请求额度，可通过 record_usage 记录实际用量
+    """
+    limiter = get_rate_limiter(provider)
+    if limiter is None:
+        yield RateLimitLease(None, "", 0)
+        return
+    lease = limiter.acquire(estimate_tokens(text))
+    try:
+        yield lease
+    finally:
+        limiter.release(lease)
+
+
+@asynccontextmanager
+async def rate_limited_async(provider: str, text: str):
+    """rate_limited 的异步版本"""
+    limiter = get_rate_limiter(provider)
+    if limiter is None:
+        yield RateLimitLease(None, "", 0)
+        return
+    lease = await limiter.acquire_async(estimate_tokens(text))
+    try:
+        yield lease
+    finally:
+        await limiter.release_async(lease)
@@ -17,7 +17,7 @@ def _request_model(args: tuple[str, str]):
     prompt, model_name = args
     try:
         if model_name.startswith("deepseek"):
-            response = request_deepseek(prompt, model_name)
+            response = request_deepseek(prompt, model=model_name)
         elif model_name == "gemini":
             response = request_gemini(prompt)
         elif model_name == "qwen":
@@ -27,5 +27,5 @@ def _request_model(args: tuple[str, str]):
         return {'input': prompt, 'output': response}
         # return response
     except Exception as e:
-        logger.error(f"不存在该模型: {e}")
+        logger.error(f"模型请求失败: {e}")
         return {'input': prompt, 'error': str(e)}
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+模型请求重试策略
+将请求异常分为可重试（超时、连接错误、429、5xx）与不可重试（鉴权、参数错误等）两类，
+可重试的错误按指数退避加随机抖动重试，优先遵循服务端返回的 Retry-After，
+并限制单次请求在所有尝试上花费的总时间。每次尝试的耗时都会记录到日志。
+
+使用方法：
+    from models.retry import call_with_retry
+
+    response = call_with_retry(lambda: client.chat.completions.create(...), "deepseek (deepseek-chat)")
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+import httpx
+import openai
+
+from config.model_config import RETRY_CONFIG
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class ModelRequestError(Exception):
+    """模型请求失败（不可重试的错误，或重试次数、总时长已用尽）"""
+
+    def __init__(self, message: str, attempts: Optional[List["AttemptRecord"]] = None):
+        super().__init__(message)
+        self.attempts = attempts or []
+
+
+@dataclass
+class AttemptRecord:
+    """单次尝试的结果"""
+    attempt: int
+    latency: float
+    error: Optional[str] = None
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    """读取异常携带的 HTTP 状态码（openai 为 status_code，google-genai 为 code）"""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    判断异常是否值得重试
+
+    Args:
+        exc: 请求抛出的异常
+
+    Returns:
+        bool: 超时、连接错误、429 与 5xx 返回 True；鉴权、参数等错误返回 False
+    """
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return False
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """
+    解析响应头中的 Retry-After（秒数或 HTTP 日期）与 retry-after-ms
+
+    Args:
+        exc: 请求抛出的异常
+
+    Returns:
+        Optional[float]: 服务端要求的等待秒数，未提供时返回 None
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, exc: BaseException) -> float:
+    """计算第 attempt 次失败后的等待时间：有 Retry-After 时遵循之，否则指数退避加全抖动"""
+    retry_after = retry_after_seconds(exc)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, RETRY_CONFIG['base_delay'])
+    ceiling = min(RETRY_CONFIG['max_delay'], RETRY_CONFIG['base_delay'] * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+def _next_delay(description: str, attempt: int, exc: BaseException,
+                start: float, attempts: List[AttemptRecord]) -> float:
+    """
+    记录失败的尝试并决定是否继续重试
+
+    Returns:
+        float: 下一次尝试前的等待秒数
+
+    Raises:
+        Exception: 不可重试的错误原样抛出
+        ModelRequestError: 重试次数或总时长已用尽
+    """
+    record = attempts[-1]
+    if not is_retryable(exc):
+        logger.error(f"{description} 第{attempt}次尝试失败（不可重试），耗时 {record.latency:.2f} 秒: {exc}")
+        raise exc
+    if attempt >= RETRY_CONFIG['max_attempts']:
+        raise ModelRequestError(f"{description} 重试 {attempt} 次后仍失败: {exc}", attempts) from exc
+    delay = _backoff_delay(attempt, exc)
+    if time.monotonic() - start + delay > RETRY_CONFIG['max_total_time']:
+        raise ModelRequestError(f"{description} 超出总时长上限 {RETRY_CONFIG['max_total_time']} 秒: {exc}", attempts) from exc
+    logger.warning(f"{description} 第{attempt}次尝试失败，耗时 {record.latency:.2f} 秒，{delay:.2f} 秒后重试: {exc}")
+    return delay
+
+
+def _log_success(description: str, attempts: List[AttemptRecord]) -> None:
+    latencies = ", ".join(f"{a.latency:.2f}s" for a in attempts)
+    if len(attempts) > 1:
+        logger.info(f"{description} 第{len(attempts)}次尝试成功，各次耗时: {latencies}")
+    else:
+        logger.debug(f"{description} 请求成功，耗时: {latencies}")
+
+
+def call_with_retry(func: Callable[[], T], description: str) -> T:
+    """
+    按重试策略执行一次模型请求
+
+    Args:
+        func: 发起一次请求的无参函数
+        description: 日志中使用的请求描述
+
+    Returns:
+        T: func 的返回值
+
+    Raises:
+        Exception: 不可重试的错误原样抛出
+        ModelRequestError: 重试次数或总时长已用尽
+    """
+    start = time.monotonic()
+    attempts: List[AttemptRecord] = []
+    attempt = 0
+    while True:
+        attempt += 1
+        attempt_start = time.monotonic()
+        try:
+            result = func()
+        except Exception as e:
+            attempts.append(AttemptRecord(attempt, time.monotonic() - attempt_start, str(e)))
+            time.sleep(_next_delay(description, attempt, e, start, attempts))
+            continue
+        attempts.append(AttemptRecord(attempt, time.monotonic() - attempt_start))
+        _log_success(description, attempts)
+        return result
+
+
+async def call_with_retry_async(func: Callable[[], Awaitable[T]], description: str) -> T:
+    """call_with_retry 的协程版本，func 返回可等待对象"""
+    start = time.monotonic()
+    attempts: List[AttemptRecord] = []
+    attempt = 0
+    while True:
+        attempt += 1
+        attempt_start = time.monotonic()
+        try:
+            result = await func()
+        except Exception as e:
+            attempts.append(AttemptRecord(attempt, time.monotonic() - attempt_start, str(e)))
+            await asyncio.sleep(_next_delay(description, attempt, e, start, attempts))
+            continue
+        attempts.append(AttemptRecord(attempt, time.monotonic() - attempt_start))
+        _log_success(description, attempts)
+        return result
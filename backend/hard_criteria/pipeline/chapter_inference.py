@@ -6,7 +6,6 @@
 import os
 import json
 from typing import List, Dict, Any
-from multiprocessing import Pool
 from glob import glob
 import random
 import warnings
@@ -14,11 +13,10 @@ import warnings
 # 导入项目模块
 from config.data_config import FILE_CONFIG
 from config.model_config import MODEL_CONFIG
-from models.deepseek import request_deepseek
-from models.qwen import request_qwen
-from models.gemini import request_gemini
-from tools.file_utils import read_pickle
+from models.async_engine import infer_many_sync
+from tools.docx_tools.paper_store import read_paper
 from tools.logger import get_logger
+from tools.prompt_budget import content_budget, pack_contents, split_content, token_counter
 from prompts.assess_detail_prompt import p_writing_quality
 
 
@@ -31,7 +29,7 @@ def load_context(pkl_path: str, model_name: str) -> List[str]:
     加载论文章节内容
     
     Args:
-        pkl_path: pickle文件路径
+        pkl_path: .paper文件路径
         model_name: 模型名称
         
     Returns:
@@ -42,7 +40,7 @@ def load_context(pkl_path: str, model_name: str) -> List[str]:
     """
                
     context_lst = []
-    data = read_pickle(pkl_path)
+    data = read_paper(pkl_path)
         
     keys = list(data.keys())
     for i, k in enumerate(keys):
@@ -66,56 +64,40 @@ def load_context(pkl_path: str, model_name: str) -> List[str]:
     logger.info(f'从 {pkl_path} 加载了 {len(context_lst)} 个章节用于论文写作质量评估')
     return context_lst
 
-def load_prompts(context: List[str]) -> List[str]:
+def load_prompts(context: List[str], model_name: str = "deepseek-chat") -> List[str]:
     """
     根据章节内容生成提示词列表
     
+    超出模型 max_length 的章节在 ## / ### 标题处切分为多个提示词，
+    相邻的短文本（如中英文摘要）合并到同一个提示词中。
+    
     Args:
         context: 章节内容列表
+        model_name: 模型名称，用于确定提示词预算
         
     Returns:
         List[str]: 提示词列表
     """
-    prompt_lst = []
+    counter = token_counter(model_name)
+    budget = content_budget(p_writing_quality, model_name, counter)
+    pieces = []
     for c in context:
-        prompt = p_writing_quality.format(content=c)
+        pieces.extend(split_content(c, budget, counter))
+    prompt_lst = []
+    for group in pack_contents(pieces, budget, counter):
+        prompt = p_writing_quality.format(content="\n\n".join(pieces[i] for i in group))
         prompt_lst.append(prompt)
-    logger.info(f'生成了 {len(prompt_lst)} 个提示词')
+    logger.info(f'{len(context)} 段内容生成了 {len(prompt_lst)} 个提示词')
     return prompt_lst
 
-def _request_model(args: tuple[str, str]):
-    """根据模型名称调用对应的请求接口。
-
-    Args:
-        args: (prompt, model_name)
-
-    Returns:
-        str: 模型返回的结果 JSON 字符串
-    """
-    prompt, model_name = args
-    try:
-        if model_name.startswith("deepseek"):
-            response = request_deepseek(prompt, model_name)
-        elif model_name == "gemini":
-            response = request_gemini(prompt)
-        elif model_name == "qwen":
-            response = request_qwen(prompt)
-        else:
-            raise ValueError(f"Invalid model name: {model_name}")
-        return {'input': prompt, 'output': response}
-        # return response
-    except Exception as e:
-        logger.error(f"不存在该模型: {e}")
-        return {'input': prompt, 'error': str(e)}
-
 def infer(pkl_path: str, out_dir: str, num_processes: int = 8, model_name: str = "deepseek-chat") -> None:
     """
     对论文进行推理
     
     Args:
-        pkl_path: pickle文件路径
+        pkl_path: .paper文件路径
         out_dir: 输出目录
-        num_processes: 进程数
+        num_processes: 并发请求数
         model_name: 使用的模型名称
         
     Raises:
@@ -129,18 +111,14 @@ def infer(pkl_path: str, out_dir: str, num_processes: int = 8, model_name: str =
         logger.info(f"使用模型: {model_name}")
         
         context = load_context(pkl_path, model_name)
-        prompts = load_prompts(context)
-        
-        # 准备进程池参数
-        pool_args = [(prompt, model_name) for prompt in prompts]
+        prompts = load_prompts(context, model_name)
         
-        # 使用进程池处理章节
-        with Pool(processes=num_processes) as pool:
-            results = pool.map(_request_model, pool_args)
+        # 使用异步推理引擎并发处理章节
+        results = infer_many_sync(prompts, model_name, max_concurrency=num_processes)
         
         # 保存结果
         filename = os.path.basename(pkl_path)
-        output_file = os.path.join(out_dir, filename.replace('.pkl', '.json'))
+        output_file = os.path.join(out_dir, os.path.splitext(filename)[0] + '.json')
         
         with open(output_file, 'w', encoding=FILE_CONFIG['encoding']) as f:
             json.dump(results, f, ensure_ascii=False, indent=4)
@@ -169,12 +147,12 @@ def chapter_inference():
         input_dir = os.path.join(input_root, 'docx')
         output_dir = os.path.join(output_root, 'docx')
 
-        # 获取所有pkl文件
-        pkl_pattern = str(input_dir) + '/*.pkl'
+        # 获取所有.paper文件
+        pkl_pattern = str(input_dir) + '/*.paper'
         pkl_lst = glob(pkl_pattern)
         
         if not pkl_lst:
-            logger.warning(f"在 {input_dir} 中没有找到要处理的PKL文件")
+            logger.warning(f"在 {input_dir} 中没有找到要处理的.paper文件")
             
         # 处理每个文件
         for pkl_path in pkl_lst:
@@ -7,13 +7,10 @@
 import os
 import sys
 import json
-from multiprocessing import Pool
 import warnings
 
 # 导入项目模块
-from models.deepseek import request_deepseek
-from models.qwen import request_qwen
-from models.gemini import request_gemini
+from models.async_engine import infer_many_sync
 from prompts.assess_detail_prompt import (
     p_wq_zh,
     p_wq_en,
@@ -21,7 +18,7 @@ from prompts.assess_detail_prompt import (
     p_wq_for,
     p_wq_ref
 )
-from tools.file_utils import read_pickle
+from tools.docx_tools.paper_store import read_paper
 from tools.logger import get_logger
 from config.data_config import FILE_CONFIG
 from config.model_config import MODEL_CONFIG
@@ -33,7 +30,7 @@ def load_context(pkl_path: str, model_name: str) -> list[str]:
     加载论文内容
     
     Args:
-        pkl_path (str): pickle文件路径
+        pkl_path (str): .paper文件路径
         model_name (str): 模型名称
         
     Returns:
@@ -44,7 +41,7 @@ def load_context(pkl_path: str, model_name: str) -> list[str]:
     #     _get_tokenizer(model_name)
     
     context_lst = []
-    data = read_pickle(pkl_path)
+    data = read_paper(pkl_path)
     keys = list(data.keys())
     for i, k in enumerate(keys):
         if k == 'chapters':
@@ -82,30 +79,6 @@ def load_prompts(context: list[str]) -> list[str]:
             prompt_lst.append(prompt)
     return prompt_lst
 
-def _request_model(args: tuple[str, str]):
-    """根据模型名称调用对应的请求接口。
-
-    Args:
-        args: (prompt, model_name)
-
-    Returns:
-        str: 模型返回的结果 JSON 字符串
-    """
-    prompt, model_name = args
-    try:
-        if model_name.startswith("deepseek"):
-            response = request_deepseek(prompt, model_name)
-        elif model_name == "gemini":
-            response = request_gemini(prompt)
-        elif model_name == "qwen":
-            response = request_qwen(prompt)
-        else:
-            raise ValueError(f"Invalid model name: {model_name}")
-        return {'input': prompt, 'output': response}
-    except Exception as e:
-        logger.error(f"不存在该模型: {e}")
-        return {'input': prompt, 'error': str(e)}
-
 def infer(pkl_path: str, out_dir: str, num_processes: int = 16, model_name: str = "deepseek-chat"):
     """
     对单个文件进行批量推理
@@ -113,7 +86,7 @@ def infer(pkl_path: str, out_dir: str, num_processes: int = 16, model_name: str
     Args:
         pkl_path (str): 输入文件路径
         out_dir (str): 输出目录
-        num_processes (int): 并行处理的进程数
+        num_processes (int): 并发请求数
         model_name (str): 模型名称
     """
     try:
@@ -126,16 +99,12 @@ def infer(pkl_path: str, out_dir: str, num_processes: int = 16, model_name: str
         context = load_context(pkl_path, model_name)
         prompts = load_prompts(context)
         
-        # 准备进程池参数
-        pool_args = [(prompt, model_name) for prompt in prompts]
-        
-        # 使用进程池处理章节
-        with Pool(processes=num_processes) as pool:
-            results = pool.map(_request_model, pool_args)
+        # 使用异步推理引擎并发处理章节
+        results = infer_many_sync(prompts, model_name, max_concurrency=num_processes)
         
         # 保存结果
         filename = os.path.basename(pkl_path)
-        output_file = os.path.join(out_dir, filename.replace('.pkl', '.json'))
+        output_file = os.path.join(out_dir, os.path.splitext(filename)[0] + '.json')
         
         with open(output_file, 'w', encoding=FILE_CONFIG['encoding']) as f:
             json.dump(results, f, ensure_ascii=False, indent=4)
@@ -11,13 +11,12 @@ import json
 import re
 import time
 from collections import defaultdict
-from multiprocessing import Pool
-from functools import partial
 
 # 添加父路径到python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.deepseek import request_deepseek
+from models.async_engine import infer_many_sync
 # from config.data_config import FILE_CONFIG
 from tools.logger import get_logger
 from tools.hard_criteria.extract_md import (
@@ -185,7 +184,7 @@ def build_prompts(abs, chapters):
 def _scan_colloquial_words(chapters):
     out = list()
     for ch_name, ch in chapters.items():
-        case = scan_colloquial_words(ch.get('content', {}))
+        case = scan_colloquial_words(ch.get('content', ''))
         if case:
             out.extend(case)
     return out
@@ -201,7 +200,7 @@ def eval(md_path):
     chapters = extract_chapters(md)
     references = extract_references(md)
 
-    # 检查正文中的主观用词：“我们”“我”
+    # 检查正文中的主观用词：“我们”“我”等（词表见 COLLOQUIAL_WORD_CONFIG）
     colloquial_cases = _scan_colloquial_words(chapters)
 
     # 构建提示词
@@ -211,9 +210,16 @@ def eval(md_path):
     # infer
     logger.info("开始并行调用API进行章节分析...")
     start_time_infer = time.time()
-    request_with_format = partial(request_deepseek, system_prompt, format="md")
-    with Pool(processes=16) as pool:
-        responses = pool.map(request_with_format, user_prompts)
+    results = infer_many_sync(list(user_prompts), "deepseek-chat", system_prompt=system_prompt,
+                              format="md", max_concurrency=16)
+    responses = list()
+    for r, ch_name, sub_ch_name in zip(results, ch_names, sub_ch_names):
+        if 'error' in r:
+            # 失败的章节保留占位，避免聚合时悄无声息地漏掉
+            logger.error(f"章节分析失败: {ch_name} - {sub_ch_name}: {r['error']}")
+            responses.append(f"章节：{ch_name} - {sub_ch_name}\n该章节分析失败：{r['error']}")
+        else:
+            responses.append(r['output'])
     end_time_infer = time.time()
     infer_duration = end_time_infer - start_time_infer
     logger.info(f"Infer阶段完成，耗时: {infer_duration:.2f} 秒")
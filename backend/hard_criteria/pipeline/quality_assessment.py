@@ -13,44 +13,6 @@ import time
 import warnings
 from pathlib import Path
 
-# 修改导入语句，使用torch_helper.py中的安全导入方法
-try:
-    from tools.torch_helper import get_transformers
-except ImportError as e:
-    print(f"Warning: 无法导入torch_helper模块，将使用备用导入方法: {e}")
-    # 仅在torch_helper导入失败时使用原有的延迟导入方法
-    _transformers = None
-    _tokenizer = None
-
-    def _safe_import_transformers():
-        """Safely import transformers module without triggering Streamlit file watcher issues."""
-        global _transformers
-        if _transformers is None:
-            try:
-                import transformers
-                _transformers = transformers
-                return transformers
-            except ImportError:
-                warnings.warn("Failed to import transformers library. Tokenization functionality will be unavailable.")
-                return None
-        return _transformers
-else:
-    # 如果torch_helper导入成功，直接使用其方法
-    def _safe_import_transformers():
-        return get_transformers()
-
-def _get_tokenizer():
-    """Safely get a tokenizer with deferred import."""
-    transformers = _safe_import_transformers()
-    if not transformers:
-        return None
-        
-    try:
-        return transformers.AutoTokenizer.from_pretrained('Qwen/Qwen3-0.6B')
-    except Exception as e:
-        warnings.warn(f"Failed to initialize tokenizer: {e}")
-        return None
-
 # 确保能够导入项目模块
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -68,6 +30,7 @@ try:
     from models.deepseek import request_deepseek
     from models.qwen import request_qwen
     from models.gemini import request_gemini
+    from models.async_engine import infer_many_sync
     from prompts.assess_detail_prompt import (
         p_wq_zh,
         p_wq_en,
@@ -77,16 +40,17 @@ try:
         p_writing_quality
     )
     from prompts.overall_prompt import p_overall_assessment
-    from tools.file_utils import read_pickle
+    from tools.docx_tools.paper_store import read_paper
+    from tools.token_count.tokenizer_service import count_tokens, get_tokenizer as _get_service_tokenizer
 except ImportError as e:
     print(f"Warning: 模块导入错误，某些功能可能不可用: {e}")
     
     # 提供空的替代函数，确保即使导入失败也不会导致整个模块崩溃
-    def read_pickle(path):
-        print(f"Warning: 无法读取 pickle 文件 {path}，未找到 read_pickle 函数")
+    def read_paper(path):
+        print(f"Warning: 无法读取论文文件 {path}，未找到 read_paper 函数")
         return {"chapters": []}
     
-    def request_deepseek(prompt, model_name="deepseek-chat"):
+    def request_deepseek(prompt, model="deepseek-chat"):
         print("Warning: 无法调用 DeepSeek API，未找到 request_deepseek 函数")
         return "API 调用失败，请检查依赖和环境配置"
     
@@ -98,6 +62,10 @@ except ImportError as e:
         print("Warning: 无法调用 Gemini API，未找到 request_gemini 函数")
         return "API 调用失败，请检查依赖和环境配置"
     
+    infer_many_sync = None
+    count_tokens = None
+    _get_service_tokenizer = None
+    
     # 如果模板导入失败，定义一个简单的模板
     p_overall_assessment = p_overall_assessment_lite = """
     你是一位学术论文评审专家，需要基于论文各章节的评价生成一份整体评价报告。
@@ -123,46 +91,41 @@ except ImportError as e:
     """
 
 def get_tokenizer():
-    """获取tokenizer，失败则返回None"""
-    return _get_tokenizer()
+    """获取tokenizer，失败则返回None；分词器每个进程只加载一次"""
+    if _get_service_tokenizer is None:
+        return None
+    return _get_service_tokenizer('qwen')
 
 def load_prompts(pkl_path: str, model_name: str) -> list[str]:
     """
     加载论文内容的提示词
     
     Args:
-        pkl_path (str): pickle文件路径
+        pkl_path (str): .paper文件路径
         model_name (str): 模型名称
         
     Returns:
         list[str]: 提示词列表
     """
-    tokenizer = None
-    if not model_name.startswith("deepseek"):
-        tokenizer = get_tokenizer()
-    
     prompt_lst = []
     try:
-        data = read_pickle(pkl_path)
-        prompt = p_writing_quality.format(content=data.get('cn_abs', ''))
+        data = read_paper(pkl_path)
+        prompt = p_writing_quality.format(content=data.get('zh_abs', ''))
         prompt_lst.append(prompt)
         chapters = data.get('chapters', [])
         for i, ch in enumerate(chapters):
-            if isinstance(ch, dict) and 'text_content' in ch:
-                prompt = p_writing_quality.format(content=ch['text_content'])
+            if isinstance(ch, dict) and isinstance(ch.get('content'), str):
+                prompt = p_writing_quality.format(content=ch['content'])
                 prompt_lst.append(prompt)
     except Exception as e:
         print(f"Error loading prompts: {e}")
         return []
         
     print(f'Loaded {len(prompt_lst)} prompts from {pkl_path}')
+    token_lens = count_tokens(prompt_lst, model_name) if count_tokens and prompt_lst else []
     for i, prompt in enumerate(prompt_lst):
-        if tokenizer:
-            try:
-                token_len = tokenizer(prompt)['input_ids']
-                print(f'Prompt {i} len: {len(prompt)}, token len: {len(token_len)}')
-            except:
-                print(f'Prompt {i} len: {len(prompt)}, token len: unknown')
+        if i < len(token_lens):
+            print(f'Prompt {i} len: {len(prompt)}, token len: {token_lens[i]}')
         else:
             print(f'Prompt {i} len: {len(prompt)}')
     return prompt_lst
@@ -172,7 +135,7 @@ def load_paper_writing_quality_prompts(pkl_path: str, model_name: str) -> list[s
     加载论文写作质量评估的提示词
     
     Args:
-        pkl_path (str): pickle文件路径
+        pkl_path (str): .paper文件路径
         model_name (str): 模型名称
         
     Returns:
@@ -180,17 +143,17 @@ def load_paper_writing_quality_prompts(pkl_path: str, model_name: str) -> list[s
     """
     prompt_lst = []
     try:
-        data = read_pickle(pkl_path)
+        data = read_paper(pkl_path)
         keys = list(data.keys())
         for i, k in enumerate(keys):
             if k == 'chapters':
                 chapters_list = data.get(k, [])
                 for chap_idx, chapter_data in enumerate(chapters_list):
-                    if isinstance(chapter_data, dict) and isinstance(chapter_data.get('text_content'), str):
-                        prompt = p_writing_quality.format(content=chapter_data['text_content'])
+                    if isinstance(chapter_data, dict) and isinstance(chapter_data.get('content'), str):
+                        prompt = p_writing_quality.format(content=chapter_data['content'])
                         prompt_lst.append(prompt)
                     else:
-                        print(f"Skipping chapter {chap_idx} for key '{k}' due to missing or non-string text_content in {pkl_path}")
+                        print(f"Skipping chapter {chap_idx} for key '{k}' due to missing or non-string content in {pkl_path}")
             elif isinstance(data[k], str):
                 prompt = p_writing_quality.format(content=data[k])
                 prompt_lst.append(prompt)
@@ -208,7 +171,7 @@ def _request_model(args: tuple[str, str]):
     prompt, model_name = args
     try:
         if model_name.startswith("deepseek"):
-            return request_deepseek(prompt, model_name)
+            return request_deepseek(prompt, model=model_name)
         if model_name == "gemini":
             return request_gemini(prompt)
         return request_qwen(prompt)
@@ -287,7 +250,7 @@ def infer(pkl_path: str, out_dir: str, processes: int = 8, model_name: str = "de
     Args:
         pkl_path (str): 输入文件路径
         out_dir (str): 输出目录
-        processes (int): 处理线程数
+        processes (int): 并发请求数
         model_name (str): 模型名称
     """
     os.makedirs(out_dir, exist_ok=True)
@@ -302,14 +265,15 @@ def infer(pkl_path: str, out_dir: str, processes: int = 8, model_name: str = "de
         print(f"错误: 无法从 {pkl_path} 加载有效的提示词")
         return None
     
-    # 使用多进程并行处理各章节
+    # 使用异步推理引擎并发处理各章节
     try:
-        from multiprocessing import Pool
-        with Pool(processes=min(processes, len(prompts))) as pool:
-            args = [(prompt, model_name) for prompt in prompts]
-            responses = pool.map(_request_model, args)
+        results = infer_many_sync(prompts, model_name, max_concurrency=processes)
+        responses = [
+            r['output'] if 'output' in r else f"模型调用失败: {r['error']}"
+            for r in results
+        ]
     except Exception as e:
-        print(f"多进程处理失败: {e}, 使用单进程处理")
+        print(f"并发处理失败: {e}, 使用串行处理")
         responses = [_request_model((prompt, model_name)) for prompt in prompts]
     
     # 保存章节评价结果
@@ -330,7 +294,7 @@ def infer(pkl_path: str, out_dir: str, processes: int = 8, model_name: str = "de
     }
     
     # 保存结果
-    output_path = os.path.join(out_dir, filename.replace('.pkl', '.json'))
+    output_path = os.path.join(out_dir, os.path.splitext(filename)[0] + '.json')
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(final_results, f, ensure_ascii=False, indent=4)
     
@@ -0,0 +1,149 @@
+"""
+DAG 任务调度器
+将多个任务按依赖关系组织成有向无环图，由一个全局线程池调度：
+任一任务的依赖全部完成后立即进入就绪队列，空闲线程按优先级取出执行。
+
+用于批量评估论文时让不同论文的各阶段相互重叠，例如论文 A 的整体评估、评分
+与论文 B 的章节评估同时进行，避免每篇论文的阶段屏障处线程池空转。
+
+使用方法：
+    from tools.dag_scheduler import DagScheduler
+
+    scheduler = DagScheduler(max_workers=16)
+    scheduler.add("a/ch1", evaluate, chapter1)
+    scheduler.add("a/ch2", evaluate, chapter2)
+    scheduler.add("a/overall", overall, deps=["a/ch1", "a/ch2"], priority=1)
+    results = scheduler.run()   # {"a/ch1": ..., "a/overall": ...}
+
+依赖任务的结果按 deps 顺序追加在任务自身参数之后传入。
+run(on_done=...) 在每个任务结束时回调，可用于按实际完成情况推进进度。
+"""
+
+import heapq
+import itertools
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DependencyFailedError(Exception):
+    """任务因依赖任务失败而未执行"""
+
+
+@dataclass
+class _Node:
+    """调度图中的一个任务"""
+    name: str
+    func: Callable[..., Any]
+    args: Tuple[Any, ...]
+    deps: List[str]
+    priority: int
+    dependents: List[str] = field(default_factory=list)
+    remaining: int = 0
+
+
+class DagScheduler:
+    """按依赖关系调度任务的全局线程池"""
+
+    def __init__(self, max_workers: int = 8):
+        """
+        Args:
+            max_workers: 同时执行的任务数上限
+        """
+        self.max_workers = max(1, max_workers)
+        self._nodes: Dict[str, _Node] = {}
+        self._seq = itertools.count()
+
+    def add(self, name: str, func: Callable[..., Any], *args: Any,
+            deps: Optional[Sequence[str]] = None, priority: int = 0) -> str:
+        """
+        添加一个任务
+
+        Args:
+            name: 任务名称，需全局唯一
+            func: 任务函数，调用方式为 func(*args, *依赖任务结果)
+            *args: 任务自身参数
+            deps: 依赖的任务名称，需先于本任务添加
+            priority: 优先级，数值越大越先执行；同优先级按添加顺序执行
+
+        Returns:
+            str: 任务名称
+        """
+        if name in self._nodes:
+            raise ValueError(f"任务名称重复: {name}")
+        deps = list(deps or [])
+        for dep in deps:
+            if dep not in self._nodes:
+                raise ValueError(f"任务 {name} 依赖的任务 {dep} 不存在")
+        node = _Node(name, func, args, deps, priority, remaining=len(deps))
+        for dep in deps:
+            self._nodes[dep].dependents.append(name)
+        self._nodes[name] = node
+        return name
+
+    def run(self, on_done: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        执行全部任务，直到所有任务完成或因依赖失败被跳过
+
+        Args:
+            on_done: 任务结束时的回调，参数为 (任务名称, 结果或异常)，在调度线程中依次调用
+
+        Returns:
+            Dict[str, Any]: 任务名称到结果的映射；失败的任务对应其抛出的异常，
+            因依赖失败而未执行的任务对应 DependencyFailedError
+        """
+        results: Dict[str, Any] = {}
+        ready: List[Tuple[int, int, str]] = []
+        for node in self._nodes.values():
+            if node.remaining == 0:
+                heapq.heappush(ready, (-node.priority, next(self._seq), node.name))
+
+        def skip_dependents(name: str) -> None:
+            for dependent in self._nodes[name].dependents:
+                if dependent not in results:
+                    results[dependent] = DependencyFailedError(f"依赖任务 {name} 失败")
+                    skip_dependents(dependent)
+
+        in_flight: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or in_flight:
+                while ready and len(in_flight) < self.max_workers:
+                    _, _, name = heapq.heappop(ready)
+                    if name in results:
+                        continue
+                    node = self._nodes[name]
+                    dep_results = [results[dep] for dep in node.deps]
+                    in_flight[executor.submit(node.func, *node.args, *dep_results)] = name
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = in_flight.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"任务 {name} 执行失败: {e}")
+                        results[name] = e
+                        skip_dependents(name)
+                        self._notify(on_done, name, e)
+                        continue
+                    self._notify(on_done, name, results[name])
+                    for dependent in self._nodes[name].dependents:
+                        node = self._nodes[dependent]
+                        node.remaining -= 1
+                        if node.remaining == 0 and dependent not in results:
+                            heapq.heappush(ready, (-node.priority, next(self._seq), dependent))
+        return results
+
+    @staticmethod
+    def _notify(on_done: Optional[Callable[[str, Any], None]], name: str, result: Any) -> None:
+        """调用任务结束回调，回调自身的异常只记录日志，不影响调度"""
+        if on_done is None:
+            return
+        try:
+            on_done(name, result)
+        except Exception as e:
+            logger.error(f"任务 {name} 的结束回调执行失败: {e}")
@@ -0,0 +1,520 @@
+"""
+DOCX文档中间表示（IR）
+对一份 docx 只解析一次，得到按文档顺序排列的块（段落、表格），段落内保留文本片段、公式、图像引用，
+并记录每个块在正文中的位置。HTML 预览、目录提取、Markdown 生成与章节切分都基于同一份 IR，
+不再各自用 python-docx / mammoth 重新解析上传的文件。
+
+解析完成后只保留 IR 与图像的二进制内容，python-docx 的文档对象随即释放。
+
+对于数百页的学位论文，可改用 StreamedDocument：以 lxml.etree.iterparse 流式读取 word/document.xml，
+逐个生成块并立即清理已处理的元素，图像按需从压缩包读取，内存占用与单个块的大小相当。
+
+使用方法：
+    from tools.docx_tools.docx_ir import parse_docx
+
+    document = parse_docx("paper.docx")          # 也可传入 bytes 或二进制文件对象
+    for paragraph in document.paragraphs:        # 正文顶层段落，与 Document.paragraphs 一一对应
+        print(paragraph.paragraph_index, paragraph.style_name, paragraph.text)
+    blob = document.images["rId5"].blob
+
+    with StreamedDocument("thesis.docx") as document:
+        for block in document.iter_blocks():
+            ...
+"""
+
+import hashlib
+import io
+import os
+import posixpath
+import zipfile
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import IO, Dict, Iterator, List, Optional, Union
+
+from docx import Document
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+try:
+    from .omml_to_latex import convert_omml_to_latex
+except ImportError:
+    # 作为脚本直接运行时
+    from omml_to_latex import convert_omml_to_latex
+
+# convert_omml_to_latex 转换失败时的占位结果
+MATH_PLACEHOLDER = "[Math Formula]"
+
+_FALSE_VALUES = ('0', 'false', 'off', 'none')
+
+
+@dataclass
+class TextRun:
+    """一段带格式的文本"""
+    text: str
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+    strike: bool = False
+    vert_align: Optional[str] = None
+    font_size: Optional[float] = None
+
+
+@dataclass
+class MathInline:
+    """一个公式，in_run 表示公式位于 w:r 内（总是按行内公式处理）"""
+    latex: str
+    in_run: bool = False
+
+    @property
+    def valid(self) -> bool:
+        """公式是否转换成功"""
+        return bool(self.latex) and self.latex != MATH_PLACEHOLDER
+
+
+@dataclass
+class ImageRef:
+    """段落中对图像的引用，rel_id 对应 DocumentIR.images 的键"""
+    rel_id: str
+
+
+Inline = Union[TextRun, MathInline, ImageRef]
+
+
+@dataclass
+class ParagraphBlock:
+    """
+    段落
+
+    index 为块在正文中的位置；paragraph_index 为段落在 Document.paragraphs 中的下标，
+    表格单元格内的段落为 None。
+    """
+    index: int
+    paragraph_index: Optional[int]
+    style_name: str
+    text: str
+    inlines: List[Inline] = field(default_factory=list)
+
+    @property
+    def has_math_or_images(self) -> bool:
+        """段落是否包含公式或图像"""
+        return any(isinstance(inline, (MathInline, ImageRef)) for inline in self.inlines)
+
+    @property
+    def image_ids(self) -> List[str]:
+        """段落中引用的图像 rel_id，按出现顺序"""
+        return [inline.rel_id for inline in self.inlines if isinstance(inline, ImageRef)]
+
+    @property
+    def bold(self) -> bool:
+        """段落中是否有加粗的文本"""
+        return any(isinstance(inline, TextRun) and inline.bold for inline in self.inlines)
+
+    @property
+    def font_size(self) -> Optional[float]:
+        """段落中直接设置的最大字号（磅），未设置时为 None"""
+        sizes = [inline.font_size for inline in self.inlines
+                 if isinstance(inline, TextRun) and inline.font_size]
+        return max(sizes) if sizes else None
+
+
+@dataclass
+class TableCell:
+    """表格单元格"""
+    text: str
+    paragraphs: List[ParagraphBlock] = field(default_factory=list)
+
+
+@dataclass
+class TableBlock:
+    """表格，rows 与 python-docx 的 row.cells 一致（合并单元格会重复出现）"""
+    index: int
+    rows: List[List[TableCell]] = field(default_factory=list)
+
+
+Block = Union[ParagraphBlock, TableBlock]
+
+
+@dataclass
+class ImageResource:
+    """文档中嵌入的图像"""
+    rel_id: str
+    ext: str
+    blob: bytes
+
+    @cached_property
+    def sha256(self) -> str:
+        """图像内容的 sha256，用作 ImageStore 中的键"""
+        return hashlib.sha256(self.blob).hexdigest()
+
+
+@dataclass
+class DocumentIR:
+    """一份 docx 的中间表示"""
+    sha256: str
+    blocks: List[Block] = field(default_factory=list)
+    images: Dict[str, ImageResource] = field(default_factory=dict)
+
+    @property
+    def paragraphs(self) -> List[ParagraphBlock]:
+        """正文顶层段落，与 python-docx 的 Document.paragraphs 顺序一致"""
+        return [block for block in self.blocks
+                if isinstance(block, ParagraphBlock) and block.paragraph_index is not None]
+
+    def iter_paragraphs(self) -> Iterator[ParagraphBlock]:
+        """遍历所有段落，包括表格单元格内的段落"""
+        for block in self.blocks:
+            if isinstance(block, ParagraphBlock):
+                yield block
+            else:
+                for row in block.rows:
+                    for cell in row:
+                        yield from cell.paragraphs
+
+
+def _local(tag: str) -> str:
+    """去掉命名空间的标签名"""
+    return tag.split('}')[-1] if '}' in tag else tag
+
+
+def _attr(element, name: str) -> Optional[str]:
+    """按本地名称读取属性（忽略命名空间）"""
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _flag(rpr, name: str) -> bool:
+    """读取 w:b、w:i 等开关属性"""
+    for child in rpr:
+        if _local(child.tag) == name:
+            val = _attr(child, 'val')
+            return val is None or val.lower() not in _FALSE_VALUES
+    return False
+
+
+def _run_format(run_element) -> Dict[str, object]:
+    """读取 w:r 的直接格式"""
+    fmt: Dict[str, object] = {}
+    for child in run_element:
+        if _local(child.tag) != 'rPr':
+            continue
+        fmt['bold'] = _flag(child, 'b')
+        fmt['italic'] = _flag(child, 'i')
+        fmt['strike'] = _flag(child, 'strike')
+        for prop in child:
+            name = _local(prop.tag)
+            if name == 'u':
+                fmt['underline'] = (_attr(prop, 'val') or 'single') != 'none'
+            elif name == 'vertAlign':
+                fmt['vert_align'] = _attr(prop, 'val')
+            elif name == 'sz':
+                try:
+                    fmt['font_size'] = int(_attr(prop, 'val')) / 2
+                except (TypeError, ValueError):
+                    pass
+        break
+    return fmt
+
+
+def _collect_inlines(element, inlines: List[Inline], in_run: bool = False,
+                     fmt: Optional[Dict[str, object]] = None) -> None:
+    """一次遍历收集段落内按顺序出现的文本、公式与图像引用"""
+    for child in element:
+        tag = _local(child.tag)
+        if tag == 'r':
+            _collect_inlines(child, inlines, True, _run_format(child))
+        elif tag == 't':
+            if in_run and child.text:
+                inlines.append(TextRun(child.text, **(fmt or {})))
+        elif tag == 'oMath':
+            inlines.append(MathInline(convert_omml_to_latex(child), in_run))
+        elif tag == 'rPr':
+            continue
+        else:
+            if tag == 'drawing':
+                for node in child.iter():
+                    if _local(node.tag) == 'blip':
+                        rel_id = _attr(node, 'embed')
+                        if rel_id:
+                            inlines.append(ImageRef(rel_id))
+            # 文本框等嵌套内容
+            _collect_inlines(child, inlines, in_run, fmt)
+
+
+def _paragraph_block(paragraph: Paragraph, index: int, paragraph_index: Optional[int]) -> ParagraphBlock:
+    """构造段落块"""
+    style = paragraph.style
+    block = ParagraphBlock(
+        index=index,
+        paragraph_index=paragraph_index,
+        style_name=(style.name if style is not None else None) or '',
+        text=paragraph.text,
+    )
+    _collect_inlines(paragraph._element, block.inlines)
+    return block
+
+
+def _table_block(table: Table, index: int) -> TableBlock:
+    """构造表格块"""
+    block = TableBlock(index=index)
+    for row in table.rows:
+        cells = []
+        for cell in row.cells:
+            cells.append(TableCell(
+                text=cell.text,
+                paragraphs=[_paragraph_block(p, index, None) for p in cell.paragraphs],
+            ))
+        block.rows.append(cells)
+    return block
+
+
+def parse_docx(source: Union[str, bytes, IO[bytes]]) -> DocumentIR:
+    """
+    解析 docx 为中间表示
+
+    Args:
+        source: docx文件路径、文件内容或二进制文件对象
+
+    Returns:
+        DocumentIR: 文档中间表示
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        data = source.read()
+
+    doc = Document(io.BytesIO(data))
+    document = DocumentIR(sha256=hashlib.sha256(data).hexdigest())
+
+    for rel_id, rel in doc.part.rels.items():
+        if rel.is_external or not rel.reltype.endswith('/image'):
+            continue
+        ext = os.path.splitext(rel.target_ref)[-1] or '.png'
+        document.images[rel_id] = ImageResource(rel_id, ext, rel.target_part.blob)
+
+    paragraph_index = 0
+    for index, child in enumerate(doc.element.body.iterchildren()):
+        if isinstance(child, CT_P):
+            document.blocks.append(_paragraph_block(Paragraph(child, doc), index, paragraph_index))
+            paragraph_index += 1
+        elif isinstance(child, CT_Tbl):
+            document.blocks.append(_table_block(Table(child, doc), index))
+    return document
+
+
+_NS_W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_W = '{%s}' % _NS_W
+
+# styles.xml 中的内置样式名与 python-docx 界面名称的对应关系
+_UI_STYLE_NAMES = {'caption': 'Caption', 'footer': 'Footer', 'header': 'Header'}
+_UI_STYLE_NAMES.update({f'heading {i}': f'Heading {i}' for i in range(1, 10)})
+
+
+def _read_relationships(archive: zipfile.ZipFile, part_name: str) -> Dict[str, Dict[str, str]]:
+    """读取部件的关系表，返回 rel_id -> {type, target, external}；part_name 为空时读取包级关系表"""
+    directory, filename = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, '_rels', filename + '.rels')
+    if rels_name not in archive.namelist():
+        return {}
+    relationships = {}
+    for rel in etree.fromstring(archive.read(rels_name)).iter('{%s}Relationship' % _NS_REL):
+        target = rel.get('Target', '')
+        external = rel.get('TargetMode') == 'External'
+        if not external:
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(directory, target))
+        relationships[rel.get('Id')] = {'type': rel.get('Type', ''), 'target': target, 'external': external}
+    return relationships
+
+
+def _run_text(run_element) -> str:
+    """与 python-docx 的 Run.text 一致的文本"""
+    parts = []
+    for child in run_element:
+        tag = _local(child.tag)
+        if tag == 't':
+            parts.append(child.text or '')
+        elif tag in ('tab', 'ptab'):
+            parts.append('\t')
+        elif tag == 'cr' or (tag == 'br' and _attr(child, 'type') in (None, 'textWrapping')):
+            parts.append('\n')
+        elif tag == 'noBreakHyphen':
+            parts.append('-')
+    return ''.join(parts)
+
+
+def _paragraph_text(p_element) -> str:
+    """与 python-docx 的 Paragraph.text 一致的文本（含超链接中的文本）"""
+    parts = []
+    for child in p_element:
+        tag = _local(child.tag)
+        if tag == 'r':
+            parts.append(_run_text(child))
+        elif tag == 'hyperlink':
+            parts.extend(_run_text(r) for r in child if _local(r.tag) == 'r')
+    return ''.join(parts)
+
+
+class _ZipImages(Mapping):
+    """按需从压缩包读取图像的 rel_id -> ImageResource 映射"""
+
+    def __init__(self, archive: zipfile.ZipFile, relationships: Dict[str, Dict[str, str]]):
+        self._archive = archive
+        self._targets = {
+            rel_id: rel['target'] for rel_id, rel in relationships.items()
+            if not rel['external'] and rel['type'].endswith('/image')
+        }
+
+    def __getitem__(self, rel_id: str) -> ImageResource:
+        target = self._targets[rel_id]
+        ext = os.path.splitext(target)[-1] or '.png'
+        return ImageResource(rel_id, ext, self._archive.read(target))
+
+    def __iter__(self):
+        return iter(self._targets)
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+
+class StreamedDocument:
+    """
+    流式读取的 docx 文档
+
+    iter_blocks() 以 iterparse 逐个生成正文中的块，处理完的元素立即清理；
+    images 与 DocumentIR.images 用法相同，但图像内容在访问时才从压缩包读取。
+    段落中的文本、公式与图像引用在一次遍历中提取。
+    """
+
+    def __init__(self, source: Union[str, IO[bytes]]):
+        """
+        Args:
+            source: docx文件路径或可随机访问的二进制文件对象
+        """
+        self._archive = zipfile.ZipFile(source)
+        package_rels = _read_relationships(self._archive, '')
+        self.part_name = next(
+            (rel['target'] for rel in package_rels.values() if rel['type'].endswith('/officeDocument')),
+            'word/document.xml',
+        )
+        relationships = _read_relationships(self._archive, self.part_name)
+        self.images = _ZipImages(self._archive, relationships)
+        styles_part = next(
+            (rel['target'] for rel in relationships.values() if rel['type'].endswith('/styles')), None
+        )
+        self._style_names, self._default_style = self._read_styles(styles_part)
+
+    def _read_styles(self, styles_part: Optional[str]):
+        """读取段落样式 ID 到样式名称的映射及默认段落样式"""
+        names: Dict[str, str] = {}
+        default = 'Normal'
+        if not styles_part or styles_part not in self._archive.namelist():
+            return names, default
+        for style in etree.fromstring(self._archive.read(styles_part)).iter(_W + 'style'):
+            if style.get(_W + 'type') != 'paragraph':
+                continue
+            name_element = style.find(_W + 'name')
+            name = name_element.get(_W + 'val') if name_element is not None else style.get(_W + 'styleId')
+            name = _UI_STYLE_NAMES.get(name, name)
+            names[style.get(_W + 'styleId')] = name
+            if style.get(_W + 'default') in ('1', 'true', 'on'):
+                default = name
+        return names, default
+
+    def _style_name(self, p_element) -> str:
+        """段落的样式名称，未指定或找不到时为默认段落样式"""
+        ppr = p_element.find(_W + 'pPr')
+        pstyle = ppr.find(_W + 'pStyle') if ppr is not None else None
+        if pstyle is None:
+            return self._default_style
+        return self._style_names.get(pstyle.get(_W + 'val'), self._default_style)
+
+    def _paragraph_block(self, p_element, index: int, paragraph_index: Optional[int]) -> ParagraphBlock:
+        """由 w:p 元素构造段落块"""
+        block = ParagraphBlock(
+            index=index,
+            paragraph_index=paragraph_index,
+            style_name=self._style_name(p_element),
+            text=_paragraph_text(p_element),
+        )
+        _collect_inlines(p_element, block.inlines)
+        return block
+
+    def _table_block(self, tbl_element, index: int) -> TableBlock:
+        """由 w:tbl 元素构造表格块，横向合并的单元格按跨列数重复，纵向合并的单元格沿用上一行"""
+        block = TableBlock(index=index)
+        previous: List[TableCell] = []
+        for tr in tbl_element.iterchildren(_W + 'tr'):
+            cells: List[TableCell] = []
+            for tc in tr.iterchildren(_W + 'tc'):
+                tcpr = tc.find(_W + 'tcPr')
+                span = 1
+                continues = False
+                if tcpr is not None:
+                    grid_span = tcpr.find(_W + 'gridSpan')
+                    if grid_span is not None:
+                        span = int(grid_span.get(_W + 'val', '1'))
+                    v_merge = tcpr.find(_W + 'vMerge')
+                    continues = v_merge is not None and v_merge.get(_W + 'val', 'continue') == 'continue'
+                column = len(cells)
+                if continues and column < len(previous):
+                    cell = previous[column]
+                else:
+                    paragraphs = [self._paragraph_block(p, index, None) for p in tc.iterchildren(_W + 'p')]
+                    cell = TableCell(text='\n'.join(p.text for p in paragraphs), paragraphs=paragraphs)
+                cells.extend([cell] * span)
+            block.rows.append(cells)
+            previous = cells
+        return block
+
+    def iter_blocks(self) -> Iterator[Block]:
+        """
+        按文档顺序逐个生成正文中的段落与表格
+
+        Yields:
+            Block: ParagraphBlock 或 TableBlock
+        """
+        body_tag = _W + 'body'
+        depth = 0
+        body_depth = None
+        index = 0
+        paragraph_index = 0
+        with self._archive.open(self.part_name) as stream:
+            for event, element in etree.iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if element.tag == body_tag:
+                        body_depth = depth
+                    continue
+                depth -= 1
+                if body_depth is None or depth != body_depth:
+                    continue
+                # 正文的直接子元素已完整解析
+                if element.tag == _W + 'p':
+                    yield self._paragraph_block(element, index, paragraph_index)
+                    paragraph_index += 1
+                elif element.tag == _W + 'tbl':
+                    yield self._table_block(element, index)
+                index += 1
+                element.clear()
+                parent = element.getparent()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def close(self) -> None:
+        """关闭压缩包"""
+        self._archive.close()
+
+    def __enter__(self) -> 'StreamedDocument':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,170 @@
+"""
+内容寻址的图像存储
+图像按内容的 sha256 保存为 <root>/<前两位>/<sha256><扩展名>：文档中重复出现的标志、不同论文共用的
+插图只保存一份，同名上传也不会相互覆盖。磁盘占用与写入量只与不同图像的数量有关，与引用次数无关。
+
+图像按需落盘：materialize 在调用方确实需要文件（如写入 markdown 的图像路径）时才写入，
+文件已存在则不再写；HTML 预览直接使用内存中的字节，不经过磁盘。
+
+引用计数默认记录在 <root>/refs.sqlite3（root 对外提供访问时可通过 index_path 另行指定）：retain(owner, images) 登记某篇文档（owner，通常为文档的 sha256）
+引用的图像，release(owner) 撤销登记，并删除不再被任何文档引用的图像文件。
+未登记引用的图像（如 docx2md 命令行输出）不会被 release 删除。
+
+使用方法：
+    from tools.docx_tools.image_store import ImageStore
+
+    store = ImageStore("data/raw/docx/images")
+    store.retain(document.sha256, document.images.values())   # 先登记，再落盘
+    path = store.materialize(document.images["rId5"])
+    store.release(old_document_sha256)
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Iterable, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    owner TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (owner, sha256)
+);
+CREATE INDEX IF NOT EXISTS idx_refs_sha256 ON refs(sha256);
+"""
+
+
+def atomic_write(path: str, data: bytes) -> str:
+    """
+    原子地写入文件：先写入同目录的临时文件再替换，并发写同一路径时读者不会看到半个文件
+
+    Args:
+        path: 目标路径
+        data: 文件内容
+
+    Returns:
+        str: 目标文件的绝对路径
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+class ImageStore:
+    """按内容哈希保存图像的目录，可在多个线程、进程间共享"""
+
+    def __init__(self, root: str, index_path: Optional[str] = None):
+        """
+        Args:
+            root: 存储根目录
+            index_path: 引用计数数据库路径，默认为 <root>/refs.sqlite3
+        """
+        self.root = os.path.abspath(root)
+        self.index_path = os.path.abspath(index_path or os.path.join(self.root, 'refs.sqlite3'))
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的引用计数数据库连接，首次使用时创建"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def path(self, sha256: str, ext: str) -> str:
+        """
+        图像在存储中的路径（不保证文件已存在）
+
+        Args:
+            sha256: 图像内容的 sha256
+            ext: 扩展名，如 .png
+
+        Returns:
+            str: 绝对路径
+        """
+        return os.path.join(self.root, sha256[:2], sha256 + ext.lower())
+
+    def materialize(self, image) -> str:
+        """
+        确保图像文件存在并返回其路径，内容相同的图像只写一次
+
+        Args:
+            image (ImageResource): 文档IR中的图像
+
+        Returns:
+            str: 图像文件的绝对路径
+        """
+        path = self.path(image.sha256, image.ext)
+        if not os.path.exists(path):
+            atomic_write(path, image.blob)
+        return path
+
+    def retain(self, owner: str, images: Iterable) -> None:
+        """
+        登记 owner 引用的图像，重复登记不会重复计数
+
+        应在 materialize 之前调用，使并发的 release 不会删除即将被引用的文件。
+
+        Args:
+            owner: 引用方标识，通常为文档的 sha256
+            images (Iterable[ImageResource]): 被引用的图像
+        """
+        rows = {(owner, image.sha256, image.ext.lower()) for image in images}
+        if rows:
+            self._connect().executemany("INSERT OR IGNORE INTO refs (owner, sha256, ext) VALUES (?, ?, ?)", rows)
+
+    def release(self, owner: str) -> List[str]:
+        """
+        撤销 owner 的全部引用，并删除引用数降为零的图像文件
+
+        Args:
+            owner: 引用方标识
+
+        Returns:
+            List[str]: 被删除的图像文件路径
+        """
+        conn = self._connect()
+        removed = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            released = conn.execute("SELECT sha256, ext FROM refs WHERE owner = ?", (owner,)).fetchall()
+            conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+            for sha256, ext in released:
+                if conn.execute("SELECT 1 FROM refs WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+                    continue
+                path = self.path(sha256, ext)
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed.append(path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def ref_count(self, sha256: str) -> int:
+        """
+        图像当前被多少个 owner 引用
+
+        Args:
+            sha256: 图像内容的 sha256
+
+        Returns:
+            int: 引用数
+        """
+        return self._connect().execute("SELECT COUNT(*) FROM refs WHERE sha256 = ?", (sha256,)).fetchone()[0]
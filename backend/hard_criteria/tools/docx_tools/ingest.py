@@ -0,0 +1,418 @@
+"""
+DOCX进程内导入接口
+在当前进程内完成 docx → markdown → 论文容器（.paper） 的转换，替代依次启动 docx2md.py、md2pkl.py
+两个子进程的方式：省去解释器启动与 python-docx/lxml 的重复导入，也不再生成临时脚本。
+
+转换过程不使用模块级可变状态，可在 Streamlit 应用与批处理任务中并发调用。
+图像保存在内容寻址的图像存储（image_store.ImageStore）中，各论文共用，相同的图像只保存一份；
+每篇文档以其 sha256 登记引用；save_paper 覆盖同一输出路径上内容已变化的旧版本时，释放旧版本的引用
+（单文件导入与批量导入相同）。只调用 ingest_docx 而不保存 .paper 时，引用需由调用方自行 release。
+
+批量导入（ingest 命令）将目录或通配符匹配到的 docx 分发到进程池（默认与 CPU 核数相同）并行转换，
+每个文件有独立的超时；按内容哈希跳过上次导入后未变化的文件，结束时输出汇总报告。
+
+使用方法：
+    from tools.docx_tools.ingest import ingest_docx
+
+    paper = ingest_docx("paper.docx")               # 文件路径
+    paper = ingest_docx(uploaded_file.getvalue())   # 上传文件的字节内容
+    paper = ingest_docx(document)                   # 已解析的文档IR（docx_ir.parse_docx）
+    paper.save_paper("data/processed/docx/paper.paper")
+    chapters = paper.chapters
+
+    # 批量导入（在 backend/hard_criteria 目录下执行）
+    python -m tools.docx_tools.ingest data/raw/docx
+    python -m tools.docx_tools.ingest "data/raw/docx/2024_*.docx" -j 8 --timeout 300
+    python -m tools.docx_tools.ingest data/raw/docx --force --report ingest_report.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from config.data_config import INGEST_CONFIG, PROCESSED_DATA_DIR, RAW_DATA_DIR
+from tools.logger import get_logger
+
+from .docx2md import document_to_markdown
+from .docx_ir import DocumentIR, parse_docx
+from .image_store import ImageStore, atomic_write
+from .md2pkl import parse_markdown
+from .paper_store import PAPER_EXT, PaperFormatError, PaperReader, is_paper_file, write_paper
+
+logger = get_logger(__name__)
+
+# 默认图像存储目录，各论文共用
+DEFAULT_IMAGE_ROOT = os.path.join(RAW_DATA_DIR, 'docx', 'images')
+# 批量导入的默认输出目录
+DEFAULT_MD_DIR = os.path.join(RAW_DATA_DIR, 'docx')
+DEFAULT_PAPER_DIR = os.path.join(PROCESSED_DATA_DIR, 'docx')
+# 轮询进行中任务的间隔（秒）
+_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class PaperDocument:
+    """一篇论文的导入结果"""
+    name: str
+    sha256: str
+    markdown: str
+    image_dir: str
+    zh_abs: str = ''
+    en_abs: str = ''
+    ref: str = ''
+    chapters: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为 md2pkl 输出的字典格式
+
+        Returns:
+            Dict[str, Any]: 包含 zh_abs、en_abs、ref、chapters 的字典
+        """
+        return {
+            'zh_abs': self.zh_abs,
+            'en_abs': self.en_abs,
+            'ref': self.ref,
+            'chapters': self.chapters,
+        }
+
+    def save_paper(self, paper_path: str) -> str:
+        """
+        保存为 .paper 文件，先写入临时文件再替换，并发写同一路径时读者不会看到半个文件
+
+        覆盖由另一版本 docx 生成的 .paper 时，若同目录下没有其他 .paper 来自该版本，
+        则释放其图像引用，不再被任何文档引用的图像随之删除。
+
+        Args:
+            paper_path: 输出的.paper文件路径
+
+        Returns:
+            str: .paper文件的绝对路径
+        """
+        previous = _paper_sha256(paper_path)
+        path = write_paper(paper_path, self.to_dict(), name=self.name, sha256=self.sha256)
+        if previous and previous != self.sha256 and not _sha256_in_use(os.path.dirname(path), previous, path):
+            removed = ImageStore(self.image_dir).release(previous)
+            logger.info(f"{self.name} 的旧版本已被替换，释放图像引用，删除 {len(removed)} 个图像")
+        return path
+
+    def save_markdown(self, md_path: str) -> str:
+        """
+        保存 markdown 文本
+
+        Args:
+            md_path: 输出的markdown文件路径
+
+        Returns:
+            str: markdown文件的绝对路径
+        """
+        return atomic_write(md_path, self.markdown.encode('utf-8', errors='xmlcharrefreplace'))
+
+
+def _paper_sha256(path: str) -> str:
+    """读取 .paper 文件记录的源 docx sha256，文件不存在或无法读取时返回空字符串"""
+    if not is_paper_file(path):
+        return ''
+    try:
+        with PaperReader(path) as paper:
+            return paper.sha256
+    except (OSError, PaperFormatError):
+        return ''
+
+
+def _sha256_in_use(directory: str, sha256: str, exclude: str) -> bool:
+    """判断目录下除 exclude 外是否还有 .paper 文件来自该 sha256 的 docx"""
+    exclude = os.path.abspath(exclude)
+    for path in glob.glob(os.path.join(directory, f"*{PAPER_EXT}")):
+        if os.path.abspath(path) != exclude and _paper_sha256(path) == sha256:
+            return True
+    return False
+
+
+def ingest_docx(source: Union[str, bytes, DocumentIR], name: Optional[str] = None,
+                image_root: Optional[str] = None) -> PaperDocument:
+    """
+    在当前进程内将 docx 转换为结构化的论文数据
+
+    文档引用的图像以其 sha256 登记到图像存储，由 PaperDocument.save_paper 在输出被新版本替换时释放。
+
+    Args:
+        source: docx文件路径、文件内容或已解析的文档IR
+        name: 论文名称，默认取文件名（不含扩展名）
+        image_root: 图像存储目录，默认为 data/raw/docx/images
+
+    Returns:
+        PaperDocument: 导入结果
+
+    Raises:
+        FileNotFoundError: source 为路径且文件不存在
+        ValueError: source 为路径但不是 .docx 文件
+    """
+    if isinstance(source, DocumentIR):
+        document = source
+    elif isinstance(source, (bytes, bytearray)):
+        document = parse_docx(source)
+    else:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"未找到文件: {source}")
+        if not source.lower().endswith('.docx'):
+            raise ValueError(f"文件 {source} 不是.docx格式")
+        document = parse_docx(source)
+        name = name or os.path.splitext(os.path.basename(source))[0]
+    name = name or 'document'
+
+    image_store = ImageStore(image_root or DEFAULT_IMAGE_ROOT)
+    # 先登记引用再落盘，并发的 release 不会删除本文档即将引用的图像
+    image_store.retain(document.sha256, document.images.values())
+    markdown = document_to_markdown(document, image_store)
+    parsed = parse_markdown(markdown)
+    return PaperDocument(
+        name=name,
+        sha256=document.sha256,
+        markdown=markdown,
+        image_dir=image_store.root,
+        **parsed,
+    )
+
+
+def collect_docx_files(inputs: List[str]) -> List[str]:
+    """
+    展开输入的文件、目录与通配符，得到 docx 文件列表
+
+    Args:
+        inputs: 文件路径、目录（只取其下的 .docx）或通配符（支持 **）
+
+    Returns:
+        List[str]: 去重并排序后的 docx 绝对路径，不含 Word 的 ~$ 临时文件
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '*.docx'))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = glob.glob(item, recursive=True)
+            if not matches:
+                logger.warning(f"没有匹配的文件: {item}")
+        for path in matches:
+            name = os.path.basename(path)
+            if name.lower().endswith('.docx') and not name.startswith('~$'):
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def file_sha256(path: str) -> str:
+    """
+    计算文件内容的 sha256，与 DocumentIR.sha256 一致
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取批量导入清单，不存在或损坏时返回空清单"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取导入清单 {path}，将重新导入全部文件: {e}")
+        return {}
+
+
+def _save_manifest(path: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """写入批量导入清单"""
+    atomic_write(path, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def _ingest_worker(docx_path: str, paper_path: str, md_path: str, image_root: Optional[str]) -> Dict[str, Any]:
+    """在工作进程中导入一个文件并写出 md 与 .paper，只返回摘要信息"""
+    start = time.perf_counter()
+    paper = ingest_docx(docx_path, image_root=image_root)
+    paper.save_markdown(md_path)
+    paper.save_paper(paper_path)
+    return {
+        'sha256': paper.sha256,
+        'chapters': len(paper.chapters),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+@dataclass
+class _IngestTask:
+    """批量导入中的一个文件"""
+    name: str
+    docx_path: str
+    sha256: str
+    paper_path: str
+    md_path: str
+
+
+def ingest_batch(inputs: List[str], paper_dir: str = DEFAULT_PAPER_DIR, md_dir: str = DEFAULT_MD_DIR,
+                 image_root: Optional[str] = None, workers: Optional[int] = None,
+                 timeout: Optional[float] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    批量导入 docx 文件，在进程池中并行执行 docx → md → .paper
+
+    超时的文件会终止整个进程池并重建，同时在执行的其余文件重新排队，不计为失败。
+
+    Args:
+        inputs: 文件路径、目录或通配符
+        paper_dir: .paper 输出目录，清单文件也保存在此
+        md_dir: markdown 输出目录
+        image_root: 图像存储目录，默认为 data/raw/docx/images
+        workers: 工作进程数，默认取 INGEST_CONFIG['workers']，仍为 None 时为 CPU 核数
+        timeout: 单个文件的超时（秒），默认取 INGEST_CONFIG['timeout']
+        force: 为 True 时忽略清单，全部重新导入
+
+    Returns:
+        Dict[str, Any]: 汇总报告，包含 total、converted、skipped、failed、timed_out、elapsed
+    """
+    start = time.perf_counter()
+    timeout = timeout or INGEST_CONFIG['timeout']
+    manifest_path = os.path.join(paper_dir, INGEST_CONFIG['manifest_name'])
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    files = collect_docx_files(inputs)
+    report: Dict[str, Any] = {
+        'total': len(files), 'converted': [], 'skipped': [], 'failed': [], 'timed_out': [],
+    }
+
+    tasks = deque()
+    sources: Dict[str, str] = {}
+    for docx_path in files:
+        name = os.path.splitext(os.path.basename(docx_path))[0]
+        if name in sources:
+            report['failed'].append({'name': name, 'source': docx_path,
+                                     'error': f"与 {sources[name]} 重名，输出文件会相互覆盖"})
+            continue
+        sources[name] = docx_path
+        sha256 = file_sha256(docx_path)
+        paper_path = os.path.join(paper_dir, f"{name}{PAPER_EXT}")
+        entry = manifest.get(name)
+        if entry and entry.get('sha256') == sha256 and os.path.exists(paper_path):
+            report['skipped'].append({'name': name, 'source': docx_path})
+            continue
+        tasks.append(_IngestTask(name, docx_path, sha256, paper_path, os.path.join(md_dir, f"{name}.md")))
+
+    workers = max(1, min(workers or INGEST_CONFIG['workers'] or os.cpu_count() or 1, len(tasks) or 1))
+    if tasks:
+        logger.info(f"待导入 {len(tasks)} 个文件，跳过 {len(report['skipped'])} 个未变化的文件，"
+                    f"使用 {workers} 个进程")
+
+    pool = None
+    running: Dict[str, Any] = {}
+    try:
+        while tasks or running:
+            if pool is None:
+                pool = multiprocessing.Pool(workers)
+            while tasks and len(running) < workers:
+                task = tasks.popleft()
+                result = pool.apply_async(_ingest_worker,
+                                          (task.docx_path, task.paper_path, task.md_path, image_root))
+                running[task.name] = (task, result, time.monotonic() + timeout)
+
+            time.sleep(_POLL_INTERVAL)
+            now = time.monotonic()
+            expired = False
+            for name, (task, result, deadline) in list(running.items()):
+                if result.ready():
+                    del running[name]
+                    try:
+                        info = result.get()
+                    except Exception as e:
+                        logger.error(f"导入失败: {task.docx_path}: {e}")
+                        report['failed'].append({'name': name, 'source': task.docx_path, 'error': str(e)})
+                        continue
+                    logger.info(f"已导入: {name}（{info['chapters']} 章，{info['seconds']} 秒）")
+                    report['converted'].append({'name': name, 'source': task.docx_path, **info})
+                    manifest[name] = {
+                        'source': task.docx_path,
+                        'sha256': info['sha256'],
+                        'paper': os.path.abspath(task.paper_path),
+                        'md': os.path.abspath(task.md_path),
+                        'ingested_at': time.time(),
+                    }
+                    _save_manifest(manifest_path, manifest)
+                elif now > deadline:
+                    del running[name]
+                    expired = True
+                    logger.error(f"导入超时（{timeout} 秒）: {task.docx_path}")
+                    report['timed_out'].append({'name': name, 'source': task.docx_path})
+
+            if expired:
+                # 无法单独终止池中的某个进程：重建进程池，其余进行中的文件重新排队
+                for task, _, _ in running.values():
+                    tasks.appendleft(task)
+                running.clear()
+                pool.terminate()
+                pool.join()
+                pool = None
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    report['elapsed'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def main() -> int:
+    """批量导入命令行入口"""
+    parser = argparse.ArgumentParser(
+        description='并行将 docx 文件批量转换为 md 与 .paper',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+            使用示例：
+            python -m tools.docx_tools.ingest data/raw/docx
+            python -m tools.docx_tools.ingest "data/raw/docx/**/*.docx" -j 8 --timeout 300
+            python -m tools.docx_tools.ingest a.docx b.docx --force --report report.json
+        """
+    )
+    parser.add_argument('inputs', nargs='+', help='docx 文件、目录或通配符')
+    parser.add_argument('-o', '--output', default=DEFAULT_PAPER_DIR, help='.paper 输出目录（默认：data/processed/docx）')
+    parser.add_argument('--md-dir', default=DEFAULT_MD_DIR, help='markdown 输出目录（默认：data/raw/docx）')
+    parser.add_argument('--image-root', help='图像存储目录（默认：data/raw/docx/images）')
+    parser.add_argument('-j', '--workers', type=int, help='工作进程数（默认：CPU 核数）')
+    parser.add_argument('--timeout', type=float, help=f"单个文件的超时秒数（默认：{INGEST_CONFIG['timeout']}）")
+    parser.add_argument('--force', action='store_true', help='忽略清单，全部重新导入')
+    parser.add_argument('--report', help='将汇总报告另存为 JSON 文件')
+    args = parser.parse_args()
+
+    report = ingest_batch(args.inputs, paper_dir=args.output, md_dir=args.md_dir, image_root=args.image_root,
+                          workers=args.workers, timeout=args.timeout, force=args.force)
+
+    logger.info(f"导入完成：共 {report['total']} 个文件，转换 {len(report['converted'])}，"
+                f"跳过 {len(report['skipped'])}，失败 {len(report['failed'])}，"
+                f"超时 {len(report['timed_out'])}，耗时 {report['elapsed']} 秒")
+    for item in report['failed']:
+        logger.info(f"  失败: {item['source']}: {item['error']}")
+    for item in report['timed_out']:
+        logger.info(f"  超时: {item['source']}")
+    if args.report:
+        atomic_write(args.report, json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'))
+        logger.info(f"汇总报告已保存到: {os.path.abspath(args.report)}")
+    return 1 if report['failed'] or report['timed_out'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 """
-Markdown转PKL工具
-将Markdown文件转换为结构化的Pickle文件，提取论文的各个部分
+Markdown转论文容器工具
+将Markdown文件转换为结构化的论文容器（.paper，见 paper_store.py），提取论文的各个部分
 
 功能特性：
 - 自动提取中文和英文摘要
 - 提取参考文献部分
 - 按章节分割内容
 - 提取图片路径信息
-- 保存为结构化的PKL格式
+- 保存为带版本号与章节索引的 .paper 格式（SQLite），读取时不执行 pickle 代码
 
 支持的文档结构：
 - 摘要部分：**摘要** 和 **ABSTRACT**
@@ -18,28 +18,32 @@ Markdown转PKL工具
 - 图片：![...](图片路径)
 
 依赖要求：
-    Python标准库（re, os, pickle, argparse）
+    Python标准库（re, os, sqlite3, argparse）
 
 使用方法：
     python md2pkl.py <markdown文件路径> [选项]
     
 命令行参数：
     md_file             输入的Markdown文件路径（必需）
-    -o, --output        输出的PKL文件路径（可选，默认为输入文件名.pkl）
+    -o, --output        输出的.paper文件路径（可选，默认为输入文件名.paper）
 
 使用示例：
     # 基本用法（输出文件自动命名）
     python md2pkl.py document.md
     
     # 指定输出文件
-    python md2pkl.py document.md -o output.pkl
+    python md2pkl.py document.md -o output.paper
     
     # 作为模块导入使用
-    from md2pkl import convert_md_to_pkl
-    convert_md_to_pkl("input.md", "output.pkl")
+    from md2pkl import convert_md_to_paper
+    convert_md_to_paper("input.md", "output.paper")
+
+    # 直接从Markdown文本得到结构化数据
+    from md2pkl import parse_markdown
+    data = parse_markdown(md)
 
 输出格式：
-    PKL文件包含以下字段：
+    .paper 文件包含以下字段（paper_store.read_paper 读取为字典）：
     - zh_abs: 中文摘要
     - en_abs: 英文摘要  
     - ref: 参考文献
@@ -58,9 +62,22 @@ Markdown转PKL工具
 
 import re
 import os
-import pickle
 import argparse
 
+try:
+    from .md_sections import MarkdownIndex
+    from .paper_store import PAPER_EXT, write_paper
+except ImportError:
+    # 作为脚本直接运行时
+    from md_sections import MarkdownIndex
+    from paper_store import PAPER_EXT, write_paper
+
+# 章节标题：第一章、第二章……
+CHAPTER_TITLE_RE = re.compile(r'第[一二三四五六七八九十]+章')
+# 结束前一章的一级标题
+CHAPTER_END_RE = re.compile(r'第[一二三四五六七八九十]+章|参考文献|致谢|附录')
+IMAGE_PATH_RE = re.compile(r'!\[[^\]]*\]\(([^)]+)\)')
+
 def read_md(path):
     """
     读取Markdown文件内容
@@ -115,6 +132,9 @@ def extract_reference(md):
 def extract_chapters(md):
     """
     提取章节内容
+
+    章节为 "# 第X章" 一级标题，到下一章或 # 参考文献、# 致谢、# 附录 为止，
+    其间的其他一级标题（如 # 结论）归入前一章。标题位置由 MarkdownIndex 一次扫描得到。
     
     Args:
         md (str): Markdown文本内容
@@ -122,60 +142,67 @@ def extract_chapters(md):
     Returns:
         list: 章节列表，每个章节包含名称、图片和内容
     """
-    # 匹配所有章节（# 第一章 ... # 第二章 ... # 第三章 ...）
-    # 章节标题格式：# 第一章 ...\n
-    # 找到所有章节标题的位置
-    chapter_iter = list(re.finditer(r'(^# 第[一二三四五六七八九十]+章[\s\S]*?)(?=^# 第[一二三四五六七八九十]+章|^# 参考文献|^# 致谢|^# 附录|\Z)', md, re.MULTILINE))
+    index = MarkdownIndex(md)
+    headings = index.at_level(1)
+    # 章节结束于下一个章节标题或参考文献、致谢、附录：自后向前一次求出每个标题之后最近的结束位置
+    ends = [len(md)] * len(headings)
+    end = len(md)
+    for i in range(len(headings) - 1, -1, -1):
+        ends[i] = end
+        if CHAPTER_END_RE.match(headings[i].title):
+            end = headings[i].start
     chapters = []
-    for m in chapter_iter:
-        chapter_block = m.group(1)
-        # 章节名
-        chapter_name_match = re.match(r'^# (第[一二三四五六七八九十]+章[\s\S]*?)\n', chapter_block)
-        chapter_name = chapter_name_match.group(1).strip() if chapter_name_match else ''
-        # 图片路径
-        images = re.findall(r'!\[[^\]]*\]\(([^)]+)\)', chapter_block)
-        # 正文内容（去掉章节名）
-        content = chapter_block
-        if chapter_name:
-            content = content[len('# '+chapter_name):].lstrip('\n')
+    for heading, end in zip(headings, ends):
+        if not CHAPTER_TITLE_RE.match(heading.title):
+            continue
+        chapter_block = md[heading.start:end]
         chapters.append({
-            'chapter_name': chapter_name,
-            'images': images,
-            'content': content.strip()
+            'chapter_name': heading.title.strip(),
+            # 图片路径
+            'images': IMAGE_PATH_RE.findall(chapter_block),
+            # 正文内容（去掉章节名）
+            'content': md[heading.body_start:end].strip()
         })
     return chapters
 
-def convert_md_to_pkl(md_path, pkl_path):
+def parse_markdown(md):
     """
-    将Markdown文件转换为PKL文件的主要函数
+    从Markdown文本中提取摘要、参考文献和章节
+    
+    Args:
+        md (str): Markdown文本内容
+        
+    Returns:
+        dict: 包含 zh_abs、en_abs、ref、chapters 的结构化数据
+    """
+    zh_abs, en_abs = extract_abstracts(md)
+    return {
+        'zh_abs': zh_abs,
+        'en_abs': en_abs,
+        'ref': extract_reference(md),
+        'chapters': extract_chapters(md)
+    }
+
+def convert_md_to_paper(md_path, paper_path):
+    """
+    将Markdown文件转换为 .paper 文件的主要函数
     
     Args:
         md_path (str): 输入的Markdown文件路径
-        pkl_path (str): 输出的PKL文件路径
+        paper_path (str): 输出的.paper文件路径
         
     Returns:
         bool: 转换是否成功
     """
     try:
-        md = read_md(md_path)
-        zh_abs, en_abs = extract_abstracts(md)
-        ref = extract_reference(md)
-        chapters = extract_chapters(md)
+        data = parse_markdown(read_md(md_path))
+        zh_abs, en_abs = data['zh_abs'], data['en_abs']
+        ref, chapters = data['ref'], data['chapters']
         
-        data = {
-            'zh_abs': zh_abs,
-            'en_abs': en_abs,
-            'ref': ref,
-            'chapters': chapters
-        }
-        
-        # 确保输出目录存在
-        os.makedirs(os.path.dirname(pkl_path), exist_ok=True)
-        
-        with open(pkl_path, 'wb') as f:
-            pickle.dump(data, f)
+        name = os.path.splitext(os.path.basename(md_path))[0]
+        paper_path = write_paper(paper_path, data, name=name)
             
-        print(f'✓ 转换成功！已保存到: {pkl_path}')
+        print(f'✓ 转换成功！已保存到: {paper_path}')
         print(f'  - 中文摘要: {"已提取" if zh_abs else "未找到"}')
         print(f'  - 英文摘要: {"已提取" if en_abs else "未找到"}')
         print(f'  - 参考文献: {"已提取" if ref else "未找到"}')
@@ -186,24 +213,27 @@ def convert_md_to_pkl(md_path, pkl_path):
         print(f'✗ 转换失败: {str(e)}')
         return False
 
+# 兼容旧名称
+convert_md_to_pkl = convert_md_to_paper
+
 def main():
     """
     命令行入口函数
     处理命令行参数并调用转换函数
     """
     parser = argparse.ArgumentParser(
-        description='将Markdown文件转换为结构化的PKL格式',
+        description='将Markdown文件转换为结构化的.paper格式',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
             使用示例：
             python md2pkl.py document.md
-            python md2pkl.py document.md -o output.pkl
-            python md2pkl.py thesis.md --output thesis.pkl
+            python md2pkl.py document.md -o output.paper
+            python md2pkl.py thesis.md --output thesis.paper
         """
     )
     
     parser.add_argument('md_file', help='输入的Markdown文件路径')
-    parser.add_argument('-o', '--output', help='输出的PKL文件路径（默认为输入文件名.pkl）')
+    parser.add_argument('-o', '--output', help='输出的.paper文件路径（默认为输入文件名.paper）')
     
     args = parser.parse_args()
     
@@ -214,14 +244,14 @@ def main():
     
     # 确定输出路径
     if args.output:
-        pkl_path = args.output
+        paper_path = args.output
     else:
-        # 默认输出路径：与输入文件同名但扩展名为.pkl
-        pkl_path = os.path.splitext(args.md_file)[0] + '.pkl'
+        # 默认输出路径：与输入文件同名但扩展名为.paper
+        paper_path = os.path.splitext(args.md_file)[0] + PAPER_EXT
     
     # 执行转换
-    print(f'开始转换: {args.md_file} -> {pkl_path}')
-    success = convert_md_to_pkl(args.md_file, pkl_path)
+    print(f'开始转换: {args.md_file} -> {paper_path}')
+    success = convert_md_to_paper(args.md_file, paper_path)
     
     if not success:
         exit(1)
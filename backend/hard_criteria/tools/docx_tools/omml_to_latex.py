@@ -1,63 +1,159 @@
 """
 OMML (Office Math Markup Language) to LaTeX converter
 This module provides functions to convert Microsoft Word math equations to LaTeX format.
+
+The symbol table, regular expressions and command-spacing pattern are compiled once at
+import time and shared by a single module-level converter. convert_omml_to_latex memoizes
+results by the canonical (exclusive C14N) bytes of the OMML element, so formulas that
+repeat within or across documents are converted only once.
 """
 
 import re
+import threading
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
 from lxml import etree
 
 
+SYMBOL_MAP = {
+    # Greek letters
+    'α': '\\alpha', 'β': '\\beta', 'γ': '\\gamma', 'δ': '\\delta',
+    'ε': '\\epsilon', 'ζ': '\\zeta', 'η': '\\eta', 'θ': '\\theta',
+    'ι': '\\iota', 'κ': '\\kappa', 'λ': '\\lambda', 'μ': '\\mu',
+    'ν': '\\nu', 'ξ': '\\xi', 'ο': 'o', 'π': '\\pi',
+    'ρ': '\\rho', 'σ': '\\sigma', 'τ': '\\tau', 'υ': '\\upsilon',
+    'φ': '\\phi', 'χ': '\\chi', 'ψ': '\\psi', 'ω': '\\omega',
+    
+    # Capital Greek letters
+    'Α': 'A', 'Β': 'B', 'Γ': '\\Gamma', 'Δ': '\\Delta',
+    'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Θ': '\\Theta',
+    'Ι': 'I', 'Κ': 'K', 'Λ': '\\Lambda', 'Μ': 'M',
+    'Ν': 'N', 'Ξ': '\\Xi', 'Ο': 'O', 'Π': '\\Pi',
+    'Ρ': 'P', 'Σ': '\\Sigma', 'Τ': 'T', 'Υ': '\\Upsilon',
+    'Φ': '\\Phi', 'Χ': 'X', 'Ψ': '\\Psi', 'Ω': '\\Omega',
+    
+    # Mathematical operators
+    '∞': '\\infty', '∑': '\\sum', '∫': '\\int', '∂': '\\partial',
+    '∇': '\\nabla', '∆': '\\Delta', '∏': '\\prod',
+    
+    # Relations
+    '≤': '\\leq', '≥': '\\geq', '≠': '\\neq', '≈': '\\approx',
+    '≡': '\\equiv', '∝': '\\propto', '∼': '\\sim',
+    
+    # Set theory
+    '∈': '\\in', '∉': '\\notin', '⊂': '\\subset', '⊆': '\\subseteq',
+    '⊃': '\\supset', '⊇': '\\supseteq', '∪': '\\cup', '∩': '\\cap',
+    '∅': '\\emptyset', '∀': '\\forall', '∃': '\\exists',
+    
+    # Arrows
+    '→': '\\rightarrow', '←': '\\leftarrow', '↔': '\\leftrightarrow',
+    '⇒': '\\Rightarrow', '⇐': '\\Leftarrow', '⇔': '\\Leftrightarrow',
+    '↑': '\\uparrow', '↓': '\\downarrow', '↕': '\\updownarrow',
+    
+    # Other symbols
+    '±': '\\pm', '∓': '\\mp', '×': '\\times', '÷': '\\div',
+    '·': '\\cdot', '∘': '\\circ', '√': '\\sqrt', '∝': '\\propto',
+    '∠': '\\angle', '⊥': '\\perp', '∥': '\\parallel',
+    '~': '\\sim',  # ASCII tilde mapped to \sim (within math)
+    # Additional mappings for calligraphic/blackboard symbols and variants used in formulas
+    'ℒ': '\\mathcal{L}',  # Script L
+    '𝒟': '\\mathcal{D}',  # Script D (uppercase)
+    'ℰ': '\\mathbb{E}',  # Blackboard bold E (alternative)
+    '𝔼': '\\mathbb{E}',  # Blackboard bold E (common)
+    'ϕ': '\\varphi',      # Variant phi
+}
+
+# Single-pass symbol translation: every key is one code point and no replacement contains a key
+_SYMBOL_TABLE = str.maketrans(SYMBOL_MAP)
+
+# Map common n-ary operators
+NARY_OPERATOR_MAP = {
+    '∑': '\\sum',
+    '∫': '\\int',
+    '∏': '\\prod',
+    '⋃': '\\bigcup',
+    '⋂': '\\bigcap',
+    '⋁': '\\bigvee',
+    '⋀': '\\bigwedge',
+    'max': '\\operatorname*{max}',
+    'min': '\\operatorname*{min}',
+}
+
+# LaTeX commands that should have spaces after them.
+# Note: The short command \\in is deliberately excluded to avoid interfering
+# with longer commands like \\infty or \\int; it is handled by _IN_BEFORE_UPPER_RE.
+SPACED_COMMANDS = [
+    'rightarrow', 'leftarrow', 'leftrightarrow', 'Rightarrow',
+    'Leftarrow', 'Leftrightarrow', 'uparrow', 'downarrow', 'updownarrow',
+    'subseteq', 'supseteq', 'subset', 'supset',
+    'notin', 'neq', 'approx', 'equiv', 'propto',
+    'parallel', 'emptyset', 'forall', 'exists',
+    'geq', 'leq', 'pm', 'mp', 'times', 'div',
+    'cdot', 'circ', 'sqrt', 'angle', 'perp',
+    'infty', 'partial', 'nabla',
+    # Greek letters and variants
+    'Gamma', 'Delta', 'Theta', 'Lambda', 'Xi', 'Pi',
+    'Sigma', 'Upsilon', 'Phi', 'Psi', 'Omega',
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta',
+    'eta', 'theta', 'iota', 'kappa', 'lambda', 'mu',
+    'nu', 'xi', 'pi', 'rho', 'sigma', 'tau',
+    'upsilon', 'phi', 'chi', 'psi', 'omega',
+    'cup', 'cap', 'sim',
+]
+
+# One alternation, longest command first, so \\subseteq is never split as \\subset + eq.
+# Group 2 captures the following character only when it is alphanumeric.
+_COMMAND_SPACING_RE = re.compile(
+    r'(\\(?:%s))(?=([a-zA-Z0-9])?)' % '|'.join(sorted(SPACED_COMMANDS, key=len, reverse=True))
+)
+# "\\inD" -> "\\in D"; longer commands like \\infty or \\int start with lowercase letters
+_IN_BEFORE_UPPER_RE = re.compile(r'\\in([A-Z])')
+
+# Equation numbers like #(2-1), #(3-4), #\\left( 2−1 \\right)
+_EQUATION_NUMBER_RE = re.compile(r'#\([^)]+\)')
+_LEFT_RIGHT_EQUATION_NUMBER_RE = re.compile(r'#\\left\([^)]+\\right\)')
+# Standalone # that aren't part of LaTeX commands
+_STRAY_HASH_RE = re.compile(r'(?<!\\)#(?![a-zA-Z])')
+# Double backslashes in LaTeX commands (except for line breaks)
+_DOUBLE_BACKSLASH_RE = re.compile(r'\\\\(?!\\|$)')
+_TRAILING_COMMA_RE = re.compile(r'\s*,\s*$')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Memo of canonical OMML bytes -> LaTeX
+CACHE_SIZE = 4096
+
+
+def _space_command(match):
+    """Append a space to a command that is immediately followed by an alphanumeric character."""
+    return match.group(1) + ' ' if match.group(2) else match.group(1)
+
+
 class OmmlToLatexConverter:
     """Converter class for OMML to LaTeX transformation."""
     
     def __init__(self):
-        self.symbol_map = {
-            # Greek letters
-            'α': '\\alpha', 'β': '\\beta', 'γ': '\\gamma', 'δ': '\\delta',
-            'ε': '\\epsilon', 'ζ': '\\zeta', 'η': '\\eta', 'θ': '\\theta',
-            'ι': '\\iota', 'κ': '\\kappa', 'λ': '\\lambda', 'μ': '\\mu',
-            'ν': '\\nu', 'ξ': '\\xi', 'ο': 'o', 'π': '\\pi',
-            'ρ': '\\rho', 'σ': '\\sigma', 'τ': '\\tau', 'υ': '\\upsilon',
-            'φ': '\\phi', 'χ': '\\chi', 'ψ': '\\psi', 'ω': '\\omega',
-            
-            # Capital Greek letters
-            'Α': 'A', 'Β': 'B', 'Γ': '\\Gamma', 'Δ': '\\Delta',
-            'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Θ': '\\Theta',
-            'Ι': 'I', 'Κ': 'K', 'Λ': '\\Lambda', 'Μ': 'M',
-            'Ν': 'N', 'Ξ': '\\Xi', 'Ο': 'O', 'Π': '\\Pi',
-            'Ρ': 'P', 'Σ': '\\Sigma', 'Τ': 'T', 'Υ': '\\Upsilon',
-            'Φ': '\\Phi', 'Χ': 'X', 'Ψ': '\\Psi', 'Ω': '\\Omega',
-            
-            # Mathematical operators
-            '∞': '\\infty', '∑': '\\sum', '∫': '\\int', '∂': '\\partial',
-            '∇': '\\nabla', '∆': '\\Delta', '∏': '\\prod',
-            
-            # Relations
-            '≤': '\\leq', '≥': '\\geq', '≠': '\\neq', '≈': '\\approx',
-            '≡': '\\equiv', '∝': '\\propto', '∼': '\\sim',
-            
-            # Set theory
-            '∈': '\\in', '∉': '\\notin', '⊂': '\\subset', '⊆': '\\subseteq',
-            '⊃': '\\supset', '⊇': '\\supseteq', '∪': '\\cup', '∩': '\\cap',
-            '∅': '\\emptyset', '∀': '\\forall', '∃': '\\exists',
-            
-            # Arrows
-            '→': '\\rightarrow', '←': '\\leftarrow', '↔': '\\leftrightarrow',
-            '⇒': '\\Rightarrow', '⇐': '\\Leftarrow', '⇔': '\\Leftrightarrow',
-            '↑': '\\uparrow', '↓': '\\downarrow', '↕': '\\updownarrow',
-            
-            # Other symbols
-            '±': '\\pm', '∓': '\\mp', '×': '\\times', '÷': '\\div',
-            '·': '\\cdot', '∘': '\\circ', '√': '\\sqrt', '∝': '\\propto',
-            '∠': '\\angle', '⊥': '\\perp', '∥': '\\parallel',
-            '~': '\\sim',  # ASCII tilde mapped to \sim (within math)
-            # Additional mappings for calligraphic/blackboard symbols and variants used in formulas
-            'ℒ': '\\mathcal{L}',  # Script L
-            '𝒟': '\\mathcal{D}',  # Script D (uppercase)
-            'ℰ': '\\mathbb{E}',  # Blackboard bold E (alternative)
-            '𝔼': '\\mathbb{E}',  # Blackboard bold E (common)
-            'ϕ': '\\varphi',      # Variant phi
+        self.symbol_map = SYMBOL_MAP
+        self._handlers = {
+            'oMath': self.convert_omath,
+            'f': self.convert_fraction,
+            'sSup': self.convert_superscript,
+            'sSub': self.convert_subscript,
+            'sSubSup': self.convert_subsuperscript,
+            'rad': self.convert_radical,
+            'nary': self.convert_nary,
+            'd': self.convert_delimiter,
+            'm': self.convert_matrix,
+            'func': self.convert_function,
+            'acc': self.convert_accent,
+            'bar': self.convert_bar,
+            'box': self.convert_box,
+            'borderBox': self.convert_border_box,
+            'groupChr': self.convert_group_char,
+            'limLow': self.convert_limit_lower,
+            'limUpp': self.convert_limit_upper,
+            'r': self.convert_run,
+            't': self.convert_text,
+            'sym': self.convert_symbol,
         }
     
     def _get_attr(self, element, attr_name):
@@ -75,53 +171,11 @@ class OmmlToLatexConverter:
             return ""
         
         tag = element.tag.split('}')[-1] if '}' in element.tag else element.tag
-        
-        if tag == 'oMath':
-            return self.convert_omath(element)
-        elif tag == 'f':
-            return self.convert_fraction(element)
-        elif tag == 'sSup':
-            return self.convert_superscript(element)
-        elif tag == 'sSub':
-            return self.convert_subscript(element)
-        elif tag == 'sSubSup':
-            return self.convert_subsuperscript(element)
-        elif tag == 'rad':
-            return self.convert_radical(element)
-        elif tag == 'nary':
-            return self.convert_nary(element)
-        elif tag == 'd':
-            return self.convert_delimiter(element)
-        elif tag == 'm':
-            return self.convert_matrix(element)
-        elif tag == 'func':
-            return self.convert_function(element)
-        elif tag == 'acc':
-            return self.convert_accent(element)
-        elif tag == 'bar':
-            return self.convert_bar(element)
-        elif tag == 'box':
-            return self.convert_box(element)
-        elif tag == 'borderBox':
-            return self.convert_border_box(element)
-        elif tag == 'groupChr':
-            return self.convert_group_char(element)
-        elif tag == 'limLow':
-            return self.convert_limit_lower(element)
-        elif tag == 'limUpp':
-            return self.convert_limit_upper(element)
-        elif tag == 'r':
-            return self.convert_run(element)
-        elif tag == 't':
-            return self.convert_text(element)
-        elif tag == 'sym':
-            return self.convert_symbol(element)
-        else:
-            # For unknown elements, try to process children
-            result = ""
-            for child in element:
-                result += self.convert_element(child)
-            return result
+        handler = self._handlers.get(tag)
+        if handler is not None:
+            return handler(element)
+        # For unknown elements, try to process children
+        return "".join(self.convert_element(child) for child in element)
     
     def convert_omath(self, element):
         """Convert oMath element."""
@@ -230,20 +284,7 @@ class OmmlToLatexConverter:
             elif tag == 'e':
                 base = self.convert_element(child)
         
-        # Map common n-ary operators
-        operator_map = {
-            '∑': '\\sum',
-            '∫': '\\int',
-            '∏': '\\prod',
-            '⋃': '\\bigcup',
-            '⋂': '\\bigcap',
-            '⋁': '\\bigvee',
-            '⋀': '\\bigwedge',
-            'max': '\\operatorname*{max}',
-            'min': '\\operatorname*{min}',
-        }
-        
-        latex_op = operator_map.get(char, char)
+        latex_op = NARY_OPERATOR_MAP.get(char, char)
         
         if sub and sup:
             return f"{latex_op}_{{{sub}}}^{{{sup}}} {base}"
@@ -517,90 +558,46 @@ class OmmlToLatexConverter:
             return '\\mid'
 
         # Replace symbols with LaTeX equivalents first
-        for symbol, latex in self.symbol_map.items():
-            text = text.replace(symbol, latex)
+        text = text.translate(_SYMBOL_TABLE)
 
         # Don't escape special characters in math mode as they might be part of LaTeX commands
         # Just remove problematic equation numbering patterns
-        import re
-
-        # Remove equation numbers like #(2-1), #(3-4), etc.
-        text = re.sub(r'#\([^)]+\)', '', text)
-
-        # Remove standalone # that aren't part of LaTeX commands
-        text = re.sub(r'(?<!\\)#(?![a-zA-Z])', '', text)
+        text = _EQUATION_NUMBER_RE.sub('', text)
+        text = _STRAY_HASH_RE.sub('', text)
 
         return text
 
     def add_spaces_after_latex_commands(self, text):
         """Add spaces after LaTeX commands for proper formatting."""
-        import re
-
-        # List of LaTeX commands that should have spaces after them
-        # Note: The short command \\in is deliberately excluded to avoid interfering
-        # with longer commands like \\infty or \\int. If needed, callers should
-        # insert explicit spaces around \\in themselves.
-        latex_commands = [
-            r'\\rightarrow', r'\\leftarrow', r'\\leftrightarrow', r'\\Rightarrow',
-            r'\\Leftarrow', r'\\Leftrightarrow', r'\\uparrow', r'\\downarrow', r'\\updownarrow',
-            r'\\subseteq', r'\\supseteq', r'\\subset', r'\\supset',
-            r'\\notin', r'\\neq', r'\\approx', r'\\equiv', r'\\propto',
-            r'\\parallel', r'\\emptyset', r'\\forall', r'\\exists',
-            r'\\geq', r'\\leq', r'\\pm', r'\\mp', r'\\times', r'\\div',
-            r'\\cdot', r'\\circ', r'\\sqrt', r'\\angle', r'\\perp',
-            r'\\infty', r'\\partial', r'\\nabla',
-            # Greek letters and variants
-            r'\\Gamma', r'\\Delta', r'\\Theta', r'\\Lambda', r'\\Xi', r'\\Pi',
-            r'\\Sigma', r'\\Upsilon', r'\\Phi', r'\\Psi', r'\\Omega',
-            r'\\alpha', r'\\beta', r'\\gamma', r'\\delta', r'\\epsilon', r'\\zeta',
-            r'\\eta', r'\\theta', r'\\iota', r'\\kappa', r'\\lambda', r'\\mu',
-            r'\\nu', r'\\xi', r'\\pi', r'\\rho', r'\\sigma', r'\\tau',
-            r'\\upsilon', r'\\phi', r'\\chi', r'\\psi', r'\\omega',
-            r'\\cup', r'\\cap', r'\\sim'
-        ]
-
-        # Process longer commands first to reduce partial-match issues
-        latex_commands.sort(key=len, reverse=True)
-
         # Add space after LaTeX commands if they are immediately followed by
-        # an alphanumeric character *and* the command itself is not a prefix
-        # of a longer command (handled above via ordering and exclusion).
-        for cmd in latex_commands:
-            pattern = f'({cmd})(?=[a-zA-Z0-9])'
-            text = re.sub(pattern, r'\1 ', text)
+        # an alphanumeric character
+        text = _COMMAND_SPACING_RE.sub(_space_command, text)
 
         # Special-case: ensure a space after membership operator "\\in" when followed by
-        # an uppercase identifier (e.g. "\\inD" -> "\\in D").  This will *not* match
-        # when the next letters form longer commands like "\\infty" or "\\int" because
-        # they start with lowercase letters.
-        text = re.sub(r'\\in([A-Z])', r'\\in \1', text)
-
-        return text
+        # an uppercase identifier (e.g. "\\inD" -> "\\in D").
+        return _IN_BEFORE_UPPER_RE.sub(r'\\in \1', text)
     
     def clean_latex_output(self, latex_text):
         """Clean and post-process LaTeX output."""
         if not latex_text:
             return latex_text
 
-        import re
-
         # Remove equation numbers and references that cause issues
-        # Pattern like #(2-1), #(3-4), #\left( 2−1 \right), etc.
-        latex_text = re.sub(r'#\([^)]+\)', '', latex_text)
-        latex_text = re.sub(r'#\\left\([^)]+\\right\)', '', latex_text)
+        latex_text = _EQUATION_NUMBER_RE.sub('', latex_text)
+        latex_text = _LEFT_RIGHT_EQUATION_NUMBER_RE.sub('', latex_text)
 
         # Remove standalone # characters that aren't part of LaTeX commands
-        latex_text = re.sub(r'(?<!\\)#(?![a-zA-Z])', '', latex_text)
+        latex_text = _STRAY_HASH_RE.sub('', latex_text)
 
         # Fix double backslashes in LaTeX commands (except for line breaks)
-        latex_text = re.sub(r'\\\\(?!\\|$)', r'\\', latex_text)
+        latex_text = _DOUBLE_BACKSLASH_RE.sub(r'\\', latex_text)
 
         # Add proper spacing after LaTeX commands
         latex_text = self.add_spaces_after_latex_commands(latex_text)
 
         # Clean up extra spaces and commas at the end
-        latex_text = re.sub(r'\s*,\s*$', '', latex_text)
-        latex_text = re.sub(r'\s+', ' ', latex_text).strip()
+        latex_text = _TRAILING_COMMA_RE.sub('', latex_text)
+        latex_text = _WHITESPACE_RE.sub(' ', latex_text).strip()
 
         return latex_text
 
@@ -622,7 +619,45 @@ class OmmlToLatexConverter:
         return self.symbol_map.get(char_val, char_val)
 
 
+_converter = OmmlToLatexConverter()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def canonical_omml(omml_element):
+    """
+    Return the canonical bytes of an lxml OMML element, used as the memo key.
+
+    Exclusive C14N only keeps the namespace declarations the formula uses, so the key does not
+    depend on the declarations of the enclosing document.
+    """
+    return etree.tostring(omml_element, method='c14n', exclusive=True)
+
+
 def convert_omml_to_latex(omml_element):
-    """Convenience function to convert OMML to LaTeX."""
-    converter = OmmlToLatexConverter()
-    return converter.omml_to_latex(omml_element)
+    """
+    Convenience function to convert OMML to LaTeX.
+
+    Uses the shared module-level converter. Results for lxml elements are memoized by their
+    canonical bytes in an LRU cache of CACHE_SIZE entries.
+    """
+    if not etree.iselement(omml_element):
+        return _converter.omml_to_latex(omml_element)
+    key = canonical_omml(omml_element)
+    with _cache_lock:
+        latex = _cache.get(key)
+        if latex is not None:
+            _cache.move_to_end(key)
+            return latex
+    latex = _converter.omml_to_latex(omml_element)
+    with _cache_lock:
+        _cache[key] = latex
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return latex
+
+
+def clear_cache():
+    """Drop all memoized conversions."""
+    with _cache_lock:
+        _cache.clear()
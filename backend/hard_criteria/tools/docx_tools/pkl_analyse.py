@@ -1,18 +1,21 @@
-import pickle
+from paper_store import PaperReader
 
-f_path = '/Users/yang/Documents/bupt/code/github/paper_eval/backend/hard_metrics/data/processed/docx/龚礼盛-本科毕业论文.pkl'
+f_path = '/Users/yang/Documents/bupt/code/github/paper_eval/backend/hard_metrics/data/processed/docx/龚礼盛-本科毕业论文.paper'
 
-with open(f_path, 'rb') as f:
-    data = pickle.load(f) # data 是一个字典，包含4个键：'zh_abs', 'en_abs', 'ref' 和 'chapters'
+with PaperReader(f_path) as paper: # paper 为只读的论文容器，元数据与章节按需读取
+    cn_abs = paper.zh_abs # cn_abs 是字符串类型，存储中文摘要
+    eng_abs = paper.en_abs # eng_abs 是字符串类型，存储英文摘要
+    ref = paper.ref # ref 是字符串类型，存储参考文献
 
-c = list(data.keys())
-cn_abs = data['zh_abs'] # cn_abs 是字符串类型，存储中文摘要
-eng_abs = data['en_abs'] # eng_abs 是字符串类型，存储英文摘要
-ref = data['ref'] # ref 是字符串类型，存储参考文献
+    # 只读取章节名，不读取正文
+    chapter_names = paper.chapter_names()
 
-# chapters 是列表，每个元素都是一个字典
-# 每个字典有3个键：'chapter_name'（章节名称）, 'content'（内容）, 'images'（图片）
-# 使用 data['chapters'][0]['content'] 可以获取第1章的文本内容
-chapters = data['chapters'] 
+    # 每个章节是一个字典，有3个键：'chapter_name'（章节名称）, 'content'（内容）, 'images'（图片）
+    # 使用 paper.chapter(0)['content'] 可以获取第1章的文本内容
+    first_chapter = paper.chapter(0)
 
-pass
\ No newline at end of file
+    # 读取为与旧 pkl 相同结构的字典：包含4个键 'zh_abs', 'en_abs', 'ref' 和 'chapters'
+    data = paper.to_dict()
+    chapters = data['chapters']
+
+pass
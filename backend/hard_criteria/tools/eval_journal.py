@@ -0,0 +1,146 @@
+"""
+评估断点日志
+将 full_paper_eval 每个已完成的评估单元（章节评估、整体评估、评分）追加写入 JSONL 文件，
+进程崩溃或被中断后可从日志恢复，已完成的单元不再重复请求模型。
+
+每条记录形如：
+    {"stage": "chapter", "key": "3", "fingerprint": "...", "result": {...}, "time": 1700000000.0}
+
+fingerprint 由该单元的输入（章节内容、上游评估结果）与模型名称计算，
+输入发生变化的单元在恢复时会被重新评估。
+
+使用方法：
+    from tools.eval_journal import EvalJournal
+
+    journal = EvalJournal(journal_path_for(output_path), resume=True)
+    fingerprint = journal.fingerprint(model_name, chapter["content"])
+    evaluation = journal.get("chapter", chapter["index"], fingerprint)
+    if evaluation is None:
+        evaluation = process_chapter(chapter, model_name)
+        journal.record("chapter", chapter["index"], fingerprint, evaluation)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def journal_path_for(output_path: str) -> str:
+    """
+    根据评估结果输出路径得到对应的断点日志路径
+
+    Args:
+        output_path: 评估结果 JSON 文件路径
+
+    Returns:
+        str: 同目录下的 <name>.journal.jsonl
+    """
+    return os.path.splitext(output_path)[0] + ".journal.jsonl"
+
+
+class EvalJournal:
+    """追加写入的评估断点日志，可在多个线程间共享"""
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Args:
+            path: 日志文件路径
+            resume: True 时加载已有记录并继续追加；False 时清空旧日志重新开始
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def fingerprint(*parts: Any) -> str:
+        """
+        计算评估单元输入的指纹
+
+        Args:
+            *parts: 决定评估结果的输入，如模型名称、章节内容、上游评估结果
+
+        Returns:
+            str: sha256 十六进制摘要
+        """
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self) -> None:
+        """读取已有日志，跳过崩溃时写了一半的末行"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                    self._entries[(entry["stage"], str(entry["key"]))] = entry
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    logger.warning(f"跳过断点日志中无法解析的第 {line_no} 行: {self.path}")
+        if self._entries:
+            logger.info(f"从断点日志恢复 {len(self._entries)} 条记录: {self.path}")
+
+    def get(self, stage: str, key: Any, fingerprint: str) -> Optional[Any]:
+        """
+        查询已完成的评估单元
+
+        输入指纹不一致或上次结果带有 error 的单元视为未完成。
+
+        Args:
+            stage: 阶段名称，chapter、overall 或 score
+            key: 单元在阶段内的标识，如章节序号
+            fingerprint: 当前输入的指纹
+
+        Returns:
+            Optional[Any]: 已完成单元的结果，未完成时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get((stage, str(key)))
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        result = entry.get("result")
+        if isinstance(result, dict) and "error" in result:
+            return None
+        return result
+
+    def record(self, stage: str, key: Any, fingerprint: str, result: Any) -> None:
+        """
+        追加一条已完成单元的记录并立即落盘
+
+        Args:
+            stage: 阶段名称
+            key: 单元在阶段内的标识
+            fingerprint: 输入指纹
+            result: 评估结果，需可 JSON 序列化
+        """
+        entry = {
+            "stage": stage,
+            "key": str(key),
+            "fingerprint": fingerprint,
+            "result": result,
+            "time": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[(stage, str(key))] = entry
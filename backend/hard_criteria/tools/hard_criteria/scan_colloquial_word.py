@@ -1,143 +1,290 @@
+"""
+主观用词扫描
+用 Aho-Corasick 自动机对全文只扫描一次，找出 COLLOQUIAL_WORD_CONFIG 中的主观用词（默认为"我们""我"等），
+句子边界与章节标题的偏移各自预先计算一次，每个命中位置二分查找所在的句子与最近的章节、小节，
+总耗时与文本长度成线性关系，适用于整本论文长度的章节。
+
+使用方法：
+    from tools.hard_criteria.scan_colloquial_word import scan_colloquial_hits, scan_colloquial_words
+
+    hits = scan_colloquial_hits(text)          # 结构化结果，含偏移、句子与章节
+    descriptions = scan_colloquial_words(text) # 每个句子一条自然语言描述
+
+    python -m tools.hard_criteria.scan_colloquial_word
+"""
+
 import re
-from typing import List
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.data_config import COLLOQUIAL_WORD_CONFIG
+
+UNKNOWN_CHAPTER = "未知章节"
+UNKNOWN_SUBCHAPTER = "未知小节"
+
+# 句子：不含中文句号、问号、感叹号、分号与换行符的最长片段
+_SENTENCE_RE = re.compile(r'[^。！？；\n]+')
+# 一级、二级标题（允许行首缩进），三级及以下标题不参与定位
+_HEADING_RE = re.compile(r'^[ \t]*(#{1,2})[ \t]+([^#\n].*?)[ \t]*$', re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class ColloquialHit:
+    """一处主观用词"""
+    word: str
+    start: int                  # 词在原文中的起始偏移
+    end: int                    # 词在原文中的结束偏移
+    sentence: str               # 所在句子（去除首尾空白）
+    sentence_start: int         # 所在句子在原文中的起始偏移
+    chapter: str                # 最近的一级标题，没有时为"未知章节"
+    subchapter: Optional[str]   # 该一级标题之后最近的二级标题，没有时为 None
+
+
+class WordAutomaton:
+    """Aho-Corasick 自动机，一次扫描找出文本中全部词的所有出现位置"""
+
+    def __init__(self, words: Iterable[str]):
+        """
+        Args:
+            words: 词表
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for word in words:
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            if word not in self._out[state]:
+                self._out[state].append(word)
+
+        # 按层次遍历建立失配指针，并合并失配状态上的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        遍历文本中的全部匹配（包括互相重叠的匹配）
+
+        Args:
+            text: 待扫描的文本
+
+        Yields:
+            Tuple[int, int, str]: (起始偏移, 结束偏移, 词)，按结束偏移排列
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for word in out[state]:
+                yield i + 1 - len(word), i + 1, word
+
+
+class _HeadingLocator:
+    """一级、二级标题的偏移数组，二分查找任意位置之前最近的章节与小节"""
+
+    def __init__(self, text: str):
+        self._positions: List[int] = []
+        self._states: List[Tuple[str, Optional[str]]] = []
+        chapter, subchapter = UNKNOWN_CHAPTER, None
+        for match in _HEADING_RE.finditer(text):
+            title = match.group(2).strip()
+            if len(match.group(1)) == 1:
+                chapter, subchapter = title, None
+            else:
+                subchapter = title
+            self._positions.append(match.start(1))
+            self._states.append((chapter, subchapter))
+
+    def locate(self, pos: int) -> Tuple[str, Optional[str]]:
+        """位置 pos 之前最近的一级标题，及该一级标题之后最近的二级标题"""
+        i = bisect_left(self._positions, pos)
+        return self._states[i - 1] if i else (UNKNOWN_CHAPTER, None)
 
-def scan_colloquial_words(text: str) -> List[str]:
+
+class ColloquialScanner:
+    """主观用词扫描器，词表对应的自动机只构建一次，可重复用于多段文本"""
+
+    def __init__(self, words: Optional[Iterable[str]] = None, ignore: Optional[Iterable[str]] = None):
+        """
+        Args:
+            words: 需要报告的主观用词，默认取 COLLOQUIAL_WORD_CONFIG['words']
+            ignore: 包含主观用词但不报告的词（如"我国"），默认取 COLLOQUIAL_WORD_CONFIG['ignore']
+        """
+        self.words = list(COLLOQUIAL_WORD_CONFIG['words'] if words is None else words)
+        self.ignore = set(COLLOQUIAL_WORD_CONFIG['ignore'] if ignore is None else ignore)
+        self._rank = {word: i for i, word in enumerate(self.words)}
+        self._automaton = WordAutomaton(self.words + sorted(self.ignore))
+
+    def find_words(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        查找文本中的主观用词
+
+        重叠的匹配按"最左、最长"保留一个，例如"我们"不会再报告其中的"我"，"我国"整体被忽略。
+
+        Args:
+            text: 待扫描的文本
+
+        Returns:
+            List[Tuple[int, int, str]]: (起始偏移, 结束偏移, 词)，按出现顺序排列
+        """
+        matches = sorted(self._automaton.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        found = []
+        last_end = 0
+        for start, end, word in matches:
+            if start < last_end:
+                continue
+            last_end = end
+            if word not in self.ignore:
+                found.append((start, end, word))
+        return found
+
+    def scan(self, text: str) -> List[ColloquialHit]:
+        """
+        扫描文本，返回每处主观用词及其所在的句子、章节与小节
+
+        Args:
+            text: markdown 文本
+
+        Returns:
+            List[ColloquialHit]: 按出现顺序排列的命中结果
+        """
+        found = self.find_words(text)
+        if not found:
+            return []
+        sentences = [(m.start(), m.end()) for m in _SENTENCE_RE.finditer(text)]
+        sentence_starts = [start for start, _ in sentences]
+        locator = _HeadingLocator(text)
+
+        hits = []
+        for start, end, word in found:
+            # 主观用词不含句子分隔符，必然落在某个句子之内
+            sentence_start, sentence_end = sentences[bisect_right(sentence_starts, start) - 1]
+            chapter, subchapter = locator.locate(sentence_start)
+            hits.append(ColloquialHit(
+                word=word,
+                start=start,
+                end=end,
+                sentence=text[sentence_start:sentence_end].strip(),
+                sentence_start=sentence_start,
+                chapter=chapter,
+                subchapter=subchapter,
+            ))
+        return hits
+
+    def rank(self, word: str) -> int:
+        """词在词表中的顺序，用于排列同一句中的多个词"""
+        return self._rank.get(word, len(self._rank))
+
+
+@lru_cache(maxsize=None)
+def default_scanner() -> ColloquialScanner:
     """
-    检测输入字符串中是否包含"我"和"我们"，并返回自然语言描述的检测结果
-    
+    按 COLLOQUIAL_WORD_CONFIG 构建的扫描器，每个进程只构建一次
+
+    Returns:
+        ColloquialScanner: 扫描器
+    """
+    return ColloquialScanner()
+
+
+def scan_colloquial_hits(text: str, scanner: Optional[ColloquialScanner] = None) -> List[ColloquialHit]:
+    """
+    扫描文本中的主观用词，返回结构化结果
+
     Args:
         text (str): 输入的文本字符串
-        
+        scanner (ColloquialScanner): 扫描器，默认使用 default_scanner()
+
     Returns:
-        List[str]: 返回自然语言描述的检测结果列表
+        List[ColloquialHit]: 按出现顺序排列的命中结果
     """
-    # 定义目标词汇
-    target_words = ["我们", "我"]
-    
-    # 定义句子分隔符的正则表达式
-    # 包括中文句号、问号、感叹号、分号、换行符等
-    sentence_pattern = r'[。！？；\n]+'
-    
-    # 分割文本为句子，同时保留分隔符位置信息
-    sentences = re.split(sentence_pattern, text)
-    
-    # 存储结果
+    return (scanner or default_scanner()).scan(text)
+
+
+def scan_colloquial_words(text: str, scanner: Optional[ColloquialScanner] = None) -> List[str]:
+    """
+    检测输入字符串中的主观用词（默认为"我们""我"等），并返回自然语言描述的检测结果
+
+    Args:
+        text (str): 输入的文本字符串
+        scanner (ColloquialScanner): 扫描器，默认使用 default_scanner()
+
+    Returns:
+        List[str]: 返回自然语言描述的检测结果列表，每个句子一条
+    """
+    scanner = scanner or default_scanner()
+
+    # 同一句中的多个命中合并为一条描述
+    sentences: Dict[int, List[ColloquialHit]] = {}
+    for hit in scanner.scan(text):
+        sentences.setdefault(hit.sentence_start, []).append(hit)
+
     results = []
-    
-    # 当前位置索引，用于定位句子在原文中的位置
-    current_pos = 0
-    
-    for sentence in sentences:
-        # 去除首尾空白字符
-        sentence_clean = sentence.strip()
-        
-        # 跳过空句子
-        if not sentence_clean:
-            # 更新位置（包括原句子长度和分隔符）
-            current_pos += len(sentence)
-            # 寻找下一个分隔符的长度
-            remaining_text = text[current_pos:]
-            delimiter_match = re.match(sentence_pattern, remaining_text)
-            if delimiter_match:
-                current_pos += len(delimiter_match.group())
-            continue
-        
-        # 找到句子在原文中的位置
-        sentence_start = text.find(sentence, current_pos)
-        if sentence_start == -1:
-            sentence_start = current_pos
-        
-        # 查找该句子之前最近的章节标题
-        text_before_sentence = text[:sentence_start]
-        chapter_title, sub_chapter_title = find_nearest_chapter(text_before_sentence)
-        
+    for hits in sentences.values():
+        first = hits[0]
         # 替换标题中的空格为下划线
-        chapter_title = chapter_title.replace(" ", "_")
-        
+        chapter_title = first.chapter.replace(" ", "_")
         # 如果没有找到小节，则使用章节名代替
-        if sub_chapter_title == "未知小节":
-            display_sub_title = chapter_title
-        else:
-            display_sub_title = sub_chapter_title.replace(" ", "_")
-        
-        # 检查句子中是否包含目标词汇
-        # 优先检测"我们"，如果检测到"我们"就不再检测"我"
-        description = ""
-        if "我们" in sentence_clean:
-            # 构造自然语言描述
-            description = f"在 {chapter_title} 的 {display_sub_title} 小节的原文 “{sentence_clean}” 中检测到主观用词“我们”"
-        elif "我" in sentence_clean:
-            # 构造自然语言描述
-            description = f"在 {chapter_title} 的 {display_sub_title} 小节的原文 “{sentence_clean}” 中检测到主观用词“我”"
-        
-        if description:
-            results.append(description)
-        
-        # 更新位置
-        current_pos = sentence_start + len(sentence)
-        # 寻找下一个分隔符的长度
-        remaining_text = text[current_pos:]
-        delimiter_match = re.match(sentence_pattern, remaining_text)
-        if delimiter_match:
-            current_pos += len(delimiter_match.group())
-    
+        display_sub_title = first.subchapter.replace(" ", "_") if first.subchapter else chapter_title
+        words = sorted({hit.word for hit in hits}, key=scanner.rank)
+        word_text = "、".join(f"“{word}”" for word in words)
+        results.append(f"在 {chapter_title} 的 {display_sub_title} 小节的原文 “{first.sentence}” 中检测到主观用词{word_text}")
     return results
 
 
 def find_nearest_chapter(text: str) -> tuple[str, str]:
     """
     在给定文本中查找最近的章节标题（一级和二级）
-    
+
     Args:
         text (str): 要搜索的文本
-        
+
     Returns:
-        tuple[str, str]: 最近的一级和二级章节标题，如果没找到返回"未知章节"
+        tuple[str, str]: 最近的一级和二级章节标题，如果没找到返回"未知章节"、"未知小节"
     """
-    # 查找所有一级和二级章节标题
-    # 使用 re.MULTILINE 标志，使 `^` 匹配每行的开头
-    # 一级标题：以'# '开头，后面不能是'#'
-    main_chapter_pattern = r'^\s*#\s+([^#\n].*?)\s*$'
-    # 二级标题：以'## '开头，后面不能是'#'
-    sub_chapter_pattern = r'^\s*##\s+([^#\n].*?)\s*$'
-    
-    latest_main_chapter = "未知章节"
-    latest_main_pos = -1
-    
-    # 查找最近的一级标题
-    for match in re.finditer(main_chapter_pattern, text, re.MULTILINE):
-        if match.start() > latest_main_pos:
-            latest_main_pos = match.start()
-            latest_main_chapter = match.group(1).strip()
-            
-    latest_sub_chapter = "未知小节"
-    latest_sub_pos = -1
-    
-    # 查找最近的二级标题（且在最近的一级标题之后）
-    for match in re.finditer(sub_chapter_pattern, text, re.MULTILINE):
-        if match.start() > latest_main_pos and match.start() > latest_sub_pos:
-            latest_sub_pos = match.start()
-            latest_sub_chapter = match.group(1).strip()
-
-    return latest_main_chapter, latest_sub_chapter
+    chapter, subchapter = _HeadingLocator(text).locate(len(text))
+    return chapter, subchapter or UNKNOWN_SUBCHAPTER
 
 
 def print_colloquial_word_sentences(text: str) -> None:
     """
-    检测并打印包含"我"和"我们"的句子的自然语言描述
-    
+    检测并打印包含主观用词的句子的自然语言描述
+
     Args:
         text (str): 输入的文本字符串
     """
     results = scan_colloquial_words(text)
-    
+
     if not results:
-        print("未检测到包含'我'或'我们'的句子。")
+        print("未检测到包含主观用词的句子。")
         return
-    
+
     print(f"检测到 {len(results)} 个包含主观用词的句子：")
     print("-" * 60)
-    
+
     for i, description in enumerate(results, 1):
         print(f"{i}. {description}")
         print()
@@ -145,16 +292,15 @@ def print_colloquial_word_sentences(text: str) -> None:
 
 def has_colloquial_words(text: str) -> bool:
     """
-    检查文本中是否包含"我"或"我们"
-    
+    检查文本中是否包含主观用词
+
     Args:
         text (str): 输入的文本字符串
-        
+
     Returns:
         bool: 如果包含目标词汇返回True，否则返回False
     """
-    target_words = ["我", "我们"]
-    return any(word in text for word in target_words)
+    return bool(default_scanner().find_words(text))
 
 
 # 示例使用
@@ -197,7 +343,7 @@ if __name__ == "__main__":
     
     # 检查是否包含目标词汇
     has_words = has_colloquial_words(test_text)
-    print(f"是否包含'我'或'我们'：{has_words}")
+    print(f"是否包含主观用词：{has_words}")
     
     print("\n详细结果：")
     for i, description in enumerate(results, 1):
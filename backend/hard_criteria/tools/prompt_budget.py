@@ -0,0 +1,175 @@
+"""
+提示词预算工具
+按 MODEL_CONFIG 中各模型的 max_length 控制单次请求的 token 数：
+超长的章节在 ## / ### 标题处切分为多个子请求，过短的段落（如中英文摘要）合并为一个请求，
+使单次请求的延迟有上限，同时尽量减少请求总数。
+
+使用方法：
+    from tools.prompt_budget import content_budget, split_content, pack_contents
+
+    budget = content_budget(p_chapter_assessment, "deepseek-chat")
+    counter = token_counter("deepseek-chat")
+    parts = split_content(chapter_content, budget, counter)   # 每段不超过预算
+    groups = pack_contents(short_texts, budget, counter)       # 短文本合并后的分组
+"""
+
+import re
+from functools import partial
+from typing import Callable, List, Optional
+
+from config.model_config import MODEL_CONFIG, PROMPT_BUDGET_CONFIG
+from tools.token_count import tokenizer_service
+
+# 二级、三级标题行，切分点位于标题之前
+_HEADING_RE = re.compile(r'^(?=#{2,3} )', re.MULTILINE)
+# 空行之后，即段落的起始位置
+_PARAGRAPH_RE = re.compile(r'(?<=\n\n)')
+
+TokenCounter = Callable[[str], int]
+
+
+def count_tokens(text: str, model_name: str = "deepseek-chat") -> int:
+    """
+    计算文本的 token 数
+
+    Args:
+        text: 待计数的文本
+        model_name: 模型名称，决定使用的分词器
+
+    Returns:
+        int: token 数
+    """
+    return tokenizer_service.count_tokens(text, model_name)
+
+
+def token_counter(model_name: str) -> TokenCounter:
+    """
+    获取指定模型的 token 计数函数
+
+    Args:
+        model_name: 模型名称
+
+    Returns:
+        TokenCounter: 可传给 split_content、pack_contents 的计数函数
+    """
+    return partial(count_tokens, model_name=model_name)
+
+
+def content_budget(template: str, model_name: str, counter: Optional[TokenCounter] = None) -> int:
+    """
+    计算提示词模板中 {content} 可用的 token 数
+
+    Args:
+        template: 含 {content} 占位符的提示词模板
+        model_name: 模型名称，对应 MODEL_CONFIG 的键
+        counter: token 计数函数，默认使用该模型的分词器
+
+    Returns:
+        int: 正文可用的 token 数，至少为 PROMPT_BUDGET_CONFIG['min_content_tokens']
+    """
+    counter = counter or token_counter(model_name)
+    max_length = MODEL_CONFIG.get(model_name, {}).get('max_length', PROMPT_BUDGET_CONFIG['default_max_length'])
+    template_tokens = counter(template.replace('{content}', ''))
+    budget = max_length - template_tokens - PROMPT_BUDGET_CONFIG['reserved_tokens']
+    return max(budget, PROMPT_BUDGET_CONFIG['min_content_tokens'])
+
+
+def _split_on(pattern: re.Pattern, text: str) -> List[str]:
+    """在零宽模式匹配处切分文本，各片段拼接后与原文一致"""
+    return [piece for piece in pattern.split(text) if piece]
+
+
+def _hard_split(text: str, budget: int, counter: TokenCounter) -> List[str]:
+    """无法按结构切分时，按字符数近似切分"""
+    tokens = max(counter(text), 1)
+    chunk_chars = max(1, len(text) * budget // tokens)
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+
+
+def _merge_pieces(pieces: List[str], budget: int, counter: TokenCounter) -> List[str]:
+    """将连续的小片段合并为不超过预算的块"""
+    chunks: List[str] = []
+    current = ""
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = counter(piece)
+        if current and current_tokens + piece_tokens > budget:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        current += piece
+        current_tokens += piece_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_content(content: str, budget: int, counter: Optional[TokenCounter] = None) -> List[str]:
+    """
+    将超出预算的正文切分为多段
+
+    依次尝试在 ## / ### 标题处、空行处切分，仍然过长的段落按字符数切分；
+    相邻的小节会被合并，使段数尽量少。
+
+    Args:
+        content: 章节正文（markdown）
+        budget: 每段可用的 token 数
+        counter: token 计数函数，默认使用 count_tokens
+
+    Returns:
+        List[str]: 切分后的正文，未超出预算时只含原文一项
+    """
+    counter = counter or count_tokens
+    if counter(content) <= budget:
+        return [content]
+
+    pieces: List[str] = []
+    for section in _split_on(_HEADING_RE, content):
+        if counter(section) <= budget:
+            pieces.append(section)
+            continue
+        for paragraph in _split_on(_PARAGRAPH_RE, section):
+            if counter(paragraph) <= budget:
+                pieces.append(paragraph)
+            else:
+                pieces.extend(_hard_split(paragraph, budget, counter))
+    return _merge_pieces(pieces, budget, counter)
+
+
+def pack_contents(contents: List[str], budget: int, counter: Optional[TokenCounter] = None) -> List[List[int]]:
+    """
+    将相邻的短文本打包进同一个请求
+
+    只有不超过 PROMPT_BUDGET_CONFIG['pack_threshold'] 的文本会被打包，
+    每个包的总 token 数不超过预算；其余文本单独成组。
+
+    Args:
+        contents: 文本列表
+        budget: 每个请求可用的 token 数
+        counter: token 计数函数，默认使用 count_tokens
+
+    Returns:
+        List[List[int]]: 分组后的文本下标，保持原有顺序
+    """
+    if counter is None:
+        token_counts = tokenizer_service.count_tokens(list(contents))
+    else:
+        token_counts = [counter(content) for content in contents]
+    threshold = PROMPT_BUDGET_CONFIG['pack_threshold']
+    groups: List[List[int]] = []
+    pack: List[int] = []
+    pack_tokens = 0
+    for i, tokens in enumerate(token_counts):
+        if tokens > threshold:
+            if pack:
+                groups.append(pack)
+                pack, pack_tokens = [], 0
+            groups.append([i])
+            continue
+        if pack and pack_tokens + tokens > budget:
+            groups.append(pack)
+            pack, pack_tokens = [], 0
+        pack.append(i)
+        pack_tokens += tokens
+    if pack:
+        groups.append(pack)
+    return groups
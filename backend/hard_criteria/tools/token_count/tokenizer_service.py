@@ -0,0 +1,296 @@
+"""
+Token 计数服务
+统一的 token 计数入口：每个进程内每种分词器只加载一次，支持批量计数；
+未安装 transformers 或分词器文件缺失时退回纯 Python 的近似计数。
+
+可选地启动一个常驻的本地计数进程，由它持有已加载的分词器，
+Streamlit 等频繁重载模块的进程通过本地连接请求计数，避免反复加载分词器。
+请求与响应均为 JSON（文本列表进、计数列表出），不传输 pickle 对象；
+连接以环境变量 PAPER_EVAL_TOKENIZER_AUTHKEY 中的密钥认证，未设置时计数进程拒绝启动，
+默认只允许监听本机回环地址，对外监听需显式传入 --allow-remote。
+
+分词器来源：
+- deepseek: 本目录下的 tokenizer.json / tokenizer_config.json（与工作目录无关）
+- qwen: Qwen/Qwen3-0.6B
+- 其余模型（如 gemini）使用近似计数
+
+使用方法：
+    from tools.token_count.tokenizer_service import count_tokens
+
+    n = count_tokens("一段文本", "deepseek-chat")
+    counts = count_tokens(["文本1", "文本2"], "qwen")
+
+    # 启动常驻计数进程（配置见 config/model_config.py 中的 TOKENIZER_CONFIG）
+    PAPER_EVAL_TOKENIZER_AUTHKEY=<部署密钥> python -m tools.token_count.tokenizer_service --serve
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import re
+import sys
+import threading
+import warnings
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Union
+
+from config.model_config import TOKENIZER_CONFIG
+
+TOKENIZER_DIR = os.path.dirname(os.path.abspath(__file__))
+# 计数进程认证密钥所在的环境变量
+AUTHKEY_ENV = "PAPER_EVAL_TOKENIZER_AUTHKEY"
+# 单条请求或响应的最大字节数
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# 分词器名称 -> (from_pretrained 的来源, 额外参数)
+# 只有本目录下随仓库提供的 deepseek 分词器需要 trust_remote_code，Hub 上的分词器不执行远端代码
+TOKENIZER_SOURCES = {
+    'deepseek': (TOKENIZER_DIR, {'trust_remote_code': True}),
+    'qwen': ('Qwen/Qwen3-0.6B', {}),
+}
+
+_tokenizers: Dict[str, Any] = {}
+# 每种分词器一把加载锁，加载某一分词器时不阻塞其他分词器的计数
+_tokenizer_locks: Dict[str, threading.Lock] = {}
+_tokenizers_lock = threading.Lock()
+_worker_disabled = False
+
+_CJK_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿　-〿＀-￯]')
+_WORD_RE = re.compile(r'[A-Za-z]+|\d+|[^\sA-Za-z\d㐀-䶿一-鿿豈-﫿　-〿＀-￯]')
+
+
+def tokenizer_name(model_name: str) -> Optional[str]:
+    """
+    获取模型对应的分词器名称
+
+    Args:
+        model_name: 模型名称，如 deepseek-chat、qwen、gemini
+
+    Returns:
+        Optional[str]: TOKENIZER_SOURCES 中的键，没有对应分词器时返回 None
+    """
+    if model_name.startswith("deepseek"):
+        return 'deepseek'
+    if model_name.startswith("qwen"):
+        return 'qwen'
+    return None
+
+
+def get_tokenizer(name: str) -> Optional[Any]:
+    """
+    获取分词器实例，每个进程只加载一次，加载失败的结果同样被缓存
+
+    Args:
+        name: 分词器名称，TOKENIZER_SOURCES 中的键
+
+    Returns:
+        Optional[Any]: transformers 分词器，不可用时返回 None
+    """
+    if name in _tokenizers:
+        return _tokenizers[name]
+    with _tokenizers_lock:
+        lock = _tokenizer_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name in _tokenizers:
+            return _tokenizers[name]
+        tokenizer = None
+        if name in TOKENIZER_SOURCES:
+            source, kwargs = TOKENIZER_SOURCES[name]
+            try:
+                from tools.torch_helper import get_transformers
+                transformers = get_transformers()
+                tokenizer = transformers.AutoTokenizer.from_pretrained(source, **kwargs)
+            except Exception as e:
+                warnings.warn(f"分词器 {name} 不可用，使用近似计数: {e}")
+        _tokenizers[name] = tokenizer
+        return tokenizer
+
+
+def approximate_tokens(text: str) -> int:
+    """
+    纯 Python 的近似 token 计数
+
+    中文字符及全角标点按 0.6 token/字，英文单词与数字串按 1.3 token/个，其余符号各计 1。
+
+    Args:
+        text: 待计数的文本
+
+    Returns:
+        int: 近似 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    words = 0
+    symbols = 0
+    for match in _WORD_RE.finditer(text):
+        if match.group()[0].isalnum():
+            words += 1
+        else:
+            symbols += 1
+    return int(cjk * 0.6 + words * 1.3 + symbols + 0.5)
+
+
+def _count_local(texts: List[str], name: Optional[str]) -> List[int]:
+    """在当前进程内批量计数"""
+    tokenizer = get_tokenizer(name) if name else None
+    if tokenizer is not None:
+        try:
+            encoded = tokenizer(texts, add_special_tokens=False)['input_ids']
+            return [len(ids) for ids in encoded]
+        except Exception as e:
+            warnings.warn(f"分词器 {name} 编码失败，使用近似计数: {e}")
+    return [approximate_tokens(text) for text in texts]
+
+
+def _worker_address():
+    """读取常驻计数进程的地址，未配置时返回 None"""
+    address = os.getenv("PAPER_EVAL_TOKENIZER_WORKER") or TOKENIZER_CONFIG['worker_address']
+    if not address:
+        return None
+    if isinstance(address, str) and ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+def _authkey() -> Optional[bytes]:
+    """读取计数进程的认证密钥，未设置时返回 None"""
+    key = os.getenv(AUTHKEY_ENV)
+    return key.encode('utf-8') if key else None
+
+
+def _is_loopback(host: str) -> bool:
+    """判断监听地址是否为本机回环地址"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _count_remote(texts: List[str], name: Optional[str]) -> Optional[List[int]]:
+    """请求常驻计数进程计数，连接失败后本进程不再尝试"""
+    global _worker_disabled
+    address = _worker_address()
+    if address is None or _worker_disabled:
+        return None
+    authkey = _authkey()
+    if authkey is None:
+        warnings.warn(f"未设置环境变量 {AUTHKEY_ENV}，不连接 token 计数进程，改为本进程计数")
+        _worker_disabled = True
+        return None
+    try:
+        with Client(address, authkey=authkey) as conn:
+            conn.send_bytes(json.dumps({'name': name, 'texts': texts}, ensure_ascii=False).encode('utf-8'))
+            counts = json.loads(conn.recv_bytes(MAX_MESSAGE_BYTES))
+        if not isinstance(counts, list) or len(counts) != len(texts) \
+                or not all(isinstance(n, int) for n in counts):
+            raise ValueError("计数进程返回的结果格式不正确")
+        return counts
+    except Exception as e:
+        warnings.warn(f"无法连接 token 计数进程 {address}，改为本进程计数: {e}")
+        _worker_disabled = True
+        return None
+
+
+def count_tokens(texts: Union[str, List[str]], model_name: str = "deepseek-chat") -> Union[int, List[int]]:
+    """
+    计算文本的 token 数
+
+    Args:
+        texts: 单个文本或文本列表，列表会被批量编码
+        model_name: 模型名称，决定使用的分词器
+
+    Returns:
+        Union[int, List[int]]: 与输入对应的 token 数
+    """
+    single = isinstance(texts, str)
+    batch = [texts] if single else list(texts)
+    if not batch:
+        return []
+    name = tokenizer_name(model_name)
+    counts = _count_remote(batch, name)
+    if counts is None:
+        counts = _count_local(batch, name)
+    return counts[0] if single else counts
+
+
+def _handle_request(payload: bytes) -> bytes:
+    """
+    处理一次计数请求
+
+    Args:
+        payload: JSON 请求 {"name": 分词器名称或 null, "texts": [文本, ...]}
+
+    Returns:
+        bytes: JSON 计数列表
+    """
+    request = json.loads(payload)
+    name = request.get('name') if isinstance(request, dict) else None
+    texts = request.get('texts') if isinstance(request, dict) else None
+    if name is not None and name not in TOKENIZER_SOURCES:
+        raise ValueError(f"未知的分词器: {name!r}")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise ValueError("texts 必须是字符串列表")
+    return json.dumps(_count_local(texts, name)).encode('utf-8')
+
+
+def serve(address=None, allow_remote: Optional[bool] = None) -> None:
+    """
+    启动常驻计数进程，加载分词器后循环处理计数请求
+
+    Args:
+        address: 监听地址，默认取 TOKENIZER_CONFIG['worker_address']
+        allow_remote: 是否允许监听非回环地址，默认取 TOKENIZER_CONFIG['allow_remote']
+
+    Raises:
+        RuntimeError: 未设置认证密钥，或未允许时监听非回环地址
+    """
+    authkey = _authkey()
+    if authkey is None:
+        raise RuntimeError(f"未设置环境变量 {AUTHKEY_ENV}，拒绝启动 token 计数进程")
+    address = address or _worker_address() or ('127.0.0.1', 6399)
+    if allow_remote is None:
+        allow_remote = TOKENIZER_CONFIG['allow_remote']
+    if isinstance(address, tuple) and not allow_remote and not _is_loopback(address[0]):
+        raise RuntimeError(f"拒绝监听非回环地址 {address[0]}，确需对外提供服务时请使用 --allow-remote")
+    for name in TOKENIZER_SOURCES:
+        get_tokenizer(name)
+    with Listener(address, authkey=authkey) as listener:
+        print(f"token 计数进程已启动: {address}")
+        while True:
+            try:
+                with listener.accept() as conn:
+                    conn.send_bytes(_handle_request(conn.recv_bytes(MAX_MESSAGE_BYTES)))
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                warnings.warn(f"处理计数请求失败: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="token 计数服务")
+    parser.add_argument("--serve", action="store_true", help="启动常驻计数进程")
+    parser.add_argument("--address", help="监听地址，格式 host:port")
+    parser.add_argument("--allow-remote", action="store_true", help="允许监听非回环地址")
+    parser.add_argument("-f", "--file", help="计算文件的 token 数")
+    parser.add_argument("-m", "--model", default="deepseek-chat", help="模型名称")
+    args = parser.parse_args()
+
+    if args.serve:
+        address = None
+        if args.address:
+            host, port = args.address.rsplit(':', 1)
+            address = (host, int(port))
+        try:
+            serve(address, allow_remote=args.allow_remote or None)
+        except RuntimeError as e:
+            sys.exit(str(e))
+    elif args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            print(count_tokens(f.read(), args.model))
+    else:
+        parser.print_help()
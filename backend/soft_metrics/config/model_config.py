@@ -2,6 +2,10 @@
 模型配置
 """
 
+import os
+import tempfile
+from pathlib import Path
+
 MODEL_CONFIG = {
     'qwen': {
         'model_name': 'Qwen/Qwen3-0.6B',
@@ -23,4 +27,81 @@ MODEL_CONFIG = {
         'max_length': 8192,
         'temperature': 0.7
     },
-} 
\ No newline at end of file
+} 
+
+# 模型客户端连接池配置
+# 同一进程内按 (provider, base_url, api_key) 复用客户端及其 HTTP 长连接
+CLIENT_POOL_CONFIG = {
+    'max_connections': 32,            # 单个客户端的最大并发连接数
+    'max_keepalive_connections': 16,  # 保持空闲的长连接数量上限
+    'keepalive_expiry': 30.0,         # 空闲长连接的保活时间（秒）
+    'idle_timeout': 600.0,            # 客户端闲置超过该时间（秒）后被回收
+    'request_timeout': 600.0,         # 单次 HTTP 请求超时时间（秒）
+}
+
+# 异步推理引擎配置
+ASYNC_ENGINE_CONFIG = {
+    'max_concurrency': 32,  # 进程内同时在途的请求数上限（不超过 max_connections）
+}
+
+# 模型请求限流配置
+# 限流状态保存在 state_dir 下，同一台机器上的所有线程与进程共享
+RATE_LIMIT_CONFIG = {
+    'enabled': True,
+    'state_dir': os.path.join(tempfile.gettempdir(), 'paper_eval_rate_limit'),
+    'poll_interval': 0.2,   # 排队等待时的轮询间隔（秒）
+    'ticket_ttl': 10.0,     # 排队票据的心跳有效期（秒），进程退出后票据自动失效
+    'lease_ttl': 900.0,     # 在途请求的最长占用时间（秒），防止异常退出后额度无法归还
+    'providers': {
+        'deepseek': {'rpm': 600, 'tpm': 2000000, 'max_in_flight': 32},
+        'qwen': {'rpm': 600, 'tpm': 1000000, 'max_in_flight': 16},
+        'gemini': {'rpm': 60, 'tpm': 1000000, 'max_in_flight': 8},
+    },
+}
+
+# 模型请求重试配置
+# 超时、连接错误、429 与 5xx 按指数退避加随机抖动重试，服务端返回 Retry-After 时优先遵循
+RETRY_CONFIG = {
+    'max_attempts': 5,       # 单次请求的最大尝试次数
+    'base_delay': 1.0,       # 首次重试的退避基准（秒）
+    'max_delay': 30.0,       # 单次退避的上限（秒）
+    'max_total_time': 600.0, # 单次请求在所有尝试上花费的总时长上限（秒）
+}
+
+# 模型响应缓存配置
+# 以 (系统提示词, 用户提示词, 模型, 温度, 返回格式) 的哈希为键缓存成功的响应，
+# 设置环境变量 PAPER_EVAL_NO_CACHE=1 可临时跳过缓存
+RESPONSE_CACHE_CONFIG = {
+    'enabled': True,
+    'path': os.path.join(Path(__file__).parent.parent, 'data', 'cache', 'llm_responses.sqlite3'),
+    'ttl': 30 * 24 * 3600,  # 缓存有效期（秒），0 表示永不过期
+    'max_size_mb': 512,     # 缓存总大小上限（MB），超出后按最近访问时间淘汰
+}
+
+# 提示词预算配置
+# 单次请求的提示词不超过 MODEL_CONFIG 中对应模型的 max_length，
+# 超长章节在 ## / ### 标题处切分为多个子请求，短文本合并为一个请求
+PROMPT_BUDGET_CONFIG = {
+    'default_max_length': 8192,   # MODEL_CONFIG 中没有该模型时使用的上限
+    'reserved_tokens': 512,       # 为 token 估计误差预留的余量
+    'min_content_tokens': 1024,   # 正文预算的下限，防止模板过长时切得过碎
+    'pack_threshold': 1024,       # 不超过该 token 数的文本可与相邻短文本合并请求
+}
+
+# token 计数配置
+# worker_address 为常驻计数进程的地址（如 '127.0.0.1:6399'），为 None 时在本进程内计数；
+# 也可通过环境变量 PAPER_EVAL_TOKENIZER_WORKER 指定。
+# 计数进程与调用方使用环境变量 PAPER_EVAL_TOKENIZER_AUTHKEY 中的密钥认证，每次部署单独生成
+# （如 python -c "import secrets; print(secrets.token_hex(32))"），未设置时计数进程拒绝启动，调用方在本进程内计数；
+# allow_remote 为 False 时计数进程只监听本机回环地址
+TOKENIZER_CONFIG = {
+    'worker_address': None,
+    'allow_remote': False,
+}
+
+# 前端单篇论文评估配置
+# max_workers 为同时进行的评估请求数，章节评估并行执行，进度按章节实际完成情况推进；
+# 也可通过环境变量 PAPER_EVAL_MAX_WORKERS 指定
+INTERACTIVE_EVAL_CONFIG = {
+    'max_workers': 8,
+}
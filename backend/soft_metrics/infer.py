@@ -13,6 +13,7 @@ from glob import glob
 # chapter_inference: 粗粒度推理。c个章节d个评价维度，发起c次api请求。
 # quality_assessment: 质量评估。c个章节d个评价维度，发起c次api请求。
 from pipeline.overall_assess import infer as overall_assess
+from models.response_cache import set_cache_bypass
 from tools.logger import get_logger
 
 # 创建日志记录器
@@ -24,10 +25,12 @@ logger = get_logger(__name__)
 INPUT_ROOT = "data/processed/docx"
 # 输出根目录
 OUTPUT_ROOT = "data/output/docx"
-# api请求并行数
+# api请求并行数（同时评估的维度数上限，全局RPM/TPM限流见 config/model_config.py 中的 RATE_LIMIT_CONFIG）
 PROCESSES = 16
 # 使用的模型名称
 MODEL_NAME = "deepseek-chat"
+# 是否复用 data/cache 中缓存的模型响应（设为 False 时强制重新请求）
+USE_CACHE = True
 # ==================== 脚本执行参数 ====================
 
 
@@ -70,11 +73,11 @@ def run_inference(md_paths: List[str], output_root: str, model_name: str):
         logger.info(f"处理文件: {md_path}...")
         try:
             # 调用overall_assess.infer函数
-            # 参数：md_path, metrics=None, num_processes=1, model_name, save_dir
+            # 参数：md_path, metrics=None, num_processes, model_name, save_dir
             result = overall_assess(
                 md_path=md_path,
                 metrics=None,  # 使用默认评估指标
-                num_processes=1,  # overall_assess内部不支持多进程
+                num_processes=PROCESSES,  # 同时评估的维度数上限
                 model_name=model_name,
                 save_dir=output_root
             )
@@ -93,6 +96,7 @@ def main(model_name: str):
     if not md_files:
         logger.error("错误: 没有找到MD文件")
         logger.error(f"请检查输入路径: {INPUT_ROOT}")
+        logger.error("可先执行 python -m tools.docx_tools.ingest data/raw/docx 批量导入docx")
         sys.exit(1)
 
     logger.info(f"找到 {len(md_files)} 个MD文件:")
@@ -101,11 +105,13 @@ def main(model_name: str):
     
     # 创建输出目录
     os.makedirs(OUTPUT_ROOT, exist_ok=True)
+    set_cache_bypass(not USE_CACHE)
     
     # 显示配置信息
     logger.info(f"\n配置信息:")
     logger.info(f"  - 输入路径: {INPUT_ROOT}")
     logger.info(f"  - 输出目录: {OUTPUT_ROOT}")
+    logger.info(f"  - 响应缓存: {'启用' if USE_CACHE else '跳过'}")
     logger.info(f"  - 模型名称: {model_name}")
     
     # 运行推理
@@ -14,6 +14,19 @@
     可用模型：deepseek-chat, deepseek-reasoner
 - gemini: Google Gemini 模型接口
     可用模型：gemini-2.5-flash-preview-05-20
+- client_pool: 模型客户端注册表
+    进程内按 (provider, base_url, api_key) 复用客户端与HTTP长连接，
+    连接池大小与闲置回收时间见 config/model_config.py 中的 CLIENT_POOL_CONFIG
+- rate_limiter: 模型请求限流器
+    按提供方限制 RPM、TPM 与在途请求数，跨线程、跨进程共享，配置见 RATE_LIMIT_CONFIG
+- async_engine: 异步推理引擎
+    基于 AsyncOpenAI 在单进程内并发发起批量请求，提供 infer_many / infer_many_sync
+- retry: 模型请求重试策略
+    对超时、连接错误、429 与 5xx 按指数退避重试并遵循 Retry-After，配置见 RETRY_CONFIG，
+    重试用尽后抛出 ModelRequestError
+- response_cache: 模型响应缓存
+    以请求参数哈希为键将成功的响应缓存到 data/cache 下的 SQLite 数据库，
+    支持过期时间与按大小 LRU 淘汰，配置见 RESPONSE_CACHE_CONFIG，PAPER_EVAL_NO_CACHE=1 可跳过
 
 使用方法：
     from backend.models.qwen import request_qwen
@@ -22,6 +35,6 @@
     
     # 调用示例
     response = request_qwen("请分析这段文本")
-    response = request_deepseek("评估论文质量", "deepseek-chat")
+    response = request_deepseek("评估论文质量", model="deepseek-chat")
     response = request_gemini("生成摘要")
 """
@@ -0,0 +1,230 @@
+"""
+模型客户端注册表
+进程内按 (provider, base_url, api_key) 复用模型客户端，
+OpenAI 兼容接口共享带长连接的 httpx 连接池，避免每次请求重新建立 TLS 连接。
+
+使用方法：
+    from models.client_pool import lease_openai_client
+
+    with lease_openai_client("deepseek", "https://api.deepseek.com", api_key) as client:
+        client.chat.completions.create(...)
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from config.model_config import CLIENT_POOL_CONFIG
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+ClientKey = Tuple[str, str, str]
+# atexit 时等待异步客户端关闭的最长秒数
+_CLOSE_TIMEOUT = 5.0
+
+
+@dataclass
+class _PooledClient:
+    """注册表中的客户端条目"""
+    client: Any
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    loop: Optional[asyncio.AbstractEventLoop] = None   # 异步客户端所属的事件循环
+
+
+_registry: Dict[ClientKey, _PooledClient] = {}
+_lock = threading.Lock()
+# 尚未完成的异步客户端关闭，持有引用以免关闭任务被回收
+_closing: Set[concurrent.futures.Future] = set()
+
+
+def _close_done(key: ClientKey, future: concurrent.futures.Future) -> None:
+    """异步客户端关闭完成后的回调"""
+    _closing.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"关闭模型客户端失败 {key[0]}@{key[1]}: {future.exception()}")
+
+
+def _close_client(key: ClientKey, entry: _PooledClient) -> Optional[concurrent.futures.Future]:
+    """
+    关闭客户端，释放其持有的连接；调用方不应持有 _lock
+
+    异步客户端的连接属于创建它的事件循环，关闭协程提交到该循环中执行，不在当前线程另起事件循环。
+
+    Returns:
+        Optional[concurrent.futures.Future]: 异步客户端的关闭结果，同步客户端返回 None
+    """
+    close = getattr(entry.client, "close", None)
+    if close is None:
+        return None
+    try:
+        result = close()
+        if not asyncio.iscoroutine(result):
+            return None
+        loop = entry.loop
+        if loop is None or loop.is_closed() or not loop.is_running():
+            result.close()
+            logger.warning(f"事件循环已停止，跳过关闭异步模型客户端 {key[0]}@{key[1]}")
+            return None
+        future = asyncio.run_coroutine_threadsafe(result, loop)
+        _closing.add(future)
+        future.add_done_callback(lambda f: _close_done(key, f))
+        return future
+    except Exception as e:
+        logger.warning(f"关闭模型客户端失败 {key[0]}@{key[1]}: {e}")
+        return None
+
+
+def _pop_idle_locked(now: float) -> List[Tuple[ClientKey, _PooledClient]]:
+    """从注册表中取出闲置超时且未被占用的客户端，调用方需持有 _lock，并在释放锁后关闭它们"""
+    idle_timeout = CLIENT_POOL_CONFIG['idle_timeout']
+    expired = [
+        key for key, entry in _registry.items()
+        if entry.leases == 0 and now - entry.last_used > idle_timeout
+    ]
+    return [(key, _registry.pop(key)) for key in expired]
+
+
+def _pool_limits() -> httpx.Limits:
+    """按 CLIENT_POOL_CONFIG 构造连接池上限"""
+    return httpx.Limits(
+        max_connections=CLIENT_POOL_CONFIG['max_connections'],
+        max_keepalive_connections=CLIENT_POOL_CONFIG['max_keepalive_connections'],
+        keepalive_expiry=CLIENT_POOL_CONFIG['keepalive_expiry'],
+    )
+
+
+def build_http_client() -> httpx.Client:
+    """
+    构造带长连接池的 httpx 客户端
+
+    Returns:
+        httpx.Client: 按 CLIENT_POOL_CONFIG 配置连接上限与保活时间的客户端
+    """
+    return httpx.Client(limits=_pool_limits(), timeout=CLIENT_POOL_CONFIG['request_timeout'])
+
+
+def build_async_http_client() -> httpx.AsyncClient:
+    """
+    构造带长连接池的 httpx 异步客户端
+
+    Returns:
+        httpx.AsyncClient: 配置与 build_http_client 相同的异步客户端
+    """
+    return httpx.AsyncClient(limits=_pool_limits(), timeout=CLIENT_POOL_CONFIG['request_timeout'])
+
+
+@contextmanager
+def lease_client(provider: str, base_url: str, api_key: Optional[str],
+                 factory: Callable[[], Any],
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> Iterator[Any]:
+    """
+    从注册表借出客户端，不存在时调用 factory 创建
+
+    借出期间客户端不会被闲置回收，退出上下文后刷新最近使用时间。
+
+    Args:
+        provider: 模型提供方，如 deepseek、qwen、gemini
+        base_url: 接口地址
+        api_key: API密钥
+        factory: 创建客户端的无参函数
+        loop: 异步客户端所属的事件循环，回收时在该循环中关闭
+
+    Yields:
+        Any: 复用的客户端实例
+    """
+    key = (provider, base_url, api_key or "")
+    with _lock:
+        now = time.monotonic()
+        expired = _pop_idle_locked(now)
+        entry = _registry.get(key)
+        if entry is None:
+            entry = _PooledClient(client=factory(), loop=loop)
+            _registry[key] = entry
+            logger.info(f"创建模型客户端: {provider}@{base_url}")
+        entry.leases += 1
+    for expired_key, expired_entry in expired:
+        logger.info(f"回收闲置模型客户端: {expired_key[0]}@{expired_key[1]}")
+        _close_client(expired_key, expired_entry)
+    try:
+        yield entry.client
+    finally:
+        with _lock:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+
+def lease_openai_client(provider: str, base_url: str, api_key: Optional[str]):
+    """
+    借出 OpenAI 兼容客户端（DeepSeek、DashScope 等）
+
+    Args:
+        provider: 模型提供方
+        base_url: 接口地址
+        api_key: API密钥
+
+    Returns:
+        上下文管理器，产出共享连接池的 OpenAI 客户端
+    """
+    def factory() -> OpenAI:
+        # 重试由 models.retry 统一处理，关闭 SDK 内置重试以免叠加
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=build_http_client(), max_retries=0)
+
+    return lease_client(provider, base_url, api_key, factory)
+
+
+def lease_async_openai_client(provider: str, base_url: str, api_key: Optional[str]):
+    """
+    借出 OpenAI 兼容异步客户端
+
+    异步客户端的连接绑定在创建它的事件循环上，应只在 models.async_engine
+    的共享事件循环中使用。
+
+    Args:
+        provider: 模型提供方
+        base_url: 接口地址
+        api_key: API密钥
+
+    Returns:
+        上下文管理器，产出共享连接池的 AsyncOpenAI 客户端
+    """
+    def factory() -> AsyncOpenAI:
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=build_async_http_client(), max_retries=0)
+
+    return lease_client(f"{provider}-async", base_url, api_key, factory, loop=asyncio.get_running_loop())
+
+
+def close_all_clients() -> None:
+    """关闭并清空注册表中的全部客户端"""
+    with _lock:
+        entries = list(_registry.items())
+        _registry.clear()
+    futures = []
+    for key, entry in entries:
+        future = _close_client(key, entry)
+        if future is not None:
+            futures.append(future)
+    # 在异步客户端所属的事件循环之外调用时（如 atexit），等待关闭完成
+    running = _running_loop()
+    if futures and not any(entry.loop is running for _, entry in entries if running is not None):
+        concurrent.futures.wait(futures, timeout=_CLOSE_TIMEOUT)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """当前线程正在运行的事件循环，没有时返回 None"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+atexit.register(close_all_clients)
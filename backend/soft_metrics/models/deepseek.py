@@ -4,11 +4,66 @@ Deepseek模型相关的代码
 """
 
 import os
-from openai import OpenAI
+
+from models.client_pool import lease_openai_client
+from models.rate_limiter import rate_limited, usage_tokens
+from models.response_cache import cache_params, cached_response
+from models.retry import ModelRequestError, call_with_retry
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+
+def get_deepseek_api_key() -> str:
+    """
+    读取Deepseek API密钥
+
+    Returns:
+        str: API密钥
+
+    Raises:
+        ValueError: 未设置DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量
+    """
+    api_key = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("缺少API密钥: 请设置DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量")
+    return api_key
+
+
+def is_api_key_error(error: Exception) -> bool:
+    """判断异常是否由API密钥缺失或无效引起"""
+    error_msg = str(error).lower()
+    return "api_key" in error_msg or "apikey" in error_msg or "unauthorized" in error_msg
+
+
+def format_response(response, format: str) -> str:
+    """
+    将 chat.completions 响应转换为约定的返回格式
+
+    Args:
+        response: chat.completions.create 的返回值
+        format: "json" 返回完整响应的JSON字符串，"md" 仅返回消息内容
+
+    Returns:
+        str: 格式化后的响应
+    """
+    if format == "json":
+        return response.model_dump_json()
+    elif format == "md":
+        content = response.choices[0].message.content
+        if content is not None:
+            return content
+        else:
+            raise ModelRequestError("模型响应内容为空")
+    else:
+        raise TypeError('format must be "json" or "md"')
+
 
 def request_deepseek(prompt: str, system_prompt: str = "You are a helpful assistant", model: str = "deepseek-chat", format: str = "json") -> str:
     """
     向Deepseek模型发送请求
+
+    超时、连接错误、429 与 5xx 会按 RETRY_CONFIG 退避重试，
+    成功的响应写入 models.response_cache，相同请求再次调用时直接返回缓存。
     
     Args:
         prompt (str): 用户提示词
@@ -18,39 +73,38 @@ def request_deepseek(prompt: str, system_prompt: str = "You are a helpful assist
         
     Returns:
         str: 模型响应的JSON字符串
+
+    Raises:
+        ValueError: API密钥缺失或无效
+        ModelRequestError: 请求失败且无法通过重试恢复
     """
-    api_key = os.getenv("DEEPSEEK_API_KEY") or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("缺少API密钥: 请设置DEEPSEEK_API_KEY或OPENAI_API_KEY环境变量")
-    
-    try:
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
-        response = client.chat.completions.create(
-            # model = "deepseek-chat" or "deepseek-reasoner"
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            stream=False
-        )
-        if format == "json":
-            return response.model_dump_json()
-        elif format == "md":
-            content = response.choices[0].message.content
-            if content is not None:
-                return content
-            else:
-                raise ValueError("模型响应内容为空")
-        else:
-            raise TypeError('format must be "json" or "md"')
-    except Exception as e:
-        error_msg = str(e)
-        # 更明确地区分API密钥错误
-        if "api_key" in error_msg.lower() or "apikey" in error_msg.lower() or "unauthorized" in error_msg.lower():
-            raise ValueError(f"API密钥错误或无效: {error_msg}")
-        print(f"Error requesting deepseek ({model}): {e}")
-        return '{"error": "Request failed"}' 
\ No newline at end of file
+    def request() -> str:
+        api_key = get_deepseek_api_key()
+
+        def create():
+            with rate_limited("deepseek", system_prompt + prompt) as lease, \
+                    lease_openai_client("deepseek", DEEPSEEK_BASE_URL, api_key) as client:
+                response = client.chat.completions.create(
+                    # model = "deepseek-chat" or "deepseek-reasoner"
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    stream=False
+                )
+                lease.record_usage(usage_tokens(response))
+            return response
+
+        try:
+            response = call_with_retry(create, f"deepseek ({model})")
+        except ModelRequestError:
+            raise
+        except Exception as e:
+            # 更明确地区分API密钥错误
+            if is_api_key_error(e):
+                raise ValueError(f"API密钥错误或无效: {e}")
+            raise ModelRequestError(f"Error requesting deepseek ({model}): {e}") from e
+        return format_response(response, format)
+
+    return cached_response(cache_params("deepseek", model, system_prompt, prompt, format), request)
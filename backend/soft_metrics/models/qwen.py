@@ -4,33 +4,51 @@ Qwen模型相关的代码
 """
 
 import os
-from openai import OpenAI
+
+from models.client_pool import lease_openai_client
+from models.rate_limiter import rate_limited, usage_tokens
+from models.response_cache import cache_params, cached_response
+from models.retry import ModelRequestError, call_with_retry
+
+QWEN_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 
 def request_qwen(prompt: str):
     """
     向Qwen模型发送请求
+
+    超时、连接错误、429 与 5xx 会按 RETRY_CONFIG 退避重试，成功的响应写入响应缓存。
     
     Args:
         prompt (str): 提示词
         
     Returns:
         str: 模型响应的JSON字符串
+
+    Raises:
+        ModelRequestError: 请求失败且无法通过重试恢复
     """
-    try:
-        client = OpenAI(
-            api_key=os.getenv("QWEN_API_KEY"),
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-        )
-
-        completion = client.chat.completions.create(
-            model="qwen-max",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            extra_body={"enable_thinking": False},
-        )
+    def request() -> str:
+        def create():
+            with rate_limited("qwen", prompt) as lease, \
+                    lease_openai_client("qwen", QWEN_BASE_URL, os.getenv("QWEN_API_KEY")) as client:
+                completion = client.chat.completions.create(
+                    model="qwen-max",
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    extra_body={"enable_thinking": False},
+                )
+                lease.record_usage(usage_tokens(completion))
+            return completion
+
+        try:
+            completion = call_with_retry(create, "qwen (qwen-max)")
+        except ModelRequestError:
+            raise
+        except Exception as e:
+            raise ModelRequestError(f"Error requesting Qwen: {e}") from e
         return completion.model_dump_json()
-    except Exception as e:
-        print(f"Error requesting Qwen: {e}")
-        return '{"error": "Request failed"}' 
\ No newline at end of file
+
+    return cached_response(
+        cache_params("qwen", "qwen-max", "You are a helpful assistant.", prompt, "json"), request)
@@ -0,0 +1,299 @@
+"""
+模型响应缓存
+以 (系统提示词, 用户提示词, 模型, 温度, 返回格式) 的哈希为键，将模型响应持久化到
+data/cache 下的 SQLite 数据库。重复评估同一篇论文、调整评分环节或流水线中断后重跑时，
+未变化的请求直接命中缓存，不再产生延迟与费用。
+
+缓存条目超过 ttl 后失效，总大小超过上限时按最近访问时间淘汰（LRU）。
+设置环境变量 PAPER_EVAL_NO_CACHE=1、将 RESPONSE_CACHE_CONFIG['enabled'] 置为 False
+或调用 set_cache_bypass(True) 可跳过缓存。
+
+使用方法：
+    from models.response_cache import cache_params, cached_response
+
+    params = cache_params("deepseek", model, system_prompt, prompt, format)
+    response = cached_response(params, lambda: do_request())
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config.model_config import RESPONSE_CACHE_CONFIG
+from tools.logger import get_logger
+
+logger = get_logger(__name__)
+
+# cache_stats 只有一行，由触发器随增删改维护缓存总大小，写入时不必对全表求和；
+# 已有数据库首次打开时按现有条目初始化
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed);
+CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats (id, total_size) SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses BEGIN
+    UPDATE cache_stats SET total_size = total_size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses BEGIN
+    UPDATE cache_stats SET total_size = total_size + NEW.size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses BEGIN
+    UPDATE cache_stats SET total_size = total_size - OLD.size WHERE id = 0;
+END;
+COMMIT;
+"""
+
+_bypass = False
+
+
+def set_cache_bypass(bypass: bool) -> None:
+    """
+    设置当前进程是否跳过响应缓存
+
+    Args:
+        bypass: True 时既不读取也不写入缓存
+    """
+    global _bypass
+    _bypass = bypass
+
+
+def cache_enabled() -> bool:
+    """判断当前进程是否启用响应缓存"""
+    if _bypass or not RESPONSE_CACHE_CONFIG['enabled']:
+        return False
+    return os.getenv("PAPER_EVAL_NO_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+def cache_params(provider: str, model: str, system_prompt: str, prompt: str,
+                 format: str, temperature: Optional[float] = None) -> Dict[str, Any]:
+    """
+    构造决定模型输出的请求参数，作为缓存键的来源
+
+    Args:
+        provider: 模型提供方
+        model: 模型名称
+        system_prompt: 系统提示词
+        prompt: 用户提示词
+        format: 返回格式
+        temperature: 采样温度，使用服务端默认值时为 None
+
+    Returns:
+        Dict[str, Any]: 请求参数
+    """
+    return {
+        'provider': provider,
+        'model': model,
+        'system_prompt': system_prompt,
+        'prompt': prompt,
+        'temperature': temperature,
+        'format': format,
+    }
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """
+    计算请求参数的缓存键
+
+    Args:
+        params: 决定模型输出的全部请求参数
+
+    Returns:
+        str: 参数规范化 JSON 的 sha256 十六进制摘要
+    """
+    canonical = json.dumps(params, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """基于 SQLite 的模型响应缓存，可在多个线程、进程间共享"""
+
+    def __init__(self, path: str, ttl: float, max_size_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存的响应，命中时刷新最近访问时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[str]: 未命中或已过期时返回 None
+        """
+        conn = self._connect()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        response, created = row
+        now = time.time()
+        if self.ttl and now - created > self.ttl:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return response
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """
+        写入响应，并在总大小超过上限时淘汰过期与最久未访问的条目
+
+        Args:
+            key: 缓存键
+            model: 模型名称，便于排查
+            response: 模型响应
+        """
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        conn = self._connect()
+        # 使用 UPSERT 而不是 INSERT OR REPLACE：REPLACE 删除旧行时不触发删除触发器
+        conn.execute(
+            "INSERT INTO responses (key, model, response, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET model = excluded.model, response = excluded.response, "
+            "size = excluded.size, created = excluded.created, accessed = excluded.accessed",
+            (key, model, response, size, now, now),
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """删除过期条目，再按 LRU 将总大小压回上限以内"""
+        if self.ttl:
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT total_size FROM cache_stats WHERE id = 0").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        excess = total - self.max_size_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        logger.info(f"响应缓存超出上限，已淘汰 {len(victims)} 条，释放 {freed / 1024 / 1024:.1f} MB")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._connect().execute("DELETE FROM responses")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取进程内共享的响应缓存，缓存被禁用或无法打开时返回 None
+
+    Returns:
+        Optional[ResponseCache]: 响应缓存实例
+    """
+    global _cache
+    if not cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ResponseCache(
+                    RESPONSE_CACHE_CONFIG['path'],
+                    ttl=RESPONSE_CACHE_CONFIG['ttl'],
+                    max_size_bytes=RESPONSE_CACHE_CONFIG['max_size_mb'] * 1024 * 1024,
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"无法打开响应缓存，已跳过缓存: {e}")
+                set_cache_bypass(True)
+                return None
+        return _cache
+
+
+def lookup(params: Dict[str, Any]) -> Optional[str]:
+    """
+    查询请求参数对应的缓存响应
+
+    Args:
+        params: 请求参数
+
+    Returns:
+        Optional[str]: 命中时返回响应，否则返回 None
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    try:
+        response = cache.get(make_cache_key(params))
+    except sqlite3.Error as e:
+        logger.warning(f"读取响应缓存失败: {e}")
+        return None
+    if response is not None:
+        logger.debug(f"响应缓存命中 ({params.get('model')})")
+    return response
+
+
+def store(params: Dict[str, Any], response: str) -> None:
+    """
+    缓存请求参数对应的响应，写入失败只记录警告
+
+    Args:
+        params: 请求参数
+        response: 模型响应
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(make_cache_key(params), str(params.get('model', '')), response)
+    except sqlite3.Error as e:
+        logger.warning(f"写入响应缓存失败: {e}")
+
+
+def cached_response(params: Dict[str, Any], func: Callable[[], str]) -> str:
+    """
+    命中缓存时直接返回，否则调用 func 并缓存其结果
+
+    只有成功返回的响应会被缓存，func 抛出的异常原样向上传递。
+
+    Args:
+        params: 决定模型输出的全部请求参数
+        func: 实际发起请求的无参函数
+
+    Returns:
+        str: 模型响应
+    """
+    response = lookup(params)
+    if response is not None:
+        return response
+    response = func()
+    store(params, response)
+    return response
@@ -8,8 +8,8 @@ import json
 import re
 import random
 from datetime import datetime
-from typing import List, Dict, Any
-from multiprocessing import Pool
+from typing import List, Dict, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from glob import glob
 import warnings
 from pathlib import Path
@@ -22,7 +22,9 @@ sys.path.insert(0, str(project_root))
 # 导入项目模块
 from config.data_config import FILE_CONFIG
 from config.model_config import MODEL_CONFIG
+from models.async_engine import infer_many_sync
 from models.request_model import _request_model
+from tools.docx_tools.md_sections import MarkdownIndex, unique_title
 from tools.file_utils import read_pickle
 from tools.logger import get_logger
 from prompts.overall_assess_prompt import (
@@ -69,29 +71,20 @@ def extract_toc_and_chapters(md_path: str) -> dict:
         abstract_content = re.sub(r'\s+', ' ', abstract_content)  # 将多个连续空格合并为一个空格
         abstract_content = abstract_content.strip()
 
-    # 提取各章节内容
+    # 提取各章节内容：任意层级的标题均可被选中，小节包含其下级标题
+    index = MarkdownIndex(content)
     chapters = {}
-    sections = re.findall(r'#+ (.+?)\n', content)
-    for section in sections:
+    for heading in index.headings:
+        section = heading.title
         if '目录' in section or '参考文献' in section or '致谢' in section or '附录' in section:
             continue
-            
-        # 提取章节内容
-        section_start = content.find(f'# {section}')
-        next_section = content.find('#', section_start + 1)
-        section_content = content[section_start:next_section].strip() if next_section != -1 else content[section_start:].strip()
         
-        # 提取子章节
-        subsections = re.findall(r'## (.+?)\n', section_content)
         subchapter_contents = {}
-        for sub in subsections:
-            sub_start = section_content.find(f'## {sub}')
-            next_sub = section_content.find('##', sub_start + 1)
-            sub_content = section_content[sub_start:next_sub].strip() if next_sub != -1 else section_content[sub_start:].strip()
-            subchapter_contents[sub] = sub_content
+        for sub in index.children(heading):
+            subchapter_contents[unique_title(subchapter_contents, sub.title)] = index.section(sub).strip()
         
-        chapters[section] = {
-            'content': section_content,
+        chapters[unique_title(chapters, section)] = {
+            'content': index.section(heading).strip(),
             'subchapters': subchapter_contents
         }
     
@@ -217,6 +210,133 @@ def get_message(json_str: str):
         logger.error(f"解析JSON字符串失败: {e}")
         return json_str
 
+# 评估维度中英文映射
+DIMENSION_MAPPING = {
+    'logic': '逻辑连贯性与结构严谨性',
+    'innovation': '学术贡献与创新性的实质性',
+    'depth': '论证深度与批判性思维',
+    'replicability': '研究的严谨性与可复现性'
+}
+
+def collect_selected_content(paper_data: dict, selected_chapter_titles: List[str]) -> str:
+    """
+    拼接选中章节的内容
+    
+    Args:
+        paper_data: extract_toc_and_chapters 的返回值
+        selected_chapter_titles: 模型选中的章节标题
+        
+    Returns:
+        str: 选中章节的 markdown 内容，未匹配到任何章节时为空字符串
+    """
+    selected_content = ""
+    for title in selected_chapter_titles:
+        normalized_title = title.strip().lower()
+        for chapter_title, chapter_data in paper_data['chapters'].items():
+            normalized_chapter_title = chapter_title.strip().lower()
+            if normalized_title == normalized_chapter_title:
+                selected_content += f"\n\n## {chapter_title}\n{chapter_data['content']}"
+                break
+    return selected_content
+
+def assess_metric(
+    metric: str,
+    selected_chapter_titles: List[str],
+    paper_data: dict,
+    model_name: str
+) -> Optional[Tuple[dict, dict]]:
+    """
+    对单个维度执行内容评估与幻觉检测（第二、三阶段）
+    
+    各维度之间互不依赖，可以在不同线程中并发执行。
+    
+    Args:
+        metric: 评估维度
+        selected_chapter_titles: 第一阶段选中的章节标题
+        paper_data: extract_toc_and_chapters 的返回值
+        model_name: 使用的模型名称
+        
+    Returns:
+        Optional[Tuple[dict, dict]]: (详细评估记录, 维度评分结果)，评估失败时返回 None
+    """
+    # 获取选中章节的内容
+    selected_content = collect_selected_content(paper_data, selected_chapter_titles)
+    if not selected_content:
+        logger.warning(f"未找到选中章节的内容，跳过维度 {metric}")
+        return None
+    
+    # 第二阶段：将选择好的章节内容和对应的评价提示词，一起输入给模型提问
+    final_prompt = generate_final_assessment_prompt(selected_content, metric)
+    final_assessment_response = _request_model((final_prompt, model_name))
+    
+    # 检查API调用是否成功
+    if 'error' in final_assessment_response:
+        logger.error(f"最终评估API调用失败: {final_assessment_response['error']}")
+        return None
+    final_assessment_result = get_message(final_assessment_response['output'])
+    
+    # 第三阶段：幻觉检测，检测到幻觉时使用修正后的结果再次检测，最多3次
+    logger.info(f"开始对维度 {metric} 进行幻觉检测")
+    hallucination_info = {}
+    for i in range(3):
+        hallucination_prompt = generate_hallucination_detection_prompt(
+            dimension=DIMENSION_MAPPING[metric],
+            abstract=paper_data['abstract'],
+            eval_requirement=final_prompt,
+            eval_result=final_assessment_result
+        )
+        hallucination_result = _request_model((hallucination_prompt, model_name))
+        hallucination_result.setdefault('output', '')
+        # 解析幻觉检测结果
+        hallucination_data = parse_hallucination_detection_result(hallucination_result['output'])
+        
+        if not hallucination_data:
+            logger.warning(f"幻觉检测结果解析失败，使用原始评估结果")
+            hallucination_info = {
+                'detection_status': 'parse_failed',
+                'raw_response': hallucination_result['output']
+            }
+        elif 'hallucination_points' in hallucination_data and hallucination_data['hallucination_points']:
+            # 检测到幻觉，使用修正后的结果
+            logger.info(f"检测到 {len(hallucination_data['hallucination_points'])} 个幻觉点，使用修正后的结果")
+            original_assessment = final_assessment_result
+            final_assessment_result = json.dumps(hallucination_data['fixed_eval_result'], ensure_ascii=False)
+            hallucination_info = {
+                'detection_status': 'hallucination_detected',
+                'hallucination_points': hallucination_data['hallucination_points'],
+                'original_assessment': original_assessment
+            }
+        else:
+            # 未检测到幻觉，使用原始结果
+            logger.info(f"未检测到幻觉，使用原始评估结果")
+            hallucination_info = {
+                'detection_status': 'no_hallucination',
+                'verification': hallucination_data.get('verification', '所有陈述均有原文支持')
+            }
+            break
+    final_assessment = final_assessment_result
+    
+    overall_entry = {
+        'selected_chapters': selected_chapter_titles,
+        'assessment': final_assessment,
+        'selection_reasoning': selected_chapter_titles,
+        'final_prompt_used': final_prompt,
+        'hallucination_detection': hallucination_info
+    }
+    final_data = json.loads(final_assessment)
+    result_entry = {
+        "name": DIMENSION_MAPPING[metric],
+        "score":  final_data['score'],
+        "full_score": 10,
+        "weight": 1.0,
+        "focus_chapter": selected_chapter_titles,
+        "comment": final_data['overall_assessment'],
+        "advantages": final_data['strengths'],
+        "weaknesses": final_data['weaknesses'],
+        "suggestions": final_data['suggestions'],
+    }
+    return overall_entry, result_entry
+
 def infer(
     md_path: str,
     metrics: List[str] = None,
@@ -227,10 +347,13 @@ def infer(
     """
     对论文进行三阶段推理：章节选择 -> 内容评估 -> 幻觉检测
     
+    所有维度的章节选择请求一次性并发发出；之后每个维度的评估与幻觉检测
+    作为独立的流水线并发执行，单篇论文的耗时约等于最长的一条流水线。
+    
     Args:
         md_path: markdown文件路径
         metrics: 评估指标列表
-        num_processes: 进程数
+        num_processes: 并发请求数（同时执行的维度数上限）
         model_name: 使用的模型名称
         save_dir: 结果保存目录
         
@@ -253,130 +376,60 @@ def infer(
                 'replicability',
             ]
         
-        # 评估维度中英文映射
-        dimension_mapping = {
-            'logic': '逻辑连贯性与结构严谨性',
-            'innovation': '学术贡献与创新性的实质性',
-            'depth': '论证深度与批判性思维',
-            'replicability': '研究的严谨性与可复现性'
-        }
-        
-        overall_result = {}
-        result = {}
+        supported_metrics = []
         for metric in metrics:
             # 跳过不支持幻觉检测的维度
-            if metric not in dimension_mapping:
+            if metric not in DIMENSION_MAPPING:
                 logger.warning(f"维度 {metric} 不支持幻觉检测，跳过")
                 continue
-                
-            logger.info(f"开始评估维度: {metric}")
-            
-            # 第一阶段: 根据评价维度选择需要评估的章节
-            selection_prompt = generate_selection_prompt(
-                paper_data['toc'], 
-                paper_data['abstract'], 
-                metric
-            )
-            selected_chapters_result = _request_model((selection_prompt, model_name))
-            selected_chapters_result = parse_selected_chapters(selected_chapters_result['output'])
-            
+            supported_metrics.append(metric)
+        max_workers = max(1, min(num_processes, len(supported_metrics)))
+        
+        # 第一阶段: 根据评价维度选择需要评估的章节，各维度的请求一起发出
+        logger.info(f"开始评估维度: {supported_metrics}")
+        selection_prompts = [
+            generate_selection_prompt(paper_data['toc'], paper_data['abstract'], metric)
+            for metric in supported_metrics
+        ]
+        selection_responses = infer_many_sync(selection_prompts, model_name, max_concurrency=max_workers)
+        
+        selected = {}
+        for metric, selection_response in zip(supported_metrics, selection_responses):
             # 检查API调用是否成功
-            if 'error' in selected_chapters_result:
-                logger.error(f"章节选择API调用失败: {selected_chapters_result['error']}")
+            if 'error' in selection_response:
+                logger.error(f"章节选择API调用失败: {selection_response['error']}")
                 continue
-                
             # 解析模型返回选择的章节
-            selected_chapter_titles =selected_chapters_result
-            
+            selected_chapter_titles = parse_selected_chapters(selection_response['output'])
             if not selected_chapter_titles:
                 logger.warning(f"未能选择到章节，跳过维度 {metric}")
                 continue
-            
-            # 获取选中章节的内容
-            selected_content = ""
-            for title in selected_chapter_titles:
-                normalized_title = title.strip().lower()
-                for chapter_title, chapter_data in paper_data['chapters'].items():
-                    normalized_chapter_title = chapter_title.strip().lower()
-                    if normalized_title == normalized_chapter_title:
-                        selected_content += f"\n\n## {chapter_title}\n{chapter_data['content']}"
-                        break
-            
-            if not selected_content:
-                logger.warning(f"未找到选中章节的内容，跳过维度 {metric}")
-                continue
-            
-            # 第二阶段：将选择好的章节内容和对应的评价提示词，一起输入给模型提问
-            final_prompt = generate_final_assessment_prompt(selected_content, metric)
-            final_assessment_result = _request_model((final_prompt, model_name))
-            final_assessment_result = get_message(final_assessment_result['output'])
-            
-            # 检查API调用是否成功
-            if 'error' in final_assessment_result:
-                logger.error(f"最终评估API调用失败: {final_assessment_result['error']}")
-                continue
-            
-            # 第三阶段：幻觉检测
-            logger.info(f"开始对维度 {metric} 进行幻觉检测")
-
-                # 解析幻觉检测结果
-            for i in range(3):
-                hallucination_prompt = generate_hallucination_detection_prompt(
-                                                                                dimension=dimension_mapping[metric],
-                                                                                abstract=paper_data['abstract'],
-                                                                                eval_requirement=final_prompt,
-                                                                                eval_result=final_assessment_result
-                                                                            )
-                hallucination_result = _request_model((hallucination_prompt, model_name))
-                hallucination_data = parse_hallucination_detection_result(hallucination_result['output'])
-                
-                if not hallucination_data:
-                    logger.warning(f"幻觉检测结果解析失败，使用原始评估结果")
-                    final_assessment = final_assessment_result
-                    hallucination_info = {
-                        'detection_status': 'parse_failed',
-                        'raw_response': hallucination_result['output']
-                    }
-                elif 'hallucination_points' in hallucination_data and hallucination_data['hallucination_points']:
-                    # 检测到幻觉，使用修正后的结果
-                    logger.info(f"检测到 {len(hallucination_data['hallucination_points'])} 个幻觉点，使用修正后的结果")
-                    final_assessment_result = json.dumps(hallucination_data['fixed_eval_result'], ensure_ascii=False)
-                    hallucination_info = {
-                        'detection_status': 'hallucination_detected',
-                        'hallucination_points': hallucination_data['hallucination_points'],
-                        'original_assessment': final_assessment_result
-                    }
-                else:
-                    # 未检测到幻觉，使用原始结果
-                    logger.info(f"未检测到幻觉，使用原始评估结果")
-                    final_assessment = final_assessment_result
-                    hallucination_info = {
-                        'detection_status': 'no_hallucination',
-                        'verification': hallucination_data.get('verification', '所有陈述均有原文支持')
-                    }
-                    break
-            
-            # 保存结果
-            overall_result[metric] = {
-                'selected_chapters': selected_chapter_titles,
-                'assessment': final_assessment,
-                'selection_reasoning': selected_chapters_result,
-                'final_prompt_used': final_prompt,
-                'hallucination_detection': hallucination_info
-            }
-            final_data = json.loads(final_assessment)
-            result[metric] = {
-                "name": dimension_mapping[metric],
-                "score":  final_data['score'],
-                "full_score": 10,
-                "weight": 1.0,
-                "focus_chapter": selected_chapter_titles,
-                "comment": final_data['overall_assessment'],
-                "advantages": final_data['strengths'],
-                "weaknesses": final_data['weaknesses'],
-                "suggestions": final_data['suggestions'],
+            selected[metric] = selected_chapter_titles
+        
+        # 第二、三阶段: 每个维度的评估与幻觉检测并发执行
+        metric_results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_metric = {
+                executor.submit(assess_metric, metric, titles, paper_data, model_name): metric
+                for metric, titles in selected.items()
             }
-            logger.info(f"完成维度 {metric} 的评估")
+            for future in as_completed(future_to_metric):
+                metric = future_to_metric[future]
+                try:
+                    metric_result = future.result()
+                except Exception as e:
+                    logger.error(f"维度 {metric} 评估出错: {e}")
+                    continue
+                if metric_result is not None:
+                    metric_results[metric] = metric_result
+                    logger.info(f"完成维度 {metric} 的评估")
+        
+        # 按输入的维度顺序整理结果
+        overall_result = {}
+        result = {}
+        for metric in supported_metrics:
+            if metric in metric_results:
+                overall_result[metric], result[metric] = metric_results[metric]
             
         logger.info(f"一共完成{len(overall_result)}个维度的评估")
         
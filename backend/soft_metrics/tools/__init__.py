@@ -13,11 +13,18 @@
 - get_pkl_files: pickle文件获取工具
 - torch_helper: PyTorch相关辅助工具
 - docx_tools/: Word文档处理工具包
+  - docx_ir: Word文档中间表示，一次解析供各转换共用
   - docx2md: Word转Markdown
+  - image_store: 内容寻址的图像存储，重复图像只保存一份，按引用计数清理
   - md2pkl: Markdown转pickle
+  - md_sections: Markdown标题索引，一次扫描记录各级标题的偏移，章节按偏移切片
+  - ingest: 进程内docx导入，供前端与批处理并发调用；命令行批量并行导入
   - omml_to_latex: OMML数学公式转LaTeX
+  - paper_store: 论文容器（.paper），带版本号与章节索引的 SQLite 文件，按需读取章节，不执行 pickle 代码
   - pkl_analyse: pickle文件分析
-- token_count: deepseek官方token计数工具
+- token_count: token计数工具
+  - deepseek_tokenizer: deepseek官方token计数工具
+  - tokenizer_service: 每个进程只加载一次分词器的批量计数服务，可作为常驻进程运行
 
 备注：
 某些模块未被项目使用且存在问题，但保留在项目中，以备后续使用，一切参考README.md。
@@ -4,7 +4,7 @@ DOCX转Markdown工具
 
 功能特性：
 - 保持文档结构完整性（标题、段落、表格等）
-- 自动提取并保存嵌入图像
+- 自动提取并保存嵌入图像（按内容哈希命名，重复的图像只保存一份）
 - 支持数学公式转换（OMML -> LaTeX）
 - 表格格式化为Markdown表格
 - 按文档顺序处理所有元素
@@ -20,6 +20,7 @@ DOCX转Markdown工具
     docx_file           输入的DOCX文件路径（必需）
     -o, --output        输出的Markdown文件路径（可选，默认为输入文件名.md）
     -i, --image_dir     图像保存目录（可选，默认为'images'）
+    --stream            流式转换，逐块读取document.xml并立即写出（可选）
 
 使用示例：
     # 基本用法
@@ -28,13 +29,24 @@ DOCX转Markdown工具
     # 指定输出文件和图像目录
     python docx2md.py document.docx -o output.md -i my_images
     
+    # 流式转换超大文档（200页以上、公式数千个）
+    python docx2md.py thesis.docx -o thesis.md --stream
+    
     # 作为模块导入使用
     from docx2md import docx_to_markdown_with_formulas
     docx_to_markdown_with_formulas("input.docx", "output.md", "images")
 
+    # 只需要Markdown文本时（不写文件，可传入路径或二进制流）
+    from tools.docx_tools.docx2md import docx_to_markdown
+    md = docx_to_markdown("input.docx", "images")
+
+    # 已有文档IR时（与HTML预览、目录提取共用同一次解析）
+    from tools.docx_tools.docx2md import document_to_markdown
+    md = document_to_markdown(document, "images")
+
 输出结果：
 - 生成的Markdown文件包含完整的文档内容
-- 图像文件保存在指定目录中
+- 图像文件保存在指定目录中，路径为 <目录>/<哈希前两位>/<sha256><扩展名>
 - 数学公式转换为LaTeX格式
 - 表格转换为标准Markdown表格格式
 
@@ -49,78 +61,28 @@ DOCX转Markdown工具
 """
 
 import os
-from docx import Document
-from docx.document import Document as _Document
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
-from docx.table import _Cell, Table
-from docx.text.paragraph import Paragraph
 import argparse
-from omml_to_latex import convert_omml_to_latex
 
-
-def save_image(rel, image_dir, image_id):
-    """
-    从Word文档关系中保存图像到指定目录
-    
-    Args:
-        rel: Word文档中的图像关系对象
-        image_dir (str): 图像保存目录路径
-        image_id (int): 图像ID，用于生成文件名
-        
-    Returns:
-        str: 保存的图像文件名，失败时返回None
-    """
-    try:
-        image_bytes = rel.target_part.blob
-        image_ext = os.path.splitext(rel.target_ref)[-1]
-        if not image_ext:
-            image_ext = '.png'  # Default extension if none found
-            
-        image_filename = f"image_{image_id}{image_ext}"
-        image_path = os.path.join(image_dir, image_filename)
-        
-        with open(image_path, 'wb') as f:
-            f.write(image_bytes)
-            
-        return image_filename
-    except Exception as e:
-        print(f"Error extracting image: {e}")
-        return None
+try:
+    from .docx_ir import ImageRef, MathInline, ParagraphBlock, StreamedDocument, TableBlock, TextRun, parse_docx
+    from .image_store import ImageStore
+except ImportError:
+    # 作为脚本直接运行时
+    from docx_ir import ImageRef, MathInline, ParagraphBlock, StreamedDocument, TableBlock, TextRun, parse_docx
+    from image_store import ImageStore
 
 
-def iter_block_items(parent):
+def as_image_store(image_dir):
     """
-    生成器：按顺序遍历文档中的所有块级元素（段落和表格）
+    将图像目录包装为内容寻址的图像存储
     
     Args:
-        parent: Word文档对象或单元格对象
+        image_dir (str | ImageStore): 图像目录或已有的图像存储
         
-    Yields:
-        Paragraph or Table: 文档中的段落或表格对象
+    Returns:
+        ImageStore: 图像存储，相同内容的图像只保存一份
     """
-    if isinstance(parent, _Document):
-        parent_elm = parent.element.body
-    elif isinstance(parent, _Cell):
-        parent_elm = parent._tc
-    else:
-        raise ValueError("Expected a Document or a Cell")
-        
-    for child in parent_elm.iterchildren():
-        if isinstance(child, CT_P):
-            yield Paragraph(child, parent)
-        elif isinstance(child, CT_Tbl):
-            yield Table(child, parent)
-
-
-def get_element_text(element):
-    """Extract text from an XML element."""
-    text = ""
-    for child in element.iter():
-        if child.tag.endswith('}t'):  # Text element in Word XML
-            if child.text:
-                text += child.text
-    return text
+    return image_dir if isinstance(image_dir, ImageStore) else ImageStore(image_dir)
 
 
 def table_to_markdown(table):
@@ -128,7 +90,7 @@ def table_to_markdown(table):
     将Word表格转换为Markdown格式
     
     Args:
-        table: Word文档中的表格对象
+        table (TableBlock): 文档IR中的表格
         
     Returns:
         str: Markdown格式的表格字符串
@@ -140,7 +102,7 @@ def table_to_markdown(table):
     
     # Extract header row
     header = []
-    for cell in table.rows[0].cells:
+    for cell in table.rows[0]:
         header.append(cell.text.strip() or " ")
     
     # Calculate column widths
@@ -148,7 +110,7 @@ def table_to_markdown(table):
     
     # Adjust column widths based on content
     for row in table.rows[1:]:
-        for i, cell in enumerate(row.cells):
+        for i, cell in enumerate(row):
             if i < len(col_widths):
                 col_widths[i] = max(col_widths[i], len(cell.text.strip() or " "))
     
@@ -163,7 +125,7 @@ def table_to_markdown(table):
     # Create content rows
     for row in table.rows[1:]:
         row_cells = []
-        for i, cell in enumerate(row.cells):
+        for i, cell in enumerate(row):
             if i < len(col_widths):
                 row_cells.append((cell.text.strip() or " ").ljust(col_widths[i]))
         md_table.append("| " + " | ".join(row_cells) + " |")
@@ -171,157 +133,167 @@ def table_to_markdown(table):
     return "\n".join(md_table)
 
 
-def find_embedded_image_ids(element):
-    """Find embedded image IDs in an element."""
-    image_ids = []
+def math_to_markdown(math):
+    """
+    将公式转换为Markdown中的LaTeX
     
-    # We need to look for drawing elements in the XML
-    for child in element.iter():
-        if child.tag.endswith('}drawing'):
-            # Look for blip elements that contain image references
-            for subchild in child.iter():
-                if subchild.tag.endswith('}blip'):
-                    # Get the embed attribute which is the relationship ID
-                    for key, value in subchild.attrib.items():
-                        if key.endswith('}embed'):
-                            image_ids.append(value)
+    段落级公式较长或含分式、求和、积分、连乘时使用行间公式，w:r 内的公式总是行内公式。
     
-    return image_ids
+    Args:
+        math (MathInline): 文档IR中的公式
+        
+    Returns:
+        str: Markdown片段，公式转换失败时为空字符串
+    """
+    if not math.valid:
+        return ""
+    latex_formula = math.latex
+    if not math.in_run and (len(latex_formula) > 50 or
+                            any(cmd in latex_formula for cmd in ['\\frac', '\\sum', '\\int', '\\prod'])):
+        return f" $$\n{latex_formula}\n$$ "
+    return f" ${latex_formula}$ "
 
 
-def extract_math_from_element(element):
-    """Extract math elements (OMML) from a paragraph element."""
-    math_elements = []
-    
-    # Look for math elements in the XML
-    for child in element.iter():
-        if child.tag.endswith('}oMath'):
-            math_elements.append(child)
+def paragraph_to_markdown(paragraph, document, image_store, image_id_counter):
+    """
+    将段落转换为Markdown，文本与公式按原顺序输出，图像附在段落之后
     
-    return math_elements
-
-
-def omml_to_latex_basic(omml_element):
-    """Convert OMML (Office Math Markup Language) to LaTeX format using the advanced converter."""
-    return convert_omml_to_latex(omml_element)
-
-
-def process_paragraph_with_math(paragraph, image_dir, image_id_counter, relationship_map):
-    """Process a paragraph that may contain text, images, and math formulas."""
+    Args:
+        paragraph (ParagraphBlock): 文档IR中的段落
+        document (DocumentIR): 段落所在的文档
+        image_store (ImageStore): 图像存储，被引用的图像在此落盘
+        image_id_counter (list): 图像编号计数器（单元素列表）
+        
+    Returns:
+        list: Markdown片段列表
+    """
     # Check for heading style first
-    if paragraph.style.name.startswith('Heading'):
-        heading_level = int(paragraph.style.name[-1]) if paragraph.style.name[-1].isdigit() else 1
+    if paragraph.style_name.startswith('Heading'):
+        heading_level = int(paragraph.style_name[-1]) if paragraph.style_name[-1].isdigit() else 1
         para_text = paragraph.text.strip()
         if para_text:
             return ['#' * heading_level + ' ' + para_text]
 
-    # Process the paragraph element directly to maintain order
-    result_text = process_paragraph_element_recursively(paragraph._element)
-
-    # Handle images in the paragraph
+    result_parts = []
     image_content = []
-    for image_id in find_embedded_image_ids(paragraph._element):
-        if image_id in relationship_map:
-            rel = relationship_map[image_id]
-            image_filename = save_image(rel, image_dir, image_id_counter[0])
-            if image_filename:
-                # Use absolute path for the image
-                image_path = os.path.abspath(os.path.join(image_dir, image_filename))
-                # Convert backslashes to forward slashes for markdown compatibility
-                image_path = image_path.replace('\\', '/')
-                image_content.append(f"![image_{image_id_counter[0]}]({image_path})")
-                image_id_counter[0] += 1
+    for inline in paragraph.inlines:
+        if isinstance(inline, TextRun):
+            result_parts.append(inline.text)
+        elif isinstance(inline, MathInline):
+            result_parts.append(math_to_markdown(inline))
+        elif isinstance(inline, ImageRef) and inline.rel_id in document.images:
+            try:
+                image_path = image_store.materialize(document.images[inline.rel_id])
+            except Exception as e:
+                print(f"Error extracting image: {e}")
+                continue
+            # Convert backslashes to forward slashes for markdown compatibility
+            image_path = image_path.replace('\\', '/')
+            image_content.append(f"![image_{image_id_counter[0]}]({image_path})")
+            image_id_counter[0] += 1
 
     result = []
-    if result_text and result_text.strip():
+    result_text = ''.join(result_parts)
+    if result_text.strip():
         # Clean up extra spaces
-        result_text = ' '.join(result_text.split())
-        result.append(result_text)
+        result.append(' '.join(result_text.split()))
     result.extend(image_content)
-
     return result
 
 
-def print_xml_structure(element, level=0):
-    """Print the XML structure of an element for debugging."""
-    indent = "  " * level
-    tag = element.tag.split('}')[-1] if '}' in element.tag else element.tag
-    attrs = []
-    for key, value in element.attrib.items():
-        key = key.split('}')[-1] if '}' in key else key
-        attrs.append(f"{key}='{value}'")
-    attrs_str = " ".join(attrs)
-    
-    if element.text and element.text.strip():
-        print(f"{indent}<{tag} {attrs_str}>{element.text.strip()}")
-    else:
-        print(f"{indent}<{tag} {attrs_str}>")
+def block_to_markdown(block, document, image_store, image_id_counter):
+    """
+    将一个块（段落或表格）转换为Markdown
     
-    for child in element:
-        print_xml_structure(child, level + 1)
+    Args:
+        block (ParagraphBlock | TableBlock): 文档IR中的块
+        document (DocumentIR | StreamedDocument): 块所在的文档，用于读取图像
+        image_store (ImageStore): 图像存储
+        image_id_counter (list): 图像编号计数器（单元素列表）
+        
+    Returns:
+        list: Markdown片段列表
+    """
+    if isinstance(block, ParagraphBlock):
+        return paragraph_to_markdown(block, document, image_store, image_id_counter)
+    if isinstance(block, TableBlock):
+        md_table = table_to_markdown(block)
+        return [md_table] if md_table else []
+    return []
+
+
+def document_to_markdown(document, image_dir="images"):
+    """
+    将文档IR转换为Markdown文本
     
-    if element.tail and element.tail.strip():
-        print(f"{indent}{element.tail.strip()}")
+    Args:
+        document (DocumentIR): parse_docx 得到的文档IR
+        image_dir (str | ImageStore): 图像保存目录或图像存储，默认为"images"
+        
+    Returns:
+        str: Markdown文本
+    """
+    image_store = as_image_store(image_dir)
+    md_content = []
+    # Use a counter wrapped in a list to track the image_id through function calls
+    image_id_counter = [1]
+    for block in document.blocks:
+        md_content.extend(block_to_markdown(block, document, image_store, image_id_counter))
+    return '\n\n'.join(md_content)
 
 
-def process_paragraph_element_recursively(element):
-    """Recursively process paragraph element to extract text and math in correct order."""
-    result_parts = []
+def iter_markdown_blocks(docx_source, image_dir="images"):
+    """
+    流式转换：以 iterparse 逐块读取 word/document.xml 并逐个生成Markdown片段
+    
+    适用于数百页、含数千个公式的学位论文：不构建完整的文档对象，处理完的XML元素立即释放，
+    图像只在被引用时从压缩包读取。输出与 docx_to_markdown 按 "\\n\\n" 拼接前的片段一致。
+    
+    Args:
+        docx_source (str | IO[bytes]): DOCX文件路径或可随机访问的二进制文件对象
+        image_dir (str | ImageStore): 图像保存目录或图像存储，默认为"images"
+        
+    Yields:
+        str: Markdown片段（段落、标题、图像或表格）
+    """
+    image_store = as_image_store(image_dir)
+    image_id_counter = [1]
+    with StreamedDocument(docx_source) as document:
+        for block in document.iter_blocks():
+            yield from block_to_markdown(block, document, image_store, image_id_counter)
 
-    # Process all child elements in order
-    for child in element:
-        tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-
-        if tag == 'r':  # Run element
-            # Process run content
-            run_text = process_run_element(child)
-            if run_text:
-                result_parts.append(run_text)
-
-        elif tag == 'oMath':  # Math element
-            # (debug prints removed)
-            
-            latex_formula = omml_to_latex_basic(child)
-            if latex_formula and latex_formula != "[Math Formula]":
-                # Determine if it's inline or display math
-                if len(latex_formula) > 50 or any(cmd in latex_formula for cmd in ['\\frac', '\\sum', '\\int', '\\prod']):
-                    result_parts.append(f" $$\n{latex_formula}\n$$ ")
-                else:
-                    result_parts.append(f" ${latex_formula}$ ")
-
-        else:
-            # Recursively process other elements
-            child_text = process_paragraph_element_recursively(child)
-            if child_text:
-                result_parts.append(child_text)
-
-    return ''.join(result_parts)
-
-
-def process_run_element(run_element):
-    """Process a run element to extract text and inline math."""
-    result_parts = []
 
-    for child in run_element:
-        tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
+def docx_to_markdown_streaming(docx_path, output_md_path, image_dir="images"):
+    """
+    流式将DOCX文件转换为Markdown文件，片段生成后立即写出
+    
+    Args:
+        docx_path (str): 输入的DOCX文件路径
+        output_md_path (str): 输出的Markdown文件路径
+        image_dir (str): 图像保存目录，默认为"images"
+    """
+    with open(output_md_path, 'w', encoding='utf-8', errors='xmlcharrefreplace') as f:
+        for i, piece in enumerate(iter_markdown_blocks(docx_path, image_dir)):
+            if i:
+                f.write('\n\n')
+            f.write(piece)
 
-        if tag == 't':  # Text element
-            if child.text:
-                result_parts.append(child.text)
 
-        elif tag == 'oMath':  # Inline math in run
-            latex_formula = omml_to_latex_basic(child)
-            if latex_formula and latex_formula != "[Math Formula]":
-                # For math in runs, prefer inline format
-                result_parts.append(f" ${latex_formula}$ ")
+def docx_to_markdown(docx_source, image_dir="images"):
+    """
+    将DOCX文档转换为Markdown文本，保持文本、图像、表格和数学公式的顺序
 
-        else:
-            # Recursively process other elements
-            child_text = process_run_element(child)
-            if child_text:
-                result_parts.append(child_text)
+    转换状态均为局部变量，可在多个线程中同时调用；
+    图像按内容哈希命名，多篇文档可共用同一图像目录，相同的图像只保存一份。
 
-    return ''.join(result_parts)
+    Args:
+        docx_source (str | bytes | IO[bytes]): DOCX文件路径、文件内容或二进制文件对象
+        image_dir (str): 图像保存目录，默认为"images"
+
+    Returns:
+        str: Markdown文本
+    """
+    return document_to_markdown(parse_docx(docx_source), image_dir)
 
 
 def docx_to_markdown_with_formulas(docx_path, output_md_path, image_dir="images"):
@@ -346,53 +318,16 @@ def docx_to_markdown_with_formulas(docx_path, output_md_path, image_dir="images"
         - 支持UTF-8编码，处理中文内容
         - 数学公式会转换为LaTeX格式
     """
-    # Create image directory if it doesn't exist
-    if not os.path.exists(image_dir):
-        os.makedirs(image_dir)
-    
-    doc = Document(docx_path)
-    md_content = []
-    
-    # Use a counter wrapped in a list to track the image_id through function calls
-    image_id_counter = [1]
-    formula_count = {'inline': 0, 'display': 0}
-    
-    # Build a map of relationship IDs to relationships
-    relationship_map = {}
-    for rel_id, rel in doc.part.rels.items():
-        relationship_map[rel_id] = rel
-    
-    # Process document blocks (paragraphs and tables) in order
-    for block in iter_block_items(doc):
-        if isinstance(block, Paragraph):
-            para_content = process_paragraph_with_math(block, image_dir, image_id_counter, relationship_map)
-            
-            # Count formulas for statistics
-            for content in para_content:
-                if content.startswith('$$') and content.endswith('$$'):
-                    formula_count['display'] += 1
-                elif '$' in content and not content.startswith('$$'):
-                    formula_count['inline'] += content.count('$') // 2
-            
-            if para_content:
-                md_content.extend(para_content)
-                
-        elif isinstance(block, Table):
-            md_table = table_to_markdown(block)
-            if md_table:
-                md_content.append(md_table)
-    
-    # Note: All images should be processed within paragraphs above
-    # No need to check for remaining images as they are handled in paragraph processing
+    markdown = docx_to_markdown(docx_path, image_dir)
     
     # Write to markdown file - ensure UTF-8 encoding
     try:
         with open(output_md_path, 'w', encoding='utf-8') as f:
-            f.write('\n\n'.join(md_content))
+            f.write(markdown)
     except UnicodeEncodeError:
         # Fallback to write with explicit error handling
         with open(output_md_path, 'w', encoding='utf-8', errors='xmlcharrefreplace') as f:
-            f.write('\n\n'.join(md_content))
+            f.write(markdown)
 
 def main():
     """
@@ -412,13 +347,17 @@ def main():
     parser.add_argument('docx_file', help='输入的DOCX文件路径')
     parser.add_argument('-o', '--output', help='输出的Markdown文件路径（可选）')
     parser.add_argument('-i', '--image_dir', default='images', help='图像保存目录（默认：images）')
+    parser.add_argument('--stream', action='store_true', help='流式转换，适用于超大文档')
     
     args = parser.parse_args()
     
     docx_path = args.docx_file
     output_path = args.output if args.output else os.path.splitext(docx_path)[0] + '_with_formulas.md'
     
-    docx_to_markdown_with_formulas(docx_path, output_path, args.image_dir)
+    if args.stream:
+        docx_to_markdown_streaming(docx_path, output_path, args.image_dir)
+    else:
+        docx_to_markdown_with_formulas(docx_path, output_path, args.image_dir)
 
 
 if __name__ == "__main__":
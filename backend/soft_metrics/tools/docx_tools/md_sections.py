@@ -0,0 +1,130 @@
+"""
+Markdown标题索引
+对 markdown 文本只扫描一次，记录每个 ATX 标题（#、##、###……）的层级、标题文字与偏移，
+章节、子章节都按偏移直接切片，不再对每个标题重新 find / re.search，重复的标题也各自对应自己的位置。
+
+每个标题所在小节的范围为 [start, end)：从标题行开始，到下一个同级或更高级标题为止（没有则到文末），
+因此一级标题的小节包含其下的全部二级、三级标题。
+
+extract_md.extract_chapters、md2pkl.extract_chapters 与 soft_metrics 整体评估的章节提取共用该索引。
+
+使用方法：
+    from tools.docx_tools.md_sections import MarkdownIndex
+
+    index = MarkdownIndex(md)
+    for heading in index.at_level(1):
+        section = index.section(heading)        # 含标题行的整节内容
+        body = index.body(heading)              # 不含标题行
+        for sub in index.children(heading):     # 直接下级（二级）标题
+            ...
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+# 标题行：行首的 # 序列 + 空格 + 标题文字
+_HEADING_RE = re.compile(r'^(#+) (.+)$', re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class Heading:
+    """一个标题及其小节在原文中的偏移"""
+    position: int      # 在全部标题中的序号
+    level: int         # 标题层级，# 为 1
+    title: str         # 标题文字（不含 # 与空格）
+    start: int         # 标题行起始偏移
+    body_start: int    # 标题行末尾（换行符之前）的偏移
+    end: int           # 小节结束偏移：下一个同级或更高级标题的起始位置，没有时为文本长度
+
+
+class MarkdownIndex:
+    """markdown 文本的标题索引，构造时一次扫描得到全部标题及其小节范围"""
+
+    def __init__(self, text: str):
+        """
+        Args:
+            text: markdown 文本
+        """
+        self.text = text
+        matches = [(len(m.group(1)), m.group(2), m.start(), m.end()) for m in _HEADING_RE.finditer(text)]
+
+        # 用栈确定每个小节的结束位置：遇到同级或更高级标题时，栈中更深的小节全部结束
+        ends = [len(text)] * len(matches)
+        stack: List[int] = []
+        for i, (level, _, start, _) in enumerate(matches):
+            while stack and matches[stack[-1]][0] >= level:
+                ends[stack.pop()] = start
+            stack.append(i)
+
+        self.headings: List[Heading] = [
+            Heading(i, level, title, start, body_start, ends[i])
+            for i, (level, title, start, body_start) in enumerate(matches)
+        ]
+
+    def at_level(self, level: int) -> List[Heading]:
+        """
+        获取指定层级的全部标题
+
+        Args:
+            level: 标题层级，# 为 1
+
+        Returns:
+            List[Heading]: 按出现顺序排列的标题
+        """
+        return [heading for heading in self.headings if heading.level == level]
+
+    def descendants(self, heading: Heading) -> Iterator[Heading]:
+        """
+        遍历小节内的全部下级标题
+
+        Args:
+            heading: 上级标题
+
+        Yields:
+            Heading: 按出现顺序排列的下级标题
+        """
+        for position in range(heading.position + 1, len(self.headings)):
+            sub = self.headings[position]
+            if sub.start >= heading.end:
+                break
+            yield sub
+
+    def children(self, heading: Heading) -> List[Heading]:
+        """
+        获取小节内的直接下级标题（层级恰好低一级）
+
+        Args:
+            heading: 上级标题
+
+        Returns:
+            List[Heading]: 按出现顺序排列的下级标题
+        """
+        return [sub for sub in self.descendants(heading) if sub.level == heading.level + 1]
+
+    def section(self, heading: Heading) -> str:
+        """标题所在小节的内容，含标题行"""
+        return self.text[heading.start:heading.end]
+
+    def body(self, heading: Heading) -> str:
+        """标题所在小节的内容，不含标题行"""
+        return self.text[heading.body_start:heading.end]
+
+
+def unique_title(sections: Dict[str, object], title: str) -> str:
+    """
+    为重复的标题生成不冲突的键，第二次出现起依次加上 " (2)"、" (3)"……
+
+    Args:
+        sections: 已有的 标题 -> 内容 字典
+        title: 标题文字
+
+    Returns:
+        str: 字典中尚不存在的键
+    """
+    key = title
+    n = 1
+    while key in sections:
+        n += 1
+        key = f"{title} ({n})"
+    return key
@@ -0,0 +1,370 @@
+"""
+论文容器（.paper）
+以单个 SQLite 文件保存一篇论文的结构化数据，替代 md2pkl 输出的 pickle：
+- 带格式标识与版本号（SQLite 文件头中的 application_id 与 user_version），读取前只需检查前 100 字节即可校验；
+- 摘要、参考文献等元数据与章节分表保存，章节表带序号索引，可只读取章节名，或按序号读取部分章节，
+  不必把全部正文与图像列表载入内存；
+- 读取过程不执行任何 pickle 代码，来源不可信的文件也可以安全打开。
+
+章节字段统一为 chapter_name、content、images；旧数据中的 text_content、title 等键在写入时归一。
+
+数据表：
+    meta(key, value)                               -- name、sha256、zh_abs、en_abs、ref
+    chapters(position, chapter_name, content, images)  -- images 为 JSON 数组
+
+使用方法：
+    from tools.docx_tools.paper_store import PaperReader, read_paper, write_paper
+
+    write_paper("data/processed/docx/paper.paper", parsed)   # parsed 为 md2pkl.parse_markdown 的结果
+    with PaperReader("data/processed/docx/paper.paper") as paper:
+        names = paper.chapter_names()
+        chapter = paper.chapter(2)
+    data = read_paper("data/processed/docx/paper.paper")       # 与 md2pkl 旧格式相同的字典
+
+    # 将旧的 pkl 文件转换为 .paper（会执行 pickle 代码，只用于可信的文件）
+    python -m tools.docx_tools.paper_store data/processed/docx
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+import struct
+import sys
+import tempfile
+from glob import glob
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import quote
+
+# 论文容器的扩展名
+PAPER_EXT = '.paper'
+# 写入 SQLite 文件头的格式标识（"PAPR"）与版本号
+APPLICATION_ID = 0x50415052
+FORMAT_VERSION = 1
+
+_SQLITE_MAGIC = b'SQLite format 3\x00'
+
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE chapters (
+    position INTEGER PRIMARY KEY,
+    chapter_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    images TEXT NOT NULL
+);
+"""
+
+
+class PaperFormatError(ValueError):
+    """文件不是可识别的论文容器，或版本不受支持"""
+
+
+def normalize_chapter(chapter: Any, index: int) -> Dict[str, Any]:
+    """
+    将各种来源的章节数据归一为 {'chapter_name', 'content', 'images'}
+
+    Args:
+        chapter: 章节字典（content / text_content，chapter_name / title / heading）或纯文本
+        index: 章节序号（从 1 开始），缺少名称时用于生成 "章节 N"
+
+    Returns:
+        Dict[str, Any]: 归一后的章节
+    """
+    if isinstance(chapter, str):
+        return {'chapter_name': f"章节 {index}", 'content': chapter, 'images': []}
+    if not isinstance(chapter, dict):
+        raise PaperFormatError(f"第 {index} 章的数据类型无效: {type(chapter).__name__}")
+    name = chapter.get('chapter_name') or chapter.get('title') or chapter.get('heading') or f"章节 {index}"
+    content = chapter.get('content') or chapter.get('text_content') or ''
+    images = chapter.get('images') or chapter.get('img_paths') or []
+    if not isinstance(content, str):
+        raise PaperFormatError(f"第 {index} 章的内容不是字符串")
+    return {'chapter_name': str(name), 'content': content, 'images': [str(image) for image in images]}
+
+
+def write_paper(path: str, data: Dict[str, Any], name: str = '', sha256: str = '') -> str:
+    """
+    将结构化的论文数据写入 .paper 文件，先写入同目录的临时文件再替换
+
+    Args:
+        path: 输出路径
+        data: 包含 zh_abs、en_abs、ref、chapters 的字典（md2pkl.parse_markdown 的结果）
+        name: 论文名称
+        sha256: 源 docx 的 sha256
+
+    Returns:
+        str: 输出文件的绝对路径
+
+    Raises:
+        PaperFormatError: 章节数据无效
+    """
+    chapters = [normalize_chapter(chapter, i) for i, chapter in enumerate(data.get('chapters') or [], 1)]
+    meta = {'name': name, 'sha256': sha256}
+    for key in ('zh_abs', 'en_abs', 'ref'):
+        meta[key] = data.get(key) or ''
+
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=PAPER_EXT)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute(f'PRAGMA application_id = {APPLICATION_ID}')
+            conn.execute(f'PRAGMA user_version = {FORMAT_VERSION}')
+            conn.executescript(_SCHEMA)
+            with conn:
+                conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', meta.items())
+                conn.executemany(
+                    'INSERT INTO chapters (position, chapter_name, content, images) VALUES (?, ?, ?, ?)',
+                    [(i, ch['chapter_name'], ch['content'], json.dumps(ch['images'], ensure_ascii=False))
+                     for i, ch in enumerate(chapters)],
+                )
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def is_paper_file(path: str) -> bool:
+    """
+    检查文件头，判断是否为当前版本的论文容器
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        bool: 是否可由 PaperReader 读取
+    """
+    try:
+        _check_header(path)
+        return True
+    except (OSError, PaperFormatError):
+        return False
+
+
+def _check_header(path: str) -> None:
+    """读取 SQLite 文件头，校验格式标识与版本号"""
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(_SQLITE_MAGIC):
+        raise PaperFormatError(f"{path} 不是论文容器文件")
+    user_version, = struct.unpack('>I', header[60:64])
+    application_id, = struct.unpack('>I', header[68:72])
+    if application_id != APPLICATION_ID:
+        raise PaperFormatError(f"{path} 不是论文容器文件")
+    if user_version != FORMAT_VERSION:
+        raise PaperFormatError(f"{path} 的格式版本为 {user_version}，当前只支持版本 {FORMAT_VERSION}")
+
+
+class PaperReader:
+    """论文容器的只读访问，元数据与章节按需查询"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: .paper 文件路径
+
+        Raises:
+            FileNotFoundError: 文件不存在
+            PaperFormatError: 文件不是当前版本的论文容器
+        """
+        self.path = os.path.abspath(path)
+        _check_header(self.path)
+        # 文件只会被整体替换，不会原地修改：以 immutable 方式打开，省去加锁
+        uri = f"file:{quote(self.path)}?mode=ro&immutable=1"
+        try:
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._meta = dict(self._conn.execute('SELECT key, value FROM meta'))
+        except sqlite3.DatabaseError as e:
+            raise PaperFormatError(f"{path} 已损坏: {e}") from e
+
+    @property
+    def name(self) -> str:
+        """论文名称"""
+        return self._meta.get('name', '')
+
+    @property
+    def sha256(self) -> str:
+        """源 docx 的 sha256"""
+        return self._meta.get('sha256', '')
+
+    @property
+    def zh_abs(self) -> str:
+        """中文摘要"""
+        return self._meta.get('zh_abs', '')
+
+    @property
+    def en_abs(self) -> str:
+        """英文摘要"""
+        return self._meta.get('en_abs', '')
+
+    @property
+    def ref(self) -> str:
+        """参考文献"""
+        return self._meta.get('ref', '')
+
+    def __len__(self) -> int:
+        return self._conn.execute('SELECT COUNT(*) FROM chapters').fetchone()[0]
+
+    def chapter_names(self) -> List[str]:
+        """
+        按顺序获取全部章节名，不读取正文
+
+        Returns:
+            List[str]: 章节名列表
+        """
+        return [row[0] for row in self._conn.execute('SELECT chapter_name FROM chapters ORDER BY position')]
+
+    def chapter(self, position: int) -> Dict[str, Any]:
+        """
+        读取一个章节
+
+        Args:
+            position: 章节序号（从 0 开始）
+
+        Returns:
+            Dict[str, Any]: {'chapter_name', 'content', 'images'}
+
+        Raises:
+            IndexError: 序号超出范围
+        """
+        row = self._conn.execute(
+            'SELECT chapter_name, content, images FROM chapters WHERE position = ?', (position,)
+        ).fetchone()
+        if row is None:
+            raise IndexError(f"章节序号超出范围: {position}")
+        return {'chapter_name': row[0], 'content': row[1], 'images': json.loads(row[2])}
+
+    def iter_chapters(self, positions: Optional[Sequence[int]] = None,
+                      with_images: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        按顺序逐个读取章节
+
+        Args:
+            positions: 只读取这些序号的章节，默认读取全部
+            with_images: 为 False 时不读取图像列表（images 为空列表）
+
+        Yields:
+            Dict[str, Any]: {'chapter_name', 'content', 'images'}
+        """
+        columns = 'chapter_name, content, images' if with_images else "chapter_name, content, '[]'"
+        if positions is None:
+            rows = self._conn.execute(f'SELECT {columns} FROM chapters ORDER BY position')
+        else:
+            positions = list(positions)
+            placeholders = ', '.join('?' * len(positions))
+            rows = self._conn.execute(
+                f'SELECT {columns} FROM chapters WHERE position IN ({placeholders}) ORDER BY position', positions
+            )
+        for name, content, images in rows:
+            yield {'chapter_name': name, 'content': content, 'images': json.loads(images)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        读取全部内容，转换为 md2pkl 的字典格式
+
+        Returns:
+            Dict[str, Any]: 包含 zh_abs、en_abs、ref、chapters 的字典
+        """
+        return {
+            'zh_abs': self.zh_abs,
+            'en_abs': self.en_abs,
+            'ref': self.ref,
+            'chapters': list(self.iter_chapters()),
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self._conn.close()
+
+    def __enter__(self) -> 'PaperReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _read_legacy_pickle(path: str) -> Dict[str, Any]:
+    """读取旧的 pkl 文件并归一章节字段"""
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    if not isinstance(data, dict):
+        raise PaperFormatError(f"{path} 中的数据不是字典")
+    data['chapters'] = [normalize_chapter(chapter, i) for i, chapter in enumerate(data.get('chapters') or [], 1)]
+    return data
+
+
+def read_paper(path: str, allow_pickle: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    读取论文数据，返回 md2pkl 的字典格式
+
+    Args:
+        path: .paper 文件路径；旧的 .pkl 文件只在 allow_pickle 为 True 时读取
+        allow_pickle: 是否允许读取旧的 pkl 文件，默认取 PAPER_STORE_CONFIG['allow_legacy_pickle']
+
+    Returns:
+        Dict[str, Any]: 包含 zh_abs、en_abs、ref、chapters 的字典，章节字段已归一
+
+    Raises:
+        FileNotFoundError: 文件不存在
+        PaperFormatError: 文件格式无法识别，或为不允许读取的 pkl 文件
+    """
+    if allow_pickle is None:
+        # 延迟导入：md2pkl 作为脚本运行时只用到 write_paper
+        from config.data_config import PAPER_STORE_CONFIG
+        allow_pickle = PAPER_STORE_CONFIG['allow_legacy_pickle']
+    if path.lower().endswith('.pkl') and not is_paper_file(path):
+        if not allow_pickle:
+            raise PaperFormatError(
+                f"{path} 为旧的 pkl 格式，请先转换: python -m tools.docx_tools.paper_store {path}"
+            )
+        return _read_legacy_pickle(path)
+    with PaperReader(path) as paper:
+        return paper.to_dict()
+
+
+def migrate(inputs: List[str], remove: bool = False) -> List[str]:
+    """
+    将旧的 pkl 文件转换为同名的 .paper 文件
+
+    Args:
+        inputs: pkl 文件或目录（转换其下的全部 .pkl）
+        remove: 转换成功后是否删除原 pkl 文件
+
+    Returns:
+        List[str]: 生成的 .paper 文件路径
+    """
+    files = []
+    for item in inputs:
+        files.extend(sorted(glob(os.path.join(item, '*.pkl'))) if os.path.isdir(item) else [item])
+    outputs = []
+    for pkl_path in files:
+        data = _read_legacy_pickle(pkl_path)
+        name = os.path.splitext(os.path.basename(pkl_path))[0]
+        outputs.append(write_paper(os.path.splitext(pkl_path)[0] + PAPER_EXT, data, name=name))
+        if remove:
+            os.remove(pkl_path)
+        print(f"{pkl_path} -> {outputs[-1]}")
+    return outputs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='将旧的 pkl 文件转换为 .paper 论文容器（只用于可信的文件）')
+    parser.add_argument('inputs', nargs='+', help='pkl 文件或目录')
+    parser.add_argument('--remove', action='store_true', help='转换成功后删除原 pkl 文件')
+    args = parser.parse_args()
+    try:
+        migrate(args.inputs, remove=args.remove)
+    except (OSError, PaperFormatError, pickle.UnpicklingError) as e:
+        print(f"转换失败: {e}")
+        sys.exit(1)
@@ -1,25 +1,28 @@
 from glob import glob
 import os
 
+# 论文容器（.paper）与旧的 pkl 文件
+PAPER_FILE_EXTS = ('.paper', '.pkl')
+
 def get_pkl_files(INPUT_ROOT: str) -> list[str]:
     """
-    获取PKL文件列表
+    获取论文文件列表（.paper，以及旧的 .pkl）
     
     Args:
         INPUT_ROOT: 输入路径（文件或目录）
         
     Returns:
-        PKL文件路径列表
+        论文文件路径列表
     """
     if os.path.isfile(INPUT_ROOT):
-        if INPUT_ROOT.endswith('.pkl'):
+        if INPUT_ROOT.endswith(PAPER_FILE_EXTS):
             return [INPUT_ROOT]
         else:
-            print(f"错误: {INPUT_ROOT} 不是PKL文件")
+            print(f"错误: {INPUT_ROOT} 不是.paper或PKL文件")
             return []
     elif os.path.isdir(INPUT_ROOT):
-        pkl_files = glob(os.path.join(INPUT_ROOT, "*.pkl"))
+        pkl_files = [path for ext in PAPER_FILE_EXTS for path in glob(os.path.join(INPUT_ROOT, f"*{ext}"))]
         return sorted(pkl_files)
     else:
         print(f"错误: {INPUT_ROOT} 不存在")
-        return []
\ No newline at end of file
+        return []
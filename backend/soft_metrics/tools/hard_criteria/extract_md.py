@@ -1,5 +1,10 @@
 import re
 
+from tools.docx_tools.md_sections import MarkdownIndex, unique_title
+
+# 不作为章节提取的部分
+SKIPPED_SECTIONS = ('目录', '参考文献', '致谢', '附录')
+
 def load_md(md_file: str) -> str:
     with open(md_file, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -63,6 +68,7 @@ def extract_chapters(content) -> dict:
     提取规则：
     1. 只提取一级标题（#开头）作为主章节
     2. 二级标题（##开头）作为子章节，三级及以下标题（###开头）作为二级标题的内容部分
+    3. 章节、子章节按 MarkdownIndex 一次扫描得到的偏移切片，重复的标题依次命名为 "标题 (2)"、"标题 (3)"
     4. 自动跳过目录、参考文献、致谢、附录等部分
     
     Args:
@@ -71,60 +77,20 @@ def extract_chapters(content) -> dict:
     Returns:
         dict: 章节字典，格式为 {章节名: {'content': 章节全部内容, 'subchapters': {子章节名: 子章节内容}}}
     """
-    # 存储所有章节的字典
+    index = MarkdownIndex(content)
     chapters = {}
     
-    # 只匹配一级标题（大章节）
-    sections = re.findall(r'^# (.+?)$', content, re.MULTILINE)
-    
-    for section in sections:
-        if '目录' in section or '参考文献' in section or '致谢' in section or '附录' in section:
+    for heading in index.at_level(1):
+        section = heading.title
+        if any(word in section for word in SKIPPED_SECTIONS):
             continue
-            
-        # 提取章节内容 - 从当前章节到下一个一级章节
-        section_start = content.find(f'# {section}')
-        if section_start == -1:
-            continue
-            
-        # 查找下一个一级标题的位置
-        next_section_pattern = r'\n# [^#]'
-        next_section_match = re.search(next_section_pattern, content[section_start + 1:])
-        
-        if next_section_match:
-            next_section = section_start + 1 + next_section_match.start()
-            section_content = content[section_start:next_section].strip()
-        else:
-            section_content = content[section_start:].strip()
         
-        # 提取二级子章节（只匹配##开头的）
-        subsections = re.findall(r'^## (.+?)$', section_content, re.MULTILINE)
         subchapters = {}
+        for sub in index.children(heading):
+            subchapters[unique_title(subchapters, sub.title)] = index.section(sub).strip()
         
-        for sub in subsections:
-            # 在章节内容中查找当前二级标题
-            sub_start_pattern = f'^## {re.escape(sub)}$'
-            sub_start_match = re.search(sub_start_pattern, section_content, re.MULTILINE)
-            
-            if not sub_start_match:
-                continue
-                
-            sub_start = sub_start_match.start()
-            
-            # 查找下一个二级标题的位置
-            next_sub_pattern = r'\n## [^#]'
-            next_sub_match = re.search(next_sub_pattern, section_content[sub_start + 1:])
-            
-            if next_sub_match:
-                next_sub = sub_start + 1 + next_sub_match.start()
-                sub_content = section_content[sub_start:next_sub].strip()
-            else:
-                # 如果没有下一个二级标题，取到章节结尾
-                sub_content = section_content[sub_start:].strip()
-            
-            subchapters[sub] = sub_content.strip()
-        
-        chapters[section] = {
-            'content': section_content,
+        chapters[unique_title(chapters, section)] = {
+            'content': index.section(heading).strip(),
             'subchapters': subchapters
         }
     
@@ -19,38 +19,17 @@ DeepSeek Tokenizer 官方工具，用于计算文本文件的token数量
 """
 
 import os
+import sys
 import argparse
-import warnings
 
-# 全局变量
-_transformers = None
-_tokenizer = None
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from tools.token_count import tokenizer_service
 
-def _safe_import_transformers():
-    """安全导入transformers库"""
-    global _transformers
-    if _transformers is None:
-        try:
-            import transformers
-            _transformers = transformers
-        except ImportError:
-            warnings.warn("transformers库未安装，请运行: pip install transformers")
-            _transformers = None
-    return _transformers
 
 def get_tokenizer():
-    """获取tokenizer实例"""
-    global _tokenizer
-    if _tokenizer is None:
-        transformers = _safe_import_transformers()
-        if transformers:
-            try:
-                _tokenizer = transformers.AutoTokenizer.from_pretrained(
-                    "./", trust_remote_code=True
-                )
-            except Exception as e:
-                warnings.warn(f"初始化tokenizer失败: {e}")
-    return _tokenizer
+    """获取tokenizer实例，由 tokenizer_service 统一加载本目录下的分词器文件"""
+    return tokenizer_service.get_tokenizer('deepseek')
 
 def count_tokens(file_path):
     """
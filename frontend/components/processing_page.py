@@ -4,7 +4,10 @@ import json
 import random
 import uuid
 import base64
-from ..services.document_processor import convert_word_to_html_with_math, simulate_analysis_with_toc, extract_toc_from_docx
+from ..services.job_queue import submit_paper_job, get_job, get_job_part, SUCCEEDED, FAILED
+
+# 轮询任务状态的间隔（秒）
+JOB_POLL_INTERVAL = 1.0
 
 # 使用iframe和HTML/CSS/JS实现客户端轮播效果
 def display_carousel_messages():
@@ -109,13 +112,25 @@ def display_carousel_messages():
     """, unsafe_allow_html=True)
 
 def render_processing_page():
-    """渲染处理页面"""
-    # 检查是否有上传的文件
-    if not hasattr(st.session_state, 'uploaded_file') or st.session_state.uploaded_file is None:
+    """渲染处理页面：提交后台任务并轮询任务状态，文档预览生成后即跳转到结果页面逐章展示评估结果"""
+    job_id = st.session_state.get('job_id')
+    # 检查是否有上传的文件或进行中的任务
+    if not job_id and st.session_state.get('uploaded_file') is None:
         st.warning("请先上传文件")
         st.session_state.current_page = 'upload'
         st.rerun()
     
+    # 提交后台任务，任务ID写入URL以便刷新页面后重新关联
+    if not job_id:
+        uploaded_file = st.session_state.uploaded_file
+        job_id = submit_paper_job(uploaded_file.name, uploaded_file.getvalue())
+        st.session_state.job_id = job_id
+        st.session_state.file_name = uploaded_file.name
+        st.session_state.word_html = None
+        st.session_state.analysis_result = None
+        st.session_state.processing_complete = False
+        st.query_params['job'] = job_id
+    
     # 添加CSS来隐藏上一页的按钮
     st.markdown("""
     <style>
@@ -150,7 +165,7 @@ def render_processing_page():
         </div>
         <div>
             <div style="font-size: 1.1rem; font-weight: 600; color: var(--text-primary);">
-                {st.session_state.uploaded_file.name}
+                {st.session_state.get('file_name', '')}
             </div>
             <div style="color: var(--text-secondary); font-size: 0.85rem;">
                 正在处理文档并进行智能分析，请稍候...
@@ -159,87 +174,44 @@ def render_processing_page():
     </div>
     """, unsafe_allow_html=True)
     
-    # 创建进度条和状态信息显示
-    progress_bar = st.progress(0)
-    status_container = st.empty()
-    
-    # 显示轮播消息（使用iframe解决方案）
+    # 轮询任务状态（只重新运行该片段），随后显示轮播消息
+    render_job_status(job_id)
     display_carousel_messages()
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def render_job_status(job_id):
+    """
+    显示任务进度；文档预览发布或任务完成后跳转到结果页面
     
-    # 初始化处理状态变量
-    if 'processing_complete' not in st.session_state:
-        st.session_state.processing_complete = False
+    Args:
+        job_id: 任务ID
+    """
+    job = get_job(job_id)
+    if job is None:
+        st.error("未找到处理任务，请重新上传文件")
+        st.button("重新上传", on_click=_back_to_upload)
+        return
     
-    if 'processing_active' not in st.session_state:
-        st.session_state.processing_active = False
-        
-    # 直接处理文档 - 移除嵌套的条件判断，确保每次页面加载都会处理文档一次
-    # 这样可以避免因条件判断错误导致流程被跳过
-    if not st.session_state.processing_complete:
-        try:
-            st.session_state.processing_active = True
-            
-            # 定义进度回调函数，用于更新进度条和状态信息
-            def update_progress(progress_value, status_text):
-                progress_bar.progress(progress_value)
-                status_container.info(f"**当前步骤:** {status_text}")
-            
-            # 前置处理阶段 (占总进度的5%)
-            update_progress(0.01, "正在初始化处理环境...")
-            time.sleep(0.3)
-            
-            # 生成HTML预览
-            update_progress(0.03, "正在生成文档预览...")
-            html_content = convert_word_to_html_with_math(st.session_state.uploaded_file)
-            st.session_state.word_html = html_content
-            time.sleep(0.5)
-            
-            update_progress(0.05, "文档预处理完成，准备开始评估...")
-            
-            # 调用论文评估函数，传递进度回调函数，比例为5%-95%
-            analysis_result = simulate_analysis_with_toc(
-                st.session_state.uploaded_file,
-                progress_callback=lambda prog, text: update_progress(0.05 + prog * 0.90, text)
-            )
-            
-            # 最终处理阶段 (占总进度的5%)
-            update_progress(0.96, "正在整理评估结果...")
-            time.sleep(0.3)
-            
-            # 保存TOC项目到会话状态
-            if analysis_result and 'chapters' in analysis_result:
-                st.session_state.toc_items = analysis_result['chapters']
-            
-            # 保存分析结果到会话状态
-            st.session_state.analysis_result = analysis_result
-            
-            update_progress(0.98, "正在准备结果页面...")
-            time.sleep(0.3)
-            
-            # 完成处理
-            update_progress(1.0, "处理完成！")
-            
-            # 设置处理完成标志
-            st.session_state.processing_complete = True
-            st.session_state.processing_active = False
-            
-            # 显示成功消息
-            st.success("文档处理和分析已完成！")
-            time.sleep(0.7)
-            
-            # 处理完成，跳转到结果页面
-            st.session_state.current_page = 'results'
-            st.rerun()
-            
-        except Exception as e:
-            # 处理错误情况
-            st.error(f"处理文档时发生错误: {str(e)}")
-            st.button("重新上传", on_click=lambda: setattr(st.session_state, 'current_page', 'upload'))
-            
-            # 重置处理状态以便下次使用
-            st.session_state.processing_active = False
-            st.session_state.processing_complete = False
-    else:
-        # 如果已经完成，直接跳转到结果页面
+    if job['status'] == FAILED:
+        # 处理错误情况
+        st.error(f"处理文档时发生错误: {job['error']}")
+        st.button("重新上传", on_click=_back_to_upload)
+        return
+    
+    st.progress(job['progress'])
+    st.info(f"**当前步骤:** {job['message'] or '任务排队中...'}")
+    
+    # 文档预览可用后即进入结果页面，章节评估结果在结果页面陆续显示
+    if job['status'] == SUCCEEDED or get_job_part(job_id, 'word_html') is not None:
+        st.session_state.file_name = job['file_name']
         st.session_state.current_page = 'results'
-        st.rerun() 
\ No newline at end of file
+        st.rerun(scope="app")
+
+
+def _back_to_upload():
+    """放弃当前任务并返回上传页面"""
+    st.session_state.job_id = None
+    st.session_state.processing_complete = False
+    st.session_state.current_page = 'upload'
+    st.query_params.clear()
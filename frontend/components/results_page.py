@@ -1,10 +1,12 @@
 import streamlit as st
 from ..services.document_processor import convert_word_to_html, convert_word_to_html_with_math, extract_toc_from_docx
+from ..services.job_queue import get_job, get_job_part, SUCCEEDED, FAILED
 from ..utils.session_state import reset_session_state
 import re
 import streamlit.components.v1 as components
 import plotly.graph_objects as go
 import textwrap
+import itertools
 import json
 import plotly.utils
 from pathlib import Path
@@ -19,8 +21,14 @@ from frontend.utils.logger_setup import get_module_logger
 # 创建当前模块的logger
 logger = get_module_logger(__name__)
 
+# 评估进行中时轮询任务的间隔（秒）
+JOB_POLL_INTERVAL = 2.0
+
 def render_results_page():
-    """渲染结果展示页面"""
+    """渲染结果展示页面；后台任务仍在进行时逐章展示已完成的评估，整体评价与评分最后显示"""
+    job_id = st.session_state.get('job_id')
+    streaming = bool(job_id) and not st.session_state.get('processing_complete')
+    
     # 创建新容器以替换旧内容
     main_container = st.container()
     
@@ -28,7 +36,12 @@ def render_results_page():
         st.markdown('<h1 class="main-header">📊 文档分析结果</h1>', unsafe_allow_html=True)
     
     # 顶部信息面板
-    if st.session_state.uploaded_file:
+    file_name = st.session_state.get('file_name') or (st.session_state.uploaded_file.name if st.session_state.uploaded_file else None)
+    if file_name:
+        if streaming:
+            status_line = "正在分析 · 章节评估完成后陆续显示"
+        else:
+            status_line = f"分析完成 · {len(st.session_state.toc_items) if hasattr(st.session_state, 'toc_items') else 0} 个章节"
         st.markdown(f"""
         <div style="background: linear-gradient(to right, rgba(67, 97, 238, 0.05), rgba(76, 201, 240, 0.03)); 
                     border-radius: 12px; padding: 1rem 1.5rem; margin-bottom: 2rem; 
@@ -40,10 +53,10 @@ def render_results_page():
                 </div>
                 <div>
                     <div style="font-size: 1.1rem; font-weight: 600; color: var(--text-primary);">
-                        {st.session_state.uploaded_file.name}
+                        {file_name}
                     </div>
                     <div style="color: var(--text-secondary); font-size: 0.85rem;">
-                        分析完成 · {len(st.session_state.toc_items) if hasattr(st.session_state, 'toc_items') else 0} 个章节
+                        {status_line}
                     </div>
                 </div>
             </div>
@@ -63,30 +76,56 @@ def render_results_page():
             st.info("导出功能开发中...")
     
     # 文档预览和分析区域
+    if streaming:
+        _render_streaming_results(job_id)
+    else:
+        _render_analysis_area(
+            st.session_state.get('word_html'),
+            st.session_state.toc_items if hasattr(st.session_state, 'toc_items') else None,
+            st.session_state.get('analysis_result'),
+        )
+    
+    # 废弃 Streamlit 原侧边栏，全部改为 iframe 内部优化建议
+    # 旧侧边栏代码已移除
+
+def _render_analysis_area(word_html, toc_items, analysis_result, status_text="文档分析已完成", pending=False):
+    """
+    渲染文档预览（含章节优化建议）与整体数据分析卡片
+    
+    参数
+    -------
+    word_html : str
+        文档预览HTML
+    toc_items : list
+        目录结构列表，已评估的章节带有 analysis 字段
+    analysis_result : dict
+        完整分析结果，评估进行中时为 None
+    status_text : str
+        状态提示文字
+    pending : bool
+        评估是否仍在进行
+    """
     container = st.container()
     with container:
         
         # 状态提示
-        st.markdown("""
+        st.markdown(f"""
             <div style="display: flex; align-items: center; gap: 1rem;">
                 <div style="height: 6px; flex-grow: 1; background: linear-gradient(90deg, var(--primary-color), var(--primary-light), transparent);
                            border-radius: 3px;"></div>
-                <span style="color: var(--text-secondary); font-size: 0.9rem;">文档分析已完成</span>
+                <span style="color: var(--text-secondary); font-size: 0.9rem;">{status_text}</span>
             </div>
             """, unsafe_allow_html=True)
         
         st.markdown("</div>", unsafe_allow_html=True)
         
         # 文档内容区域（仅 HTML 预览）
-        if hasattr(st.session_state, 'word_html') and st.session_state.word_html:
+        if word_html:
             # 使用辅助函数生成可展示的 HTML
-            html_content = generate_html_preview(st.session_state.word_html)
+            html_content = generate_html_preview(word_html)
             
             # 创建包含导航和内容的完整HTML文档
-            complete_html = create_complete_html_document(
-                html_content, 
-                st.session_state.toc_items if hasattr(st.session_state, 'toc_items') else None
-            )
+            complete_html = create_complete_html_document(html_content, toc_items, pending=pending)
 
             # Use st.components.v1.html to render the full HTML document
             components.html(
@@ -96,86 +135,144 @@ def render_results_page():
             )
             
             # 在 HTML 预览下方展示整体数据分析卡片
-            if hasattr(st.session_state, 'analysis_result') and st.session_state.analysis_result:
-                _render_data_analysis_card(st.session_state.analysis_result)
+            if analysis_result:
+                _render_data_analysis_card(analysis_result)
+            elif pending:
+                st.info("⏳ 整体评价与各维度评分将在全部章节评估完成后显示")
             
         else:
             # 处理没有内容的情况
             st.warning("无法显示文档内容，请重新上传文档。")
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def _render_streaming_results(job_id):
+    """
+    轮询后台任务，展示已发布的文档预览与已完成的章节评估；任务完成后载入完整结果并刷新页面
     
-    # 废弃 Streamlit 原侧边栏，全部改为 iframe 内部优化建议
-    # 旧侧边栏代码已移除
+    参数
+    -------
+    job_id : str
+        任务ID
+    """
+    job = get_job(job_id)
+    if job is None or job['status'] == FAILED:
+        st.error(f"处理文档时发生错误: {job['error'] if job else '未找到处理任务'}")
+        st.button("重新上传", key="stream_reload_btn", on_click=reset_session_state)
+        return
+    
+    if not st.session_state.get('word_html'):
+        st.session_state.word_html = get_job_part(job_id, 'word_html')
+    
+    if job['status'] == SUCCEEDED:
+        analysis_result = job['result']['analysis_result']
+        # 保存TOC项目到会话状态
+        if analysis_result and 'chapters' in analysis_result:
+            st.session_state.toc_items = analysis_result['chapters']
+        # 保存分析结果到会话状态
+        st.session_state.analysis_result = analysis_result
+        st.session_state.processing_complete = True
+        st.rerun(scope="app")
+    
+    toc_items = get_job_part(job_id, 'toc_items') or []
+    evaluated = sum(1 for chapter in toc_items if 'analysis' in chapter)
+    st.progress(job['progress'])
+    _render_analysis_area(
+        st.session_state.word_html,
+        toc_items,
+        None,
+        status_text=f"已完成 {evaluated}/{len(toc_items)} 个章节 · {job['message']}",
+        pending=True,
+    )
 
 # 为HTML内容添加章节锚点
 def add_chapter_anchors_to_html(html_content, toc_items):
-    """为HTML内容添加基于目录的锚点，支持章节和子章节"""
+    """
+    为HTML内容添加基于目录的锚点，支持章节和子章节
+    
+    全部目录文本合并为一个正则，只扫描一次HTML（跳过标签内部，不会把锚点插进属性里），
+    记录每个文本第一次出现的位置，全部目录文本都找到后提前结束，最后一次拼接出结果。
+    同一位置的多个锚点按目录顺序排列。
+    
+    参数
+    -------
+    html_content : str
+        HTML内容
+    toc_items : list
+        目录结构列表，使用 original_text（没有时使用 text）匹配正文
+        
+    返回
+    -------
+    str
+        添加了锚点的HTML
+    """
     if not toc_items:
         return html_content
     
-    enhanced_html = html_content
-    anchors_added = []
-    
     logger.info("开始向HTML内容添加章节锚点...")
     
-    # 为每个目录项在HTML中查找对应位置并添加锚点
+    # 按目录顺序（章节、其子章节、下一章节……）收集 (文本, 锚点ID)
+    entries = []
     for i, chapter in enumerate(toc_items):
         # 使用原始文本(original_text)进行匹配，而不是可能被截断的显示文本(text)
-        chapter_text = chapter.get('original_text', chapter['text'])
-        chapter_id = chapter.get('id', f"section-{i}")
-        
-        # 检查文本是否在HTML中
-        if chapter_text in enhanced_html:
-            # 查找文本在HTML中的位置并添加锚点
-            pattern = re.escape(chapter_text)
-            replacement = f'<div id="{chapter_id}" class="chapter-anchor" style="scroll-margin-top: 60px;"></div>{chapter_text}'
-            
-            # 在第一次出现的位置添加锚点
-            new_html = re.sub(pattern, replacement, enhanced_html, count=1)
-            
-            # 确认锚点添加成功
-            if new_html != enhanced_html:
-                enhanced_html = new_html
-                anchors_added.append(chapter_id)
-                logger.info(f"已添加主章节锚点: '{chapter['text']}' (ID: {chapter_id})")
-            else:
-                # 如果简单替换失败，尝试在段落或标题标签上下文中匹配
-                p_pattern = r'<(p|h[1-6])[^>]*>' + re.escape(chapter_text) + r'</\1>'
-                
-                # 更复杂的替换，保留原始标签
-                new_html = re.sub(
-                    p_pattern,
-                    lambda m: f'<div id="{chapter_id}" class="chapter-anchor" style="scroll-margin-top: 60px;"></div>{m.group(0)}',
-                    enhanced_html,
-                    count=1
-                )
-                
-                if new_html != enhanced_html:
-                    enhanced_html = new_html
-                    anchors_added.append(chapter_id)
-                    logger.info(f"已添加主章节锚点(带标签): '{chapter['text']}' (ID: {chapter_id})")
+        entries.append((chapter.get('original_text', chapter['text']), chapter.get('id', f"section-{i}")))
+        for j, subchapter in enumerate(chapter.get('children') or []):
+            entries.append((subchapter.get('original_text', subchapter['text']), subchapter.get('id', f"subsection-{i}-{j}")))
+    
+    positions = _find_first_occurrences(html_content, {text for text, _ in entries if text})
+    
+    # 锚点按插入位置排序，同一位置保持目录顺序
+    anchors = sorted(
+        (positions[text], order, anchor_id)
+        for order, (text, anchor_id) in enumerate(entries)
+        if text in positions
+    )
+    parts = []
+    last = 0
+    for pos, _, anchor_id in anchors:
+        parts.append(html_content[last:pos])
+        parts.append(f'<div id="{anchor_id}" class="chapter-anchor" style="scroll-margin-top: 60px;"></div>')
+        last = pos
+    parts.append(html_content[last:])
+    
+    missing = len(entries) - len(anchors)
+    logger.info(f"共添加了 {len(anchors)} 个章节锚点" + (f"，{missing} 个目录项未在正文中找到" if missing else ""))
+    return ''.join(parts)
+
+def _find_first_occurrences(html_content, texts):
+    """
+    一次扫描找出各文本在HTML标签之外第一次出现的位置
+    
+    参数
+    -------
+    html_content : str
+        HTML内容
+    texts : set
+        待查找的文本
         
-        # 处理子章节
-        if 'children' in chapter:
-            for j, subchapter in enumerate(chapter['children']):
-                subchapter_text = subchapter.get('original_text', subchapter['text'])
-                subchapter_id = subchapter.get('id', f"subsection-{i}-{j}")
-                
-                if subchapter_text in enhanced_html:
-                    # 查找文本在HTML中的位置并添加锚点
-                    pattern = re.escape(subchapter_text)
-                    replacement = f'<div id="{subchapter_id}" class="chapter-anchor" style="scroll-margin-top: 60px;"></div>{subchapter_text}'
-                    
-                    # 在第一次出现的位置添加锚点
-                    new_html = re.sub(pattern, replacement, enhanced_html, count=1)
-                    
-                    # 确认锚点添加成功
-                    if new_html != enhanced_html:
-                        enhanced_html = new_html
-                        anchors_added.append(subchapter_id)
-                        logger.info(f"已添加子章节锚点: '{subchapter['text']}' (ID: {subchapter_id})")
+    返回
+    -------
+    dict
+        文本 -> 第一次出现的位置，未出现的文本不在结果中
+    """
+    if not texts:
+        return {}
+    # 较长的文本优先匹配；同一位置上较短的文本若是其前缀，也在此处出现
+    ordered = sorted(texts, key=len, reverse=True)
+    prefixes = {text: [other for other in ordered if other != text and text.startswith(other)] for text in ordered}
+    # 标签整体跳过；其余每个位置用零宽前瞻尝试匹配，使相互重叠的文本都能被找到
+    matcher = re.compile(r'<[^>]*>|(?=(' + '|'.join(map(re.escape, ordered)) + r'))')
     
-    logger.info(f"共添加了 {len(anchors_added)} 个章节锚点")
-    return enhanced_html
+    positions = {}
+    for match in matcher.finditer(html_content):
+        text = match.group(1)
+        if text is None:
+            continue
+        pos = match.start()
+        for found in [text] + prefixes[text]:
+            positions.setdefault(found, pos)
+        if len(positions) == len(ordered):
+            break
+    return positions
 
 
 # 新增: HTML 预览处理函数
@@ -203,7 +300,7 @@ def generate_html_preview(raw_html: str) -> str:
     
     return raw_html
 
-def create_complete_html_document(content_html, toc_items=None):
+def create_complete_html_document(content_html, toc_items=None, pending=False):
     """
     创建一个完整的HTML文档，包含内容和导航栏
     
@@ -213,6 +310,8 @@ def create_complete_html_document(content_html, toc_items=None):
         主要内容的HTML
     toc_items : list
         目录结构列表
+    pending : bool
+        评估是否仍在进行，为 True 时没有 analysis 字段的章节显示为评估中
         
     返回
     -------
@@ -236,7 +335,8 @@ def create_complete_html_document(content_html, toc_items=None):
     # 尝试查找每个模式的第二次出现
     filtered_content = content_html
     for pattern in chapter_patterns:
-        matches = list(re.finditer(pattern, content_html, re.IGNORECASE))
+        # 只需要前两次出现，找到后即停止扫描
+        matches = list(itertools.islice(re.finditer(pattern, content_html, re.IGNORECASE), 2))
         if len(matches) >= 2:  # 至少有两次出现
             # 找到第二次出现的位置，从该位置开始截取
             second_occurrence_pos = matches[1].start()
@@ -268,17 +368,22 @@ def create_complete_html_document(content_html, toc_items=None):
             chapter_id = chapter.get('id', f"section-{i}")
             chapter_text = chapter.get('text', '')
             
-            # 获取分析数据，确保使用模型分析结果
-            analysis = chapter.get('analysis', {})
-            summary = analysis.get("summary", f"本章节主要讨论{chapter_text}相关内容。")
-            strengths = analysis.get("strengths", [])
-            weaknesses = analysis.get("weaknesses", [])
-            suggestions = analysis.get("suggestions", [])
-            
-            # 生成优点、缺点和建议列表
-            strengths_html = "".join([f"<li>{item}</li>" for item in strengths]) if strengths else "<li>暂无明确优点</li>"
-            weaknesses_html = "".join([f"<li>{item}</li>" for item in weaknesses]) if weaknesses else "<li>暂无明确不足</li>"
-            suggestions_html = "".join([f"<li>{item}</li>" for item in suggestions]) if suggestions else "<li>暂无具体建议</li>"
+            if pending and 'analysis' not in chapter:
+                # 章节尚未评估完成，显示占位内容
+                summary = "⏳ 本章节正在评估中，完成后将自动显示"
+                strengths_html = weaknesses_html = suggestions_html = "<li>评估中...</li>"
+            else:
+                # 获取分析数据，确保使用模型分析结果
+                analysis = chapter.get('analysis', {})
+                summary = analysis.get("summary", f"本章节主要讨论{chapter_text}相关内容。")
+                strengths = analysis.get("strengths", [])
+                weaknesses = analysis.get("weaknesses", [])
+                suggestions = analysis.get("suggestions", [])
+                
+                # 生成优点、缺点和建议列表
+                strengths_html = "".join([f"<li>{item}</li>" for item in strengths]) if strengths else "<li>暂无明确优点</li>"
+                weaknesses_html = "".join([f"<li>{item}</li>" for item in weaknesses]) if weaknesses else "<li>暂无明确不足</li>"
+                suggestions_html = "".join([f"<li>{item}</li>" for item in suggestions]) if suggestions else "<li>暂无具体建议</li>"
             
             # 生成章节优化建议卡片
             analysis_sidebar_html += f"""
@@ -75,6 +75,7 @@ def render_upload_page():
         st.session_state.uploaded_file = uploaded_file
         
         if st.button("🚀 开始分析", type="primary", use_container_width=True):
+            st.session_state.job_id = None
             st.session_state.current_page = 'processing'
             st.rerun()
     
@@ -0,0 +1,303 @@
+"""
+上传文件的产物缓存
+以上传文件内容的 sha256 与产物类型为键，将 HTML 预览、目录结构与评估结果持久化到
+data/cache 下的 SQLite 数据库。同一份论文再次上传、其他用户上传同一篇论文或评阅人重新打开时，
+直接读取缓存，不再重复转换文档，也不再产生模型请求。
+
+缓存在进程内所有会话之间共享（也可被同一台机器上的多个进程共享），
+总大小超过上限时按最近访问时间淘汰（LRU）。
+设置环境变量 PAPER_EVAL_NO_CACHE=1 可跳过缓存；PAPER_EVAL_ARTIFACT_CACHE_MB 指定大小上限。
+产物附带的外部资源（如预览图像的引用）可通过 on_evict 在条目被淘汰时释放。
+
+使用方法：
+    from frontend.services.artifact_cache import cached_artifact
+
+    html = cached_artifact(data, 'html', lambda: convert(data))
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from frontend.utils.logger_setup import get_module_logger
+
+logger = get_module_logger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ARTIFACT_CACHE_PATH = os.path.join(_APP_DIR, 'data', 'cache', 'artifacts.sqlite3')
+# 缓存总大小上限（MB）
+ARTIFACT_CACHE_MAX_MB = int(os.getenv("PAPER_EVAL_ARTIFACT_CACHE_MB") or 1024)
+# 产物格式版本，转换或评估结果的结构变化时递增，旧条目随之失效
+ARTIFACT_CACHE_VERSION = 1
+
+# cache_stats 只有一行，由触发器随增删改维护缓存总大小，写入时不必对全表求和；
+# 已有数据库首次打开时按现有条目初始化
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS artifacts (
+    sha256 TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (sha256, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_accessed ON artifacts(accessed);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats (id, total_size) SELECT 0, COALESCE(SUM(size), 0) FROM artifacts;
+CREATE TRIGGER IF NOT EXISTS artifacts_size_insert AFTER INSERT ON artifacts BEGIN
+    UPDATE cache_stats SET total_size = total_size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS artifacts_size_update AFTER UPDATE OF size ON artifacts BEGIN
+    UPDATE cache_stats SET total_size = total_size + NEW.size - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS artifacts_size_delete AFTER DELETE ON artifacts BEGIN
+    UPDATE cache_stats SET total_size = total_size - OLD.size WHERE id = 0;
+END;
+COMMIT;
+"""
+
+
+def cache_enabled() -> bool:
+    """判断是否启用产物缓存"""
+    return os.getenv("PAPER_EVAL_NO_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+def content_hash(data: bytes) -> str:
+    """
+    计算上传文件内容的缓存键
+
+    Args:
+        data: 文件内容
+
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtifactCache:
+    """基于 SQLite 的产物缓存，值以 JSON 保存，每次读取都得到新的对象"""
+
+    def __init__(self, path: str, max_size_bytes: int,
+                 evicted_callback: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            path: 数据库文件路径
+            max_size_bytes: 缓存总大小上限（字节）
+            evicted_callback: 条目被淘汰后的回调，调用方式为 evicted_callback(sha256, kind)
+        """
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.evicted_callback = evicted_callback
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sha256: str, kind: str) -> Any:
+        """
+        读取产物，命中时刷新最近访问时间
+
+        Args:
+            sha256: 上传文件内容的 sha256
+            kind: 产物类型
+
+        Returns:
+            Any: 未命中时返回 None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM artifacts WHERE sha256 = ? AND kind = ?", (sha256, kind)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE artifacts SET accessed = ? WHERE sha256 = ? AND kind = ?", (time.time(), sha256, kind)
+        )
+        return json.loads(row[0])
+
+    def contains(self, sha256: str, kind: str) -> bool:
+        """判断产物是否存在，不刷新访问时间"""
+        row = self._connect().execute(
+            "SELECT 1 FROM artifacts WHERE sha256 = ? AND kind = ?", (sha256, kind)
+        ).fetchone()
+        return row is not None
+
+    def put(self, sha256: str, kind: str, value: Any) -> None:
+        """
+        写入产物，并在总大小超过上限时淘汰最久未访问的条目
+
+        Args:
+            sha256: 上传文件内容的 sha256
+            kind: 产物类型
+            value: 可序列化为 JSON 的值
+        """
+        text = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn = self._connect()
+        # 使用 UPSERT 而不是 INSERT OR REPLACE：REPLACE 删除旧行时不触发删除触发器
+        conn.execute(
+            "INSERT INTO artifacts (sha256, kind, value, size, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (sha256, kind) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "created = excluded.created, accessed = excluded.accessed",
+            (sha256, kind, text, len(text.encode("utf-8")), now, now),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按 LRU 将总大小压回上限以内"""
+        total = conn.execute("SELECT total_size FROM cache_stats WHERE id = 0").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        excess = total - self.max_size_bytes
+        freed = 0
+        victims = []
+        for sha256, kind, size in conn.execute("SELECT sha256, kind, size FROM artifacts ORDER BY accessed"):
+            victims.append((sha256, kind))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM artifacts WHERE sha256 = ? AND kind = ?", victims)
+        logger.info(f"产物缓存超出上限，已淘汰 {len(victims)} 条，释放 {freed / 1024 / 1024:.1f} MB")
+        if self.evicted_callback is not None:
+            for sha256, kind in victims:
+                self.evicted_callback(sha256, kind)
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+_evict_listeners: Dict[str, List[Callable[[str], None]]] = {}
+
+
+def on_evict(kind: str, callback: Callable[[str], None]) -> None:
+    """
+    登记某类产物被淘汰时的回调，用于释放产物引用的外部资源
+
+    Args:
+        kind: 产物类型，与 lookup/store 使用的一致（不含版本号）
+        callback: 调用方式为 callback(sha256)
+    """
+    _evict_listeners.setdefault(kind, []).append(callback)
+
+
+def _notify_evicted(sha256: str, kind: str) -> None:
+    """
+    按产物类型分发淘汰通知；旧版本条目被淘汰而当前版本条目仍在时不通知，
+    以免释放当前条目仍在使用的资源。回调出错只记录警告
+    """
+    base_kind = kind.rsplit('@', 1)[0]
+    current_kind = f"{base_kind}@{ARTIFACT_CACHE_VERSION}"
+    if kind != current_kind and _cache is not None and _cache.contains(sha256, current_kind):
+        return
+    for callback in _evict_listeners.get(base_kind, ()):
+        try:
+            callback(sha256)
+        except Exception as e:
+            logger.warning(f"释放被淘汰产物的资源失败: {kind} ({sha256[:12]}): {e}")
+
+
+def get_artifact_cache() -> Optional[ArtifactCache]:
+    """
+    获取进程内共享的产物缓存，缓存被禁用或无法打开时返回 None
+
+    Returns:
+        Optional[ArtifactCache]: 产物缓存实例
+    """
+    global _cache, _cache_failed
+    if not cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None and not _cache_failed:
+            try:
+                _cache = ArtifactCache(ARTIFACT_CACHE_PATH, ARTIFACT_CACHE_MAX_MB * 1024 * 1024,
+                                       evicted_callback=_notify_evicted)
+            except sqlite3.Error as e:
+                logger.warning(f"无法打开产物缓存，已跳过缓存: {e}")
+                _cache_failed = True
+        return _cache
+
+
+def lookup(sha256: str, kind: str) -> Any:
+    """
+    查询上传文件的缓存产物
+
+    Args:
+        sha256: 上传文件内容的 sha256
+        kind: 产物类型，如 'html'、'toc'、'analysis:deepseek-chat'
+
+    Returns:
+        Any: 命中时返回产物，否则返回 None
+    """
+    cache = get_artifact_cache()
+    if cache is None:
+        return None
+    try:
+        value = cache.get(sha256, f"{kind}@{ARTIFACT_CACHE_VERSION}")
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"读取产物缓存失败: {e}")
+        return None
+    if value is not None:
+        logger.info(f"产物缓存命中: {kind} ({sha256[:12]})")
+    return value
+
+
+def store(sha256: str, kind: str, value: Any) -> None:
+    """
+    缓存上传文件的产物，写入失败只记录警告
+
+    Args:
+        sha256: 上传文件内容的 sha256
+        kind: 产物类型
+        value: 可序列化为 JSON 的值
+    """
+    cache = get_artifact_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(sha256, f"{kind}@{ARTIFACT_CACHE_VERSION}", value)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.warning(f"写入产物缓存失败: {e}")
+
+
+def cached_artifact(data: bytes, kind: str, func: Callable[[], Any],
+                    cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+    """
+    命中缓存时直接返回，否则调用 func 并缓存其结果
+
+    Args:
+        data: 上传文件内容
+        kind: 产物类型
+        func: 生成产物的无参函数，抛出的异常原样向上传递
+        cacheable: 判断结果是否可以缓存，例如失败时的兜底结果不缓存
+
+    Returns:
+        Any: 产物
+    """
+    sha256 = content_hash(data)
+    value = lookup(sha256, kind)
+    if value is not None:
+        return value
+    value = func()
+    if value is not None and cacheable(value):
+        store(sha256, kind, value)
+    return value
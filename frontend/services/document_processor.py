@@ -4,7 +4,9 @@ import os
 import sys
 from docx import Document
 import base64
+import hashlib
 import re
+import copy
 from pathlib import Path
 import io
 import docx
@@ -12,12 +14,19 @@ from docx.document import Document
 from docx.opc.constants import RELATIONSHIP_TYPE as RT
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from ..services.docx2html import Docx2HtmlConverter
+import streamlit as st
+from ..services.docx2html import MIME_TYPES, Docx2HtmlConverter, image_data_uri
+from ..services import artifact_cache
+from ..services.job_queue import JOB_RETENTION_DAYS
+from tools.docx_tools.docx_ir import parse_docx
+from tools.docx_tools.image_store import ImageStore
 import json
 import pickle
 from typing import Dict, List, Any, Optional, Tuple
 import time
+import threading
 import traceback
+from collections import OrderedDict
 from bs4 import BeautifulSoup
 
 # 导入自定义日志模块
@@ -26,6 +35,78 @@ from frontend.utils.logger_setup import get_module_logger
 # 创建当前模块的logger
 logger = get_module_logger(__name__)
 
+# 最近解析过的文档IR，按上传内容的sha256索引
+_DOCUMENT_CACHE_SIZE = 4
+_document_cache = OrderedDict()
+_document_cache_lock = threading.Lock()
+
+def load_document_ir(uploaded_file):
+    """
+    获取上传文件的文档IR，同一份文件只解析一次
+    
+    HTML预览、目录提取与论文评估共用同一份IR，缓存最近的若干份文档。
+    
+    Args:
+        uploaded_file: Streamlit上传的文件对象
+        
+    Returns:
+        DocumentIR: 文档中间表示
+    """
+    data = uploaded_file.getvalue()
+    key = hashlib.sha256(data).hexdigest()
+    with _document_cache_lock:
+        document = _document_cache.get(key)
+        if document is not None:
+            _document_cache.move_to_end(key)
+            return document
+    
+    document = parse_docx(data)
+    with _document_cache_lock:
+        _document_cache[key] = document
+        while len(_document_cache) > _DOCUMENT_CACHE_SIZE:
+            _document_cache.popitem(last=False)
+    return document
+
+# 预览图像的内容寻址存储，位于主脚本（app.py）同级的 static 目录下。
+# 开启 server.enableStaticServing（见 .streamlit/config.toml）后由 Streamlit 以 app/static/<路径> 提供，
+# 预览HTML只引用URL，图像字节不进入 session_state，也不会在每次 rerun 时重复发送；
+# 引用计数数据库放在 static 目录之外，不对外提供
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_APP_STATIC_DIR = os.path.join(_APP_DIR, 'static')
+PREVIEW_IMAGE_DIR = os.path.join(_APP_STATIC_DIR, 'preview_images')
+_preview_image_store = ImageStore(PREVIEW_IMAGE_DIR, os.path.join(_APP_DIR, 'data', 'cache', 'preview_images.sqlite3'))
+
+def _release_preview_images(sha256):
+    """静态预览正文被产物缓存淘汰后，撤销该文档对预览图像的引用并删除无人引用的图像"""
+    removed = _preview_image_store.release(sha256)
+    if removed:
+        logger.info(f"已删除 {len(removed)} 个不再被引用的预览图像 ({sha256[:12]})")
+
+# 预览图像以上传文件的 sha256（即 DocumentIR.sha256）登记引用，随对应的缓存正文一起释放；
+# 同一文档重新渲染时以同一 owner 重复登记，覆盖缓存条目不会遗留引用
+artifact_cache.on_evict('html_body:static', _release_preview_images)
+
+def static_serving_enabled():
+    """判断 Streamlit 是否开启了静态文件服务"""
+    try:
+        return bool(st.get_option('server.enableStaticServing'))
+    except Exception:
+        return False
+
+def preview_image_src(image):
+    """
+    将图像落盘到预览图像存储，返回浏览器可访问的URL
+    
+    Args:
+        image (ImageResource): 文档IR中的图像
+        
+    Returns:
+        str: 形如 /app/static/preview_images/ab/<sha256>.png 的URL
+    """
+    path = os.path.relpath(_preview_image_store.materialize(image), _APP_STATIC_DIR).replace(os.sep, '/')
+    base_url = (st.get_option('server.baseUrlPath') or '').strip('/')
+    return f"/{base_url + '/' if base_url else ''}app/static/{path}"
+
 def convert_word_to_html(uploaded_file):
     """
     基本版本：将Word文档转换为HTML
@@ -70,7 +151,8 @@ def convert_word_to_html(uploaded_file):
 def convert_word_to_html_with_math(uploaded_file):
     """
     将 Word 文档转换为 HTML（增强版，支持公式、图片和复杂格式）
-    使用docx2html.py进行转换，支持数学公式的渲染
+    使用docx2html.py基于文档IR进行转换，支持数学公式的渲染；
+    正文按文件内容缓存，同一份文档再次上传时不再解析与渲染
     
     Args:
         uploaded_file: Streamlit上传的文件对象
@@ -79,72 +161,74 @@ def convert_word_to_html_with_math(uploaded_file):
         str: 生成的HTML内容
     """
     try:
-        # 创建临时文件夹用于处理
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 保存上传的文件到临时目录
-            temp_docx_path = os.path.join(temp_dir, "temp_document.docx")
-            with open(temp_docx_path, "wb") as f:
-                f.write(uploaded_file.getvalue())
-            
-            # 设置输出HTML路径
-            temp_html_path = os.path.join(temp_dir, "temp_document.html")
-            
-            # 使用Docx2HtmlConverter进行转换
-            converter = Docx2HtmlConverter()
-            converter.convert_docx_to_html(
-                docx_path=temp_docx_path,
-                output_path=temp_html_path,
-                title=uploaded_file.name,
-                include_images=True
-            )
-            
-            # 读取生成的HTML文件
-            with open(temp_html_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-            
-            # 读取生成的图片文件夹（如果存在）
-            images_dir = os.path.join(temp_dir, "temp_document_images")
-            image_files = {}
-            if os.path.exists(images_dir):
-                for img_file in os.listdir(images_dir):
-                    img_path = os.path.join(images_dir, img_file)
-                    with open(img_path, "rb") as img:
-                        # 转换图片为base64编码，以便嵌入HTML
-                        image_data = base64.b64encode(img.read()).decode('utf-8')
-                        mime_type = get_mime_type(img_file)
-                        image_files[img_file] = f"data:{mime_type};base64,{image_data}"
-                
-                # 替换HTML中的图片引用为base64编码
-                for img_file, img_data in image_files.items():
-                    img_dir_name = os.path.basename(images_dir)
-                    img_path = f"{img_dir_name}/{img_file}"
-                    html_content = html_content.replace(f'src="{img_path}"', f'src="{img_data}"')
-            
-            return html_content
+        # 开启静态文件服务时图片以URL引用，否则以base64内嵌，两种正文分别缓存
+        static = static_serving_enabled()
+        data = uploaded_file.getvalue()
+        sha256 = artifact_cache.content_hash(data)
+        kind = 'html_body:static' if static else 'html_body:inline'
+        cached = artifact_cache.lookup(sha256, kind)
+        # 预览图像文件被清理后缓存的正文不再可用
+        if cached and all(os.path.exists(os.path.join(PREVIEW_IMAGE_DIR, path)) for path in cached['images']):
+            body = cached['body']
+        else:
+            body, images = _render_preview_body(uploaded_file, static)
+            artifact_cache.store(sha256, kind, {'body': body, 'images': images})
+        return Docx2HtmlConverter().wrap_html_document(uploaded_file.name, body)
     except Exception as e:
         logger.info(f"使用增强版转换器处理Word文档时出错: {e}")
         # 如果增强版转换失败，回退到基础版
         return convert_word_to_html(uploaded_file)
 
+def _render_preview_body(uploaded_file, static):
+    """
+    基于文档IR渲染预览正文
+    
+    Args:
+        uploaded_file: Streamlit上传的文件对象
+        static: 是否以静态文件URL引用图片
+        
+    Returns:
+        Tuple[str, List[str]]: 正文HTML，及引用的图片文件相对 PREVIEW_IMAGE_DIR 的路径
+    """
+    document = load_document_ir(uploaded_file)
+    image_src = image_data_uri
+    images = []
+    if static:
+        _preview_image_store.retain(document.sha256, document.images.values())
+        image_src = preview_image_src
+        images = sorted({
+            os.path.relpath(_preview_image_store.path(image.sha256, image.ext), PREVIEW_IMAGE_DIR)
+            for image in document.images.values()
+        })
+    body = Docx2HtmlConverter().convert_document_to_body(document, image_src)
+    return body, images
+
 def get_mime_type(file_path):
     """根据文件扩展名确定MIME类型"""
     ext = os.path.splitext(file_path)[1].lower()
-    mime_types = {
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.gif': 'image/gif',
-        '.bmp': 'image/bmp',
-        '.svg': 'image/svg+xml',
-        '.webp': 'image/webp'
-    }
-    return mime_types.get(ext, 'image/png')  # 默认为PNG
+    return MIME_TYPES.get(ext, 'image/png')  # 默认为PNG
 
 def extract_toc_from_docx(uploaded_file):
+    """
+    从Word文档中提取目录结构，按文件内容缓存
+    
+    Args:
+        uploaded_file: Streamlit上传的文件对象
+        
+    Returns:
+        List[Dict[str, Any]]: 目录项列表，每次调用返回新的列表，调用方可以直接修改
+    """
+    return artifact_cache.cached_artifact(
+        uploaded_file.getvalue(), 'toc',
+        lambda: _extract_toc_from_docx(uploaded_file),
+        cacheable=bool,
+    )
+
+def _extract_toc_from_docx(uploaded_file):
     """从Word文档中提取目录结构，优化识别"第X章"式标题和子章节"""
     try:
-        # 读取文档
-        doc = docx.Document(io.BytesIO(uploaded_file.getvalue()))
+        # 复用文档IR，段落下标与 Document.paragraphs 一致
+        paragraphs = load_document_ir(uploaded_file).paragraphs
         
         toc_items = []
         main_chapters = []  # 存储主章节
@@ -167,7 +251,7 @@ def extract_toc_from_docx(uploaded_file):
         chapter_count = {}
         
         # 第一次扫描：查找目录和章节位置
-        for i, paragraph in enumerate(doc.paragraphs):
+        for i, paragraph in enumerate(paragraphs):
             text = paragraph.text.strip()
             if not text:
                 continue
@@ -214,7 +298,7 @@ def extract_toc_from_docx(uploaded_file):
             start_index = content_start_index
             
             # 第二次扫描：从正文开始位置提取章节
-            for i, paragraph in enumerate(doc.paragraphs[start_index:], start_index):
+            for i, paragraph in enumerate(paragraphs[start_index:], start_index):
                 text = paragraph.text.strip()
                 if not text:
                     continue
@@ -224,11 +308,11 @@ def extract_toc_from_docx(uploaded_file):
                 level = 0
                 
                 # 通过样式名识别标题
-                if paragraph.style.name.startswith('Heading') or '标题' in paragraph.style.name:
+                if paragraph.style_name.startswith('Heading') or '标题' in paragraph.style_name:
                     is_heading = True
                     try:
                         # 从样式名获取级别
-                        level_match = re.search(r'\d+', paragraph.style.name)
+                        level_match = re.search(r'\d+', paragraph.style_name)
                         if level_match:
                             level = int(level_match.group(0))
                         else:
@@ -237,13 +321,9 @@ def extract_toc_from_docx(uploaded_file):
                         level = 1
                 
                 # 通过格式识别标题 - 检查是否粗体或大字体
-                elif paragraph.runs:
-                    is_bold = any(run.bold for run in paragraph.runs if hasattr(run, 'bold'))
-                    is_large = False
-                    try:
-                        is_large = any(run.font.size and run.font.size.pt > 14 for run in paragraph.runs if hasattr(run, 'font') and hasattr(run.font, 'size'))
-                    except:
-                        pass
+                else:
+                    is_bold = paragraph.bold
+                    is_large = (paragraph.font_size or 0) > 14
                         
                     if is_bold or is_large:
                         # 进一步检查是否匹配章节标题模式
@@ -284,19 +364,11 @@ def extract_toc_from_docx(uploaded_file):
                 has_punctuation = re.search(r'[，。：；、,\.;:!？?!]', original_text) is not None
 
                 # 检查字体大小是否足够大（>14pt 视为大字体）
-                is_large_font = False
-                try:
-                    if paragraph.runs:
-                        for run in paragraph.runs:
-                            if run.font.size and run.font.size.pt and run.font.size.pt > 14:
-                                is_large_font = True
-                                break
-                except Exception:
-                    pass
+                is_large_font = (paragraph.font_size or 0) > 14
 
                 # 检查是否为一级标题样式（Heading 1 或 标题 1）
-                style_name_lower = paragraph.style.name.lower() if paragraph.style and paragraph.style.name else ""
-                is_heading1_style = style_name_lower.startswith('heading 1') or '标题 1' in paragraph.style.name or '标题1' in paragraph.style.name if paragraph.style else False
+                style_name_lower = paragraph.style_name.lower()
+                is_heading1_style = style_name_lower.startswith('heading 1') or '标题 1' in paragraph.style_name or '标题1' in paragraph.style_name
 
                 # 对于 level==1，需要字体较大或使用 Heading 1 样式
                 meets_font_style_requirement = True
@@ -340,7 +412,7 @@ def extract_toc_from_docx(uploaded_file):
             
             # 查找有明显特征的段落
             start_index = content_start_index if content_start_index != -1 else 0
-            for i, paragraph in enumerate(doc.paragraphs[start_index:start_index+100], start_index):
+            for i, paragraph in enumerate(paragraphs[start_index:start_index+100], start_index):
                 text = paragraph.text.strip()
                 if not text or len(text) < 4 or len(text) > 100:
                     continue
@@ -360,11 +432,7 @@ def extract_toc_from_docx(uploaded_file):
                 
                 if any(keyword in text for keyword in chapter_keywords):
                     # 确认文本格式特征 - 粗体或单独成段落等
-                    is_formatted = False
-                    if paragraph.runs:
-                        is_bold = any(run.bold for run in paragraph.runs if hasattr(run, 'bold'))
-                        if is_bold:
-                            is_formatted = True
+                    is_formatted = paragraph.bold
                     
                     # 如果是单独的短段落也可能是标题
                     if len(text) < 30:
@@ -468,16 +536,119 @@ def is_personal_info(text):
             return True
     return False
 
+# 评估断点日志目录；完整结果写入产物缓存后删除对应日志，未完成的日志超过任务保留期后清理
+EVAL_JOURNAL_DIR = os.path.join(tempfile.gettempdir(), "paper_eval_journals")
+_journals_swept = False
+_journals_swept_lock = threading.Lock()
+
+def _evaluation_journal_path(input_file_path: str, model_name: str) -> str:
+    """
+    根据输入文件内容与模型名称得到评估断点日志路径
+
+    上传的文件每次都会写到新的临时路径，因此按文件内容而不是路径区分评估任务。
+    """
+    digest = hashlib.sha256()
+    with open(input_file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return os.path.join(EVAL_JOURNAL_DIR, f"{digest.hexdigest()[:32]}_{model_name}.journal.jsonl")
+
+def _remove_evaluation_journal(input_file_path: str, model_name: str) -> None:
+    """评估结果已完整缓存后删除断点日志"""
+    journal_path = _evaluation_journal_path(input_file_path, model_name)
+    try:
+        os.remove(journal_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.info(f"无法删除评估断点日志 {journal_path}: {e}")
+
+def _sweep_evaluation_journals() -> None:
+    """每个进程清理一次超过 JOB_RETENTION_DAYS 未更新的断点日志（中断后未再重新提交的评估）"""
+    global _journals_swept
+    with _journals_swept_lock:
+        if _journals_swept:
+            return
+        _journals_swept = True
+    cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+    try:
+        names = os.listdir(EVAL_JOURNAL_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(EVAL_JOURNAL_DIR, name)
+        try:
+            if name.endswith('.journal.jsonl') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError as e:
+            logger.info(f"无法清理评估断点日志 {path}: {e}")
+
+def _attach_chapter_analyses(toc_items: List[Dict[str, Any]], evaluations: List[Dict[str, Any]],
+                             fill_missing: bool = True) -> None:
+    """
+    按章节标题将评估结果写入目录项（包括子章节）的 analysis 字段
+    
+    Args:
+        toc_items: 目录项列表，原地修改
+        evaluations: 评估结果列表，整体评估会被跳过，标题匹配时取第一个
+        fill_missing: 未找到匹配评估的目录项是否写入空评估；为 False 时保持没有 analysis 字段，表示尚未评估
+    """
+    chapter_evaluations = [
+        eval_item for eval_item in evaluations
+        # 跳过整体评估
+        if not (eval_item.get('chapter') == "全篇" or eval_item.get('index') == 0)
+    ]
+    
+    def attach(item: Dict[str, Any], placeholder: str) -> None:
+        title = item.get('text', '')
+        # 寻找匹配的章节标题
+        matching_eval = next((
+            eval_item for eval_item in chapter_evaluations
+            if title.lower() in eval_item.get('chapter', '').lower()
+            or eval_item.get('chapter', '').lower() in title.lower()
+        ), None)
+        if matching_eval:
+            item['analysis'] = {
+                "summary": matching_eval.get('summary', ''),
+                "strengths": matching_eval.get('strengths', []),
+                "weaknesses": matching_eval.get('weaknesses', []),
+                "suggestions": matching_eval.get('suggestions', [])
+            }
+        elif fill_missing:
+            # 未找到匹配的评估，添加空评估
+            item['analysis'] = {
+                "summary": placeholder.format(title=title),
+                "strengths": [],
+                "weaknesses": [],
+                "suggestions": []
+            }
+    
+    for chapter in toc_items:
+        attach(chapter, "本章节主要讨论{title}相关内容。")
+        # 处理子章节
+        for child in chapter.get('children') or []:
+            attach(child, "本小节主要讨论{title}相关内容。")
+
 def process_paper_evaluation(input_file_path: str, 
                            toc_items: List[Dict[str, Any]] = None,
-                           model_name: str = "deepseek-chat") -> Dict[str, Any]:
+                           model_name: str = "deepseek-chat",
+                           document=None,
+                           progress_callback=None,
+                           max_workers: Optional[int] = None,
+                           partial_callback=None) -> Dict[str, Any]:
     """
     处理论文评估，调用full_paper_eval.py，并将结果格式化为results_page.py可用格式
     
+    章节评估由 full_paper_eval 的调度器并行执行，每个章节实际完成时推进进度。
+    
     Args:
         input_file_path: 输入文件路径，可以是docx或pkl文件
         toc_items: 目录项列表，如果提供，会将评估结果与章节关联
         model_name: 使用的模型名称，默认为"deepseek-chat"
+        document: 上传文件已解析的文档IR，提供时docx不再重新解析
+        progress_callback: 进度回调函数，接受(current_progress, message)两个参数，进度范围为0-1
+        max_workers: 同时进行的评估请求数，默认取 INTERACTIVE_EVAL_CONFIG['max_workers']
+        partial_callback: 章节评估陆续完成时的回调，参数为目录项列表的副本，已完成的章节带有 analysis 字段
         
     Returns:
         Dict[str, Any]: 包含章节评估结果和整体评分的字典
@@ -485,7 +656,7 @@ def process_paper_evaluation(input_file_path: str,
     try:
         # 设置正确的导入路径
         project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        eval_path = os.path.join(project_root, "backend", "hard_metrics")
+        eval_path = os.path.join(project_root, "backend", "hard_criteria")
         tools_path = os.path.join(eval_path, "tools")
         models_path = os.path.join(eval_path, "models")
         prompts_path = os.path.join(eval_path, "prompts")
@@ -496,14 +667,18 @@ def process_paper_evaluation(input_file_path: str,
                 sys.path.insert(0, path)
         
         # 直接导入模块
-        from backend.hard_metrics.full_paper_eval import process_docx_file, load_chapters, process_chapter
-        from backend.hard_metrics.full_paper_eval import evaluate_overall, score_paper 
+        from backend.hard_criteria.full_paper_eval import process_docx_file, load_chapters, evaluate_paper, DEFAULT_PAPER_SCORES
+        from tools.eval_journal import EvalJournal
+        from config.model_config import INTERACTIVE_EVAL_CONFIG
+        
+        if max_workers is None:
+            max_workers = int(os.getenv("PAPER_EVAL_MAX_WORKERS") or INTERACTIVE_EVAL_CONFIG['max_workers'])
 
         # 处理输入文件
         pkl_file_path = input_file_path
         if input_file_path.lower().endswith('.docx'):
             logger.info("检测到.docx输入，进行文件转换")
-            pkl_file_path = process_docx_file(input_file_path)
+            pkl_file_path = process_docx_file(input_file_path, document=document)
             if not pkl_file_path:
                 logger.info("文件转换失败，无法继续")
                 return {"error": "文档转换失败"}
@@ -529,88 +704,51 @@ def process_paper_evaluation(input_file_path: str,
         if not chapters:
             return {"error": "未找到有效的章节内容"}
             
-        chapter_evaluations = []
-        
-        # 串行评估每个章节
-        for chapter in chapters:
-            evaluation = process_chapter(chapter, model_name)
-            chapter_evaluations.append(evaluation)
+        # 按文件内容定位断点日志，页面重跑或进程中断后已完成的章节不再重复评估
+        _sweep_evaluation_journals()
+        journal_path = _evaluation_journal_path(input_file_path, model_name)
+        journal = EvalJournal(journal_path, resume=True)
+        # 每个章节评估完成时，将已完成的评估写入目录项副本并回调，供页面逐章展示
+        chapter_callback = None
+        if partial_callback and toc_items:
+            completed_evaluations = []
             
-        # 进行整体评估
-        overall_evaluation = evaluate_overall(chapter_evaluations, model_name)
+            def chapter_callback(evaluation):
+                completed_evaluations.append(evaluation)
+                partial_toc_items = copy.deepcopy(toc_items)
+                _attach_chapter_analyses(
+                    partial_toc_items,
+                    sorted(completed_evaluations, key=lambda x: x.get('index', 0)),
+                    fill_missing=False,
+                )
+                partial_callback(partial_toc_items)
+        
+        chapter_evaluations, overall_evaluation, paper_scores = evaluate_paper(
+            chapters, model_name, journal,
+            max_workers=max_workers,
+            progress_callback=(
+                (lambda completed, total, text: progress_callback(completed / total, text))
+                if progress_callback else None
+            ),
+            chapter_callback=chapter_callback,
+        )
         
         # 合并所有评估结果（将整体评估放在首位）
         all_evaluations = [overall_evaluation] + chapter_evaluations
         
-        # 进行论文评分
-        paper_scores = score_paper(all_evaluations, model_name)
-        
         # 整合评估结果和目录结构
         if toc_items:
-            for chapter in toc_items:
-                chapter_title = chapter.get('text', '')
-                # 查找匹配的评估结果
-                matching_eval = None
-                for eval_item in all_evaluations:
-                    # 跳过整体评估
-                    if eval_item.get('chapter') == "全篇" or eval_item.get('index') == 0:
-                        continue
-                        
-                    # 寻找匹配的章节标题
-                    if chapter_title.lower() in eval_item.get('chapter', '').lower() or \
-                       eval_item.get('chapter', '').lower() in chapter_title.lower():
-                        matching_eval = eval_item
-                        break
-                
-                # 如果找到匹配的评估，添加到章节信息中
-                if matching_eval:
-                    chapter['analysis'] = {
-                        "summary": matching_eval.get('summary', ''),
-                        "strengths": matching_eval.get('strengths', []),
-                        "weaknesses": matching_eval.get('weaknesses', []),
-                        "suggestions": matching_eval.get('suggestions', [])
-                    }
-                else:
-                    # 未找到匹配的评估，添加空评估
-                    chapter['analysis'] = {
-                        "summary": f"本章节主要讨论{chapter_title}相关内容。",
-                        "strengths": [],
-                        "weaknesses": [],
-                        "suggestions": []
-                    }
-                    
-                # 递归处理子章节
-                if 'children' in chapter and chapter['children']:
-                    for child in chapter['children']:
-                        child_title = child.get('text', '')
-                        # 查找匹配的评估结果
-                        matching_child_eval = None
-                        for eval_item in all_evaluations:
-                            if eval_item.get('chapter') == "全篇" or eval_item.get('index') == 0:
-                                continue
-                            if child_title.lower() in eval_item.get('chapter', '').lower() or \
-                               eval_item.get('chapter', '').lower() in child_title.lower():
-                                matching_child_eval = eval_item
-                                break
-                                
-                        # 添加评估
-                        if matching_child_eval:
-                            child['analysis'] = {
-                                "summary": matching_child_eval.get('summary', ''),
-                                "strengths": matching_child_eval.get('strengths', []),
-                                "weaknesses": matching_child_eval.get('weaknesses', []),
-                                "suggestions": matching_child_eval.get('suggestions', [])
-                            }
-                        else:
-                            child['analysis'] = {
-                                "summary": f"本小节主要讨论{child_title}相关内容。",
-                                "strengths": [],
-                                "weaknesses": [],
-                                "suggestions": []
-                            }
+            _attach_chapter_analyses(toc_items, all_evaluations)
+        
+        # 所有章节、整体评估与评分均成功时结果才可缓存，失败的单元下次上传时重新评估
+        complete = (
+            not any('error' in evaluation for evaluation in all_evaluations)
+            and paper_scores != DEFAULT_PAPER_SCORES
+        )
         
         # 构建最终结果
         result = {
+            "complete": complete,
             "toc_items": toc_items,
             "overall_scores": paper_scores,
             "paper_summary": {
@@ -633,7 +771,7 @@ def process_paper_evaluation(input_file_path: str,
         traceback.print_exc()
         return {"error": f"评估过程出错: {str(e)}"}
 
-def simulate_analysis_with_toc(uploaded_file, progress_callback=None):
+def simulate_analysis_with_toc(uploaded_file, progress_callback=None, partial_callback=None, model_name="deepseek-chat"):
     """
     分析文档并生成结构化的分析结果，包括目录结构和评估结果。
     这个函数会调用 process_paper_evaluation 进行实际的评估。
@@ -641,16 +779,30 @@ def simulate_analysis_with_toc(uploaded_file, progress_callback=None):
     Args:
         uploaded_file: Streamlit上传的文件对象
         progress_callback: 进度回调函数，接受(current_progress, message)两个参数
+        partial_callback: 部分结果回调函数，接受目录项列表；提取目录后立即回调一次，此后每个章节评估完成时回调
+        model_name: 使用的模型名称
         
     Returns:
         Dict[str, Any]: 包含完整评估结果的字典
     """
     temp_path = None
+    # 同一份文件已完整评估过时直接返回缓存的结果，不再发起模型请求
+    sha256 = artifact_cache.content_hash(uploaded_file.getvalue())
+    cache_kind = f"analysis:{model_name}"
+    cached = artifact_cache.lookup(sha256, cache_kind)
+    if cached:
+        if progress_callback:
+            progress_callback(1.0, "已载入缓存的评估结果")
+        return cached
+    
     try:
         # 首先提取目录结构
         if progress_callback:
             progress_callback(0.05, "正在提取文档目录结构...")
+        document = load_document_ir(uploaded_file)
         toc_items = extract_toc_from_docx(uploaded_file)
+        if partial_callback:
+            partial_callback(toc_items)
         
         # 在临时目录保存上传的文件
         if progress_callback:
@@ -659,36 +811,19 @@ def simulate_analysis_with_toc(uploaded_file, progress_callback=None):
             temp_file.write(uploaded_file.getvalue())
             temp_path = temp_file.name
         
-        # 模拟评估过程的不同阶段
         if progress_callback:
-            progress_callback(0.15, "开始章节内容分析...")
-            
-        # 获取章节数量用于计算进度
-        chapter_count = len(toc_items)
-        base_progress = 0.15
-        chapter_progress = 0.60 / max(chapter_count, 1)  # 章节分析总共占60%的进度
-        
-        # 模拟对每个章节的处理
-        for i, chapter in enumerate(toc_items):
-            chapter_title = chapter.get('text', f"章节 {i+1}")
-            if progress_callback:
-                current_progress = base_progress + (i * chapter_progress)
-                progress_callback(current_progress, f"正在分析: {chapter_title}...")
-                # 模拟章节分析过程
-                time.sleep(0.5)
-        
-        if progress_callback:
-            progress_callback(0.75, "正在进行整体内容评估...")
-            time.sleep(1.5)  # 模拟整体评估过程
-            
-            progress_callback(0.85, "正在计算学术维度得分...")
-            time.sleep(1.0)  # 模拟计算得分过程
-            
-            progress_callback(0.95, "正在整合分析结果...")
+            progress_callback(0.15, "正在进行论文评估...")
         
         # 使用临时文件路径进行评估
         logger.info(f"使用文件 {temp_path} 进行论文评估")
-        result = process_paper_evaluation(temp_path, toc_items)
+        result = process_paper_evaluation(
+            temp_path, toc_items, model_name=model_name, document=document,
+            progress_callback=(
+                (lambda prog, text: progress_callback(0.15 + prog * 0.80, text))
+                if progress_callback else None
+            ),
+            partial_callback=partial_callback,
+        )
         
         # 检查是否有错误
         if 'error' in result:
@@ -705,11 +840,16 @@ def simulate_analysis_with_toc(uploaded_file, progress_callback=None):
         if progress_callback:
             progress_callback(1.0, "评估完成！")
             
-        return {
+        analysis_result = {
             'chapters': toc_items,
             'overall_scores': result.get('overall_scores', []),
             'paper_summary': result.get('paper_summary', {})
         }
+        if result.get('complete'):
+            artifact_cache.store(sha256, cache_kind, analysis_result)
+            # 完整结果已缓存，断点日志不再需要
+            _remove_evaluation_journal(temp_path, model_name)
+        return analysis_result
     except Exception as e:
         logger.info(f"分析文档时出错: {e}")
         traceback.print_exc()
@@ -1,19 +1,24 @@
 """
 DOCX to HTML converter with math formula support
 This module converts Microsoft Word documents (.docx) to HTML with MathJax for formula rendering.
+Rendering is a pass over the shared document IR (backend/hard_criteria/tools/docx_tools/docx_ir.py),
+so an upload that is already parsed is not parsed again.
 """
 
+import base64
 import os
 import re
-import docx
-from docx.document import Document as _Document
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
-from docx.table import _Cell, Table
-from docx.text.paragraph import Paragraph
-from lxml import etree
+import sys
 from html import escape
-from frontend.services.omml_to_latex import OmmlToLatexConverter
+
+# 文档IR与后端 docx_tools 共用
+_BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            "backend", "hard_criteria")
+if _BACKEND_DIR not in sys.path:
+    sys.path.insert(0, _BACKEND_DIR)
+
+from tools.docx_tools.docx_ir import ImageRef, MathInline, ParagraphBlock, TableBlock, TextRun, parse_docx
+from tools.docx_tools.image_store import ImageStore
 
 # 导入自定义日志模块
 from frontend.utils.logger_setup import get_module_logger
@@ -21,6 +26,63 @@ from frontend.utils.logger_setup import get_module_logger
 # 创建当前模块的logger
 logger = get_module_logger(__name__)
 
+MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.svg': 'image/svg+xml',
+    '.webp': 'image/webp'
+}
+
+# Map common Word styles to HTML elements
+STYLE_MAPPING = {
+    "heading 1": "h1",
+    "heading 2": "h2",
+    "heading 3": "h3",
+    "heading 4": "h4",
+    "heading 5": "h5",
+    "heading 6": "h6",
+    "title": "h1",
+    "subtitle": "h2",
+}
+
+
+def image_data_uri(image):
+    """
+    Encode an image from the document IR as a data URI.
+    
+    Args:
+        image (ImageResource): Image from DocumentIR.images.
+        
+    Returns:
+        str: data URI that can be used as an <img> src.
+    """
+    mime_type = MIME_TYPES.get(image.ext.lower(), 'image/png')
+    return f"data:{mime_type};base64,{base64.b64encode(image.blob).decode('utf-8')}"
+
+
+def memoize_image_src(image_src):
+    """
+    Wrap an image_src callable so each distinct image is encoded or saved only once.
+    
+    Args:
+        image_src (callable): Maps an ImageResource to an <img> src.
+        
+    Returns:
+        callable: Same mapping, cached by the image's content hash.
+    """
+    sources = {}
+    
+    def cached_image_src(image):
+        if image.sha256 not in sources:
+            sources[image.sha256] = image_src(image)
+        return sources[image.sha256]
+    
+    return cached_image_src
+
+
 class Docx2HtmlConverter:
     """Converter class for DOCX to HTML transformation with math formula support."""
     
@@ -32,20 +94,12 @@ class Docx2HtmlConverter:
             mathjax_url (str): URL to the MathJax library for rendering formulas.
         """
         self.mathjax_url = mathjax_url
-        self.omml_converter = OmmlToLatexConverter()
-        # OMML namespace for finding math elements
-        self.ns_math = '{http://schemas.openxmlformats.org/officeDocument/2006/math}'
-        self.ns_w = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
-        self.ns_r = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
-        self.ns_a = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
         # Statistics counter
         self.stats = {
             'images': 0,
             'inline_math': 0,
             'display_math': 0
         }
-        # Set to track processed image IDs to avoid duplicates
-        self.processed_image_ids = set()
     
     def convert_docx_to_html(self, docx_path, output_path=None, title=None, include_images=True):
         """
@@ -56,6 +110,7 @@ class Docx2HtmlConverter:
             output_path (str, optional): Path for the output HTML file. If None, uses the same path as docx_path but with .html extension.
             title (str, optional): Title for the HTML document. If None, uses the filename.
             include_images (bool): Whether to extract and include images from the DOCX file.
+                Images are stored once per distinct content under <output>_images.
             
         Returns:
             str: Path to the generated HTML file.
@@ -66,44 +121,16 @@ class Docx2HtmlConverter:
         if title is None:
             title = os.path.basename(os.path.splitext(docx_path)[0])
         
-        # Load the document
-        doc = docx.Document(docx_path)
-        
-        # Start building HTML content
-        html_content = []
-        
-        # Reset statistics and processed image IDs
-        self.stats = {
-            'images': 0,
-            'inline_math': 0,
-            'display_math': 0
-        }
-        self.processed_image_ids = set()
-        
         # Extract and save images if requested
-        image_dir = None
+        image_src = None
         if include_images:
-            image_dir = os.path.splitext(output_path)[0] + '_images'
-            os.makedirs(image_dir, exist_ok=True)
-        
-        # Build a map of relationship IDs to relationships
-        relationship_map = {}
-        for rel_id, rel in doc.part.rels.items():
-            relationship_map[rel_id] = rel
-        
-        # Process document blocks (paragraphs and tables) in order using the same iterator as docx2md
-        for block in self._iter_block_items(doc):
-            if isinstance(block, Paragraph):
-                html_para = self._convert_paragraph_to_html_improved(block, image_dir, relationship_map)
-                if html_para:
-                    html_content.append(html_para)
-            elif isinstance(block, Table):
-                html_table = self._convert_table_to_html(block, image_dir, relationship_map)
-                if html_table:
-                    html_content.append(html_table)
+            image_store = ImageStore(os.path.splitext(output_path)[0] + '_images')
+            html_dir = os.path.dirname(os.path.abspath(output_path))
+            
+            def image_src(image):
+                return self._save_image(image, image_store, html_dir)
         
-        # Generate the final HTML document
-        html_doc = self._create_html_document(title, '\n'.join(html_content))
+        html_doc = self.convert_document_to_html(parse_docx(docx_path), title, image_src)
         
         # Write the HTML file
         with open(output_path, 'w', encoding='utf-8') as f:
@@ -111,257 +138,159 @@ class Docx2HtmlConverter:
         
         return output_path
 
-    def _iter_block_items(self, parent):
-        """
-        Generator to iterate through all block items (paragraphs and tables) in order.
-        This ensures we process elements in the same order as they appear in the document.
+    def convert_document_to_html(self, document, title, image_src=image_data_uri):
         """
-        if isinstance(parent, _Document):
-            parent_elm = parent.element.body
-        elif isinstance(parent, _Cell):
-            parent_elm = parent._tc
-        else:
-            raise ValueError("Expected a Document or a Cell")
+        Render an already parsed document IR as a complete HTML document.
+        
+        Args:
+            document (DocumentIR): Parsed document from docx_ir.parse_docx.
+            title (str): Title for the HTML document.
+            image_src (callable, optional): Maps an ImageResource to an <img> src.
+                Defaults to embedding the image as a data URI; None skips images.
+                Called once per distinct image, however often it is referenced.
             
-        for child in parent_elm.iterchildren():
-            if isinstance(child, CT_P):
-                yield Paragraph(child, parent)
-            elif isinstance(child, CT_Tbl):
-                yield Table(child, parent)
-
-    def _find_omath_elements(self, element):
-        """Find all oMath elements in the given XML element."""
-        if hasattr(element, 'iter'):
-            return [e for e in element.iter() if e.tag == f"{self.ns_math}oMath"]
-        return []
+        Returns:
+            str: Complete HTML document.
+        """
+        return self.wrap_html_document(title, self.convert_document_to_body(document, image_src))
     
-    def _find_drawing_elements(self, element):
-        """Find all drawing elements in the given XML element."""
-        if hasattr(element, 'iter'):
-            return [e for e in element.iter() if e.tag == f"{self.ns_w}drawing"]
-        return []
+    def convert_document_to_body(self, document, image_src=image_data_uri):
+        """
+        Render the blocks of a parsed document IR without the surrounding page.
+        
+        The body depends only on the document content and image_src, so it can be
+        cached by content hash and wrapped with any title via wrap_html_document.
+        
+        Args:
+            document (DocumentIR): Parsed document from docx_ir.parse_docx.
+            image_src (callable, optional): Same as in convert_document_to_html.
+            
+        Returns:
+            str: HTML fragment with one element per paragraph or table.
+        """
+        # Reset statistics
+        self.stats = {
+            'images': 0,
+            'inline_math': 0,
+            'display_math': 0
+        }
+        if image_src is not None:
+            image_src = memoize_image_src(image_src)
+        
+        html_content = []
+        # Process document blocks (paragraphs and tables) in order
+        for block in document.blocks:
+            if isinstance(block, ParagraphBlock):
+                html_para = self._convert_paragraph_to_html(block, document, image_src)
+                if html_para:
+                    html_content.append(html_para)
+            elif isinstance(block, TableBlock):
+                html_table = self._convert_table_to_html(block, document, image_src)
+                if html_table:
+                    html_content.append(html_table)
+        return '\n'.join(html_content)
     
-    def _find_blip_elements(self, element):
-        """Find all blip elements (images) in the given XML element."""
-        if hasattr(element, 'iter'):
-            return [e for e in element.iter() if e.tag == f"{self.ns_a}blip"]
-        return []
-        
-    def _find_embedded_image_ids(self, element):
-        """Find embedded image IDs in an element."""
-        image_ids = []
-        
-        for child in element.iter():
-            if child.tag.endswith('}drawing'):
-                # Look for blip elements that contain image references
-                for subchild in child.iter():
-                    if subchild.tag.endswith('}blip'):
-                        # Get the embed attribute which is the relationship ID
-                        for key, value in subchild.attrib.items():
-                            if key.endswith('}embed'):
-                                image_ids.append(value)
-        
-        return image_ids
+    def wrap_html_document(self, title, content):
+        """
+        Wrap rendered body content into a complete HTML document.
+        
+        Args:
+            title (str): Title for the HTML document.
+            content (str): HTML body from convert_document_to_body.
+            
+        Returns:
+            str: Complete HTML document.
+        """
+        return self._create_html_document(title, content)
     
-    def _convert_paragraph_to_html_improved(self, paragraph, image_dir, relationship_map):
+    def _convert_paragraph_to_html(self, paragraph, document, image_src):
         """
-        Convert a docx paragraph to HTML with improved ordering of elements.
+        Convert a paragraph from the document IR to HTML.
         
         Args:
-            paragraph: A docx paragraph object.
-            image_dir (str): Directory to save extracted images.
-            relationship_map (dict): Map of relationship IDs to relationships.
+            paragraph (ParagraphBlock): Paragraph from the document IR.
+            document (DocumentIR): Document the paragraph belongs to.
+            image_src (callable): Maps an ImageResource to an <img> src, or None.
             
         Returns:
             str: HTML representation of the paragraph.
         """
         # Skip empty paragraphs with no special elements
-        if not paragraph.text.strip() and not self._has_math_or_images(paragraph):
+        if not paragraph.text.strip() and not paragraph.has_math_or_images:
             return ""
         
-        # Determine paragraph style for HTML mapping
-        style_name = paragraph.style.name.lower() if paragraph.style.name else "normal"
-        
-        # Map common Word styles to HTML elements
-        style_mapping = {
-            "heading 1": "h1",
-            "heading 2": "h2",
-            "heading 3": "h3",
-            "heading 4": "h4",
-            "heading 5": "h5",
-            "heading 6": "h6",
-            "title": "h1",
-            "subtitle": "h2",
-        }
-        
-        html_tag = style_mapping.get(style_name, "p")
+        html_tag = STYLE_MAPPING.get(paragraph.style_name.lower() or "normal", "p")
         
         # For heading styles, use a simplified approach
         if html_tag.startswith('h') and paragraph.text.strip():
             return f"<{html_tag}>{escape(paragraph.text.strip())}</{html_tag}>"
         
-        # Process the paragraph element recursively to maintain proper order
-        content = self._process_paragraph_element_recursively(paragraph._element, image_dir, relationship_map)
+        result_parts = []
+        for inline in paragraph.inlines:
+            if isinstance(inline, TextRun):
+                result_parts.append(self._format_text_run(inline))
+            elif isinstance(inline, MathInline):
+                math_html = self._convert_math_to_html(inline)
+                if math_html:
+                    result_parts.append(math_html)
+            elif isinstance(inline, ImageRef) and image_src and inline.rel_id in document.images:
+                src = image_src(document.images[inline.rel_id])
+                if src:
+                    result_parts.append(f'<img src="{src}" alt="Image" />')
+                    self.stats['images'] += 1
         
         # Wrap the content with the appropriate HTML tag if not empty
+        content = ''.join(result_parts)
         if content:
             return f"<{html_tag}>{content}</{html_tag}>"
         else:
             return ""
     
-    def _process_paragraph_element_recursively(self, element, image_dir, relationship_map):
+    def _format_text_run(self, run):
         """
-        Process paragraph element recursively, maintaining the proper order of text, math, and images.
+        Apply run formatting to a text fragment.
         
         Args:
-            element: XML element to process.
-            image_dir (str): Directory to save images.
-            relationship_map (dict): Map of relationship IDs to relationships.
+            run (TextRun): Text run from the document IR.
             
         Returns:
-            str: HTML content with properly ordered elements.
+            str: Escaped HTML for the run.
         """
-        result_parts = []
-        
-        # 处理段落级别的图片，确保不在运行级别重复处理
-        # 我们只处理直接属于段落的图片，而不是嵌套在run中的图片
-        # 这样可以避免重复处理同一图片
-        if element.tag.endswith('}p'):  # 只在段落元素上处理图片
-            for child in element:
-                # 只检查段落的直接子元素中的图片
-                if child.tag.endswith('}r'):
-                    continue  # 跳过运行元素，这些将在 _process_run_element 中处理
-                    
-                image_ids = self._find_embedded_image_ids(child)
-                for image_id in image_ids:
-                    if image_id not in self.processed_image_ids and image_id in relationship_map:
-                        rel = relationship_map[image_id]
-                        image_filename = self._save_image(rel, image_dir, image_id)
-                        if image_filename:
-                            img_rel_path = f"{os.path.basename(image_dir)}/{image_filename}"
-                            result_parts.append(f'<img src="{img_rel_path}" alt="Image" />')
-                            self.stats['images'] += 1
-                            self.processed_image_ids.add(image_id)
-        
-        # Process all child elements in order
-        for child in element:
-            tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-            
-            if tag == 'r':  # Run element
-                run_content = self._process_run_element(child, image_dir, relationship_map)
-                if run_content:
-                    result_parts.append(run_content)
-                    
-            elif tag == 'oMath':  # Math element
-                latex_formula = self.omml_converter.omml_to_latex(child)
-                if latex_formula and latex_formula != "[Math Formula]":
-                    # 预处理LaTeX公式，确保大括号和特殊符号正确处理
-                    latex_formula = self._preprocess_latex(latex_formula)
-                    
-                    # Determine if it's inline or display math
-                    if '\n' in latex_formula or latex_formula.strip().startswith('\\begin{') or len(latex_formula) > 50 or \
-                       any(cmd in latex_formula for cmd in ['\\frac', '\\sum', '\\int', '\\prod']):
-                        # Display math
-                        math_html = f"\\[{latex_formula}\\]"
-                        self.stats['display_math'] += 1
-                    else:
-                        # Inline math
-                        math_html = f"\\({latex_formula}\\)"
-                        self.stats['inline_math'] += 1
-                    
-                    result_parts.append(math_html)
-                    
-            else:
-                # Recursively process other elements
-                child_content = self._process_paragraph_element_recursively(child, image_dir, relationship_map)
-                if child_content:
-                    result_parts.append(child_content)
-        
-        return ''.join(result_parts)
+        content = escape(run.text)
+        if run.bold:
+            content = f"<strong>{content}</strong>"
+        if run.italic:
+            content = f"<em>{content}</em>"
+        if run.underline:
+            content = f"<u>{content}</u>"
+        if run.strike:
+            content = f"<s>{content}</s>"
+        if run.vert_align == 'superscript':
+            content = f"<sup>{content}</sup>"
+        elif run.vert_align == 'subscript':
+            content = f"<sub>{content}</sub>"
+        return content
     
-    def _process_run_element(self, run_element, image_dir, relationship_map):
+    def _convert_math_to_html(self, math):
         """
-        Process a run element to extract text, math, and images in proper order.
+        Convert a formula to MathJax markup.
         
         Args:
-            run_element: XML element representing a run.
-            image_dir (str): Directory to save images.
-            relationship_map (dict): Map of relationship IDs to relationships.
+            math (MathInline): Formula from the document IR.
             
         Returns:
-            str: HTML representation of the run content.
+            str: MathJax delimited LaTeX, or an empty string if conversion failed.
         """
-        result_parts = []
-        
-        # 只处理尚未处理过的图片
-        image_ids = self._find_embedded_image_ids(run_element)
-        for image_id in image_ids:
-            # 检查图片ID是否已处理过
-            if image_id not in self.processed_image_ids and image_id in relationship_map:
-                rel = relationship_map[image_id]
-                image_filename = self._save_image(rel, image_dir, image_id)
-                if image_filename:
-                    img_rel_path = f"{os.path.basename(image_dir)}/{image_filename}"
-                    result_parts.append(f'<img src="{img_rel_path}" alt="Image" />')
-                    self.stats['images'] += 1
-                    self.processed_image_ids.add(image_id)  # 标记图片ID为已处理
+        if not math.valid:
+            return ""
+        # 预处理LaTeX公式，确保大括号和特殊符号正确处理
+        latex_formula = self._preprocess_latex(math.latex)
         
-        # Process all child elements in order
-        for child in run_element:
-            tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-            
-            if tag == 't':  # Text element
-                if child.text:
-                    # Apply text formatting
-                    content = escape(child.text)
-                    
-                    # Get the run properties (rPr) to determine formatting
-                    run_props = run_element.find('.//{' + self.ns_w + '}rPr')
-                    if run_props is not None:
-                        # Bold
-                        if run_props.find('.//{' + self.ns_w + '}b') is not None:
-                            content = f"<strong>{content}</strong>"
-                        
-                        # Italic
-                        if run_props.find('.//{' + self.ns_w + '}i') is not None:
-                            content = f"<em>{content}</em>"
-                        
-                        # Underline
-                        if run_props.find('.//{' + self.ns_w + '}u') is not None:
-                            content = f"<u>{content}</u>"
-                        
-                        # Strike
-                        if run_props.find('.//{' + self.ns_w + '}strike') is not None:
-                            content = f"<s>{content}</s>"
-                        
-                        # Superscript
-                        if run_props.find('.//{' + self.ns_w + '}vertAlign[@w:val="superscript"]') is not None:
-                            content = f"<sup>{content}</sup>"
-                        
-                        # Subscript
-                        if run_props.find('.//{' + self.ns_w + '}vertAlign[@w:val="subscript"]') is not None:
-                            content = f"<sub>{content}</sub>"
-                    
-                    result_parts.append(content)
-                    
-            elif tag == 'oMath':  # Math element in run
-                latex_formula = self.omml_converter.omml_to_latex(child)
-                if latex_formula and latex_formula != "[Math Formula]":
-                    # 预处理LaTeX公式，确保大括号和特殊符号正确处理
-                    latex_formula = self._preprocess_latex(latex_formula)
-                    
-                    # For math in runs, generally use inline format
-                    math_html = f"\\({latex_formula}\\)"
-                    self.stats['inline_math'] += 1
-                    result_parts.append(math_html)
-                    
-            else:
-                # Recursively process other elements
-                child_content = self._process_run_element(child, image_dir, relationship_map)
-                if child_content:
-                    result_parts.append(child_content)
-        
-        return ''.join(result_parts)
+        # For math in runs, generally use inline format
+        if math.in_run:
+            self.stats['inline_math'] += 1
+            return f"\\({latex_formula}\\)"
+        return self._wrap_latex_in_mathjax(latex_formula)
     
     def _preprocess_latex(self, latex):
         """
@@ -438,57 +367,33 @@ class Docx2HtmlConverter:
             
         return processed_latex
     
-    def _save_image(self, rel, image_dir, image_id):
+    def _save_image(self, image, image_store, html_dir):
         """
-        Save image from relationship and return the filename.
+        Store an image from the document IR and return its src relative to the HTML file.
         
         Args:
-            rel: Relationship object containing the image.
-            image_dir (str): Directory to save the image.
-            image_id (str): Unique ID for the image.
+            image (ImageResource): Image from DocumentIR.images.
+            image_store (ImageStore): Content-addressed store the image is written to.
+            html_dir (str): Directory of the HTML file.
             
         Returns:
-            str: Filename of the saved image.
+            str: Relative path of the stored image, or None on failure.
         """
         try:
-            image_bytes = rel.target_part.blob
-            image_ext = os.path.splitext(rel.target_ref)[-1]
-            if not image_ext:
-                image_ext = '.png'  # Default extension if none found
-                
-            image_filename = f"image_{image_id}{image_ext}"
-            image_path = os.path.join(image_dir, image_filename)
-            
-            with open(image_path, 'wb') as f:
-                f.write(image_bytes)
-                
-            return image_filename
+            path = image_store.materialize(image)
+            return os.path.relpath(path, html_dir).replace(os.sep, '/')
         except Exception as e:
             logger.error(f"Error extracting image: {e}")
             return None
     
-    def _has_math_or_images(self, paragraph):
-        """Check if a paragraph contains math elements or images."""
-        # Check for math elements
-        math_elements = self._find_omath_elements(paragraph._element)
-        if math_elements:
-            return True
-        
-        # Check for images
-        drawing_elements = self._find_drawing_elements(paragraph._element)
-        if drawing_elements:
-            return True
-        
-        return False
-    
-    def _convert_table_to_html(self, table, image_dir=None, relationship_map=None):
+    def _convert_table_to_html(self, table, document, image_src):
         """
-        Convert a docx table to HTML, preserving content order.
+        Convert a table from the document IR to HTML, preserving content order.
         
         Args:
-            table: A docx table object.
-            image_dir (str, optional): Directory to save extracted images.
-            relationship_map (dict, optional): Map of relationship IDs to relationships.
+            table (TableBlock): Table from the document IR.
+            document (DocumentIR): Document the table belongs to.
+            image_src (callable): Maps an ImageResource to an <img> src, or None.
             
         Returns:
             str: HTML representation of the table.
@@ -498,12 +403,12 @@ class Docx2HtmlConverter:
         for row in table.rows:
             html_cells = []
             
-            for cell in row.cells:
+            for cell in row:
                 cell_content = []
                 
-                # Process each paragraph in the cell using our improved conversion
+                # Process each paragraph in the cell
                 for paragraph in cell.paragraphs:
-                    para_html = self._convert_paragraph_to_html_improved(paragraph, image_dir, relationship_map)
+                    para_html = self._convert_paragraph_to_html(paragraph, document, image_src)
                     if para_html:
                         # Remove the paragraph tags for better table formatting
                         para_html = para_html.replace('<p>', '').replace('</p>', '<br/>')
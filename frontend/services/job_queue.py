@@ -0,0 +1,318 @@
+"""
+后台任务队列
+上传的论文以任务的形式提交到进程内的线程池，由工作线程完成 HTML 预览、目录提取与论文评估，
+Streamlit 页面只负责提交任务与轮询状态，不在脚本线程中执行耗时数分钟的评估：
+- 并发上传共用一个大小固定的线程池（PAPER_EVAL_JOB_WORKERS，默认 4），超出的任务排队等待；
+- 任务状态、进度与结果保存在 SQLite（data/cache/jobs.sqlite3），页面刷新或浏览器重连后按任务ID重新关联，
+  不会重新开始评估；
+- 同一份文件（按内容 sha256）已有排队或执行中的任务时直接复用该任务；
+- 任务执行中陆续发布部分结果（文档预览 word_html、带有已完成章节评估的目录 toc_items），
+  结果页面无需等待整体评估与评分即可逐章展示。
+
+服务进程重启后，上一个进程遗留的排队、执行中任务标记为失败；重新提交时评估断点日志会跳过已完成的章节。
+
+使用方法：
+    from frontend.services.job_queue import submit_paper_job, get_job
+
+    job_id = submit_paper_job(uploaded_file.name, uploaded_file.getvalue())
+    job = get_job(job_id)      # {'status': 'running', 'progress': 0.4, 'message': ..., 'result': ...}
+    toc_items = get_job_part(job_id, 'toc_items')
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from frontend.utils.logger_setup import get_module_logger
+
+logger = get_module_logger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+JOB_DB_PATH = os.getenv("PAPER_EVAL_JOB_DB") or os.path.join(_APP_DIR, 'data', 'cache', 'jobs.sqlite3')
+# 同时执行的任务数
+JOB_WORKERS = int(os.getenv("PAPER_EVAL_JOB_WORKERS") or 4)
+# 已结束的任务保留天数
+JOB_RETENTION_DAYS = 7
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_sha256 TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    owner TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_sha256 ON jobs(file_sha256, status);
+CREATE TABLE IF NOT EXISTS job_parts (
+    job_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, key)
+);
+"""
+
+# 当前服务进程的标识，用于识别上一个进程遗留的任务
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class UploadedBytes(io.BytesIO):
+    """与 Streamlit UploadedFile 接口一致的内存文件，供工作线程复用文档处理函数"""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+    def getvalue(self) -> bytes:
+        return super().getvalue()
+
+
+class JobStore:
+    """SQLite 中的任务表，每个线程使用独立的连接"""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        """
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接，首次使用时创建"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind: str, file_name: str, file_sha256: str) -> str:
+        """
+        新建排队中的任务
+
+        Returns:
+            str: 任务ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, file_name, file_sha256, status, owner, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, file_name, file_sha256, QUEUED, _OWNER, now, now),
+            )
+        return job_id
+
+    def find_active(self, kind: str, file_sha256: str) -> Optional[str]:
+        """查找同一份文件排队或执行中的任务"""
+        row = self._connect().execute(
+            f"SELECT id FROM jobs WHERE kind = ? AND file_sha256 = ? AND owner = ? "
+            f"AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) ORDER BY created_at DESC LIMIT 1",
+            (kind, file_sha256, _OWNER, *ACTIVE_STATUSES),
+        ).fetchone()
+        return row['id'] if row else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """
+        更新任务字段，result 会被序列化为 JSON
+
+        Args:
+            job_id: 任务ID
+            fields: status、progress、message、result、error
+        """
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False, default=str)
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        with self._connect() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取任务
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务字段，result 已反序列化；任务不存在时返回 None
+        """
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def put_part(self, job_id: str, key: str, value: Any) -> None:
+        """
+        发布或覆盖任务的一项部分结果
+
+        Args:
+            job_id: 任务ID
+            key: 部分结果名称
+            value: 可序列化为 JSON 的值
+        """
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO job_parts (job_id, key, value, updated_at) VALUES (?, ?, ?, ?)',
+                (job_id, key, json.dumps(value, ensure_ascii=False, default=str), time.time()),
+            )
+
+    def get_part(self, job_id: str, key: str) -> Any:
+        """
+        读取任务的一项部分结果
+
+        Returns:
+            Any: 部分结果，尚未发布时返回 None
+        """
+        row = self._connect().execute(
+            'SELECT value FROM job_parts WHERE job_id = ? AND key = ?', (job_id, key)
+        ).fetchone()
+        return json.loads(row['value']) if row else None
+
+    def recover(self) -> None:
+        """将上一个服务进程遗留的排队、执行中任务标记为失败，并清理过期的已结束任务"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE owner != ? "
+                f"AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+                (FAILED, "服务已重启，任务中断，请重新提交", now, _OWNER, *ACTIVE_STATUSES),
+            )
+            conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                (SUCCEEDED, FAILED, now - JOB_RETENTION_DAYS * 86400),
+            )
+            conn.execute('DELETE FROM job_parts WHERE job_id NOT IN (SELECT id FROM jobs)')
+
+
+_store = JobStore()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取任务线程池，首次使用时恢复遗留任务并创建线程池"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _store.recover()
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='paper-job')
+        return _executor
+
+
+def _run_job(job_id: str, handler: Callable[..., Any]) -> None:
+    """
+    在工作线程中执行任务，进度、部分结果与最终结果写入任务表
+
+    Args:
+        job_id: 任务ID
+        handler: 任务函数，调用方式为 handler(report, publish)，
+            report(progress, message) 更新进度，publish(key, value) 发布部分结果
+    """
+    def report(progress: float, message: str) -> None:
+        _store.update(job_id, progress=min(max(progress, 0.0), 1.0), message=message)
+
+    def publish(key: str, value: Any) -> None:
+        _store.put_part(job_id, key, value)
+
+    try:
+        _store.update(job_id, status=RUNNING, message="任务开始执行...")
+        result = handler(report, publish)
+        _store.update(job_id, status=SUCCEEDED, progress=1.0, message="处理完成！", result=result)
+    except Exception as e:
+        logger.exception(f"任务 {job_id} 执行失败")
+        _store.update(job_id, status=FAILED, error=str(e))
+
+
+def _process_paper(file_name: str, data: bytes, report: Callable[[float, str], None],
+                   publish: Callable[[str, Any], None]) -> Dict[str, Any]:
+    """论文处理任务：生成HTML预览并评估论文，预览与逐章评估结果作为部分结果发布"""
+    from .document_processor import convert_word_to_html_with_math, simulate_analysis_with_toc
+
+    report(0.02, "正在生成文档预览...")
+    publish('word_html', convert_word_to_html_with_math(UploadedBytes(file_name, data)))
+
+    report(0.05, "文档预处理完成，准备开始评估...")
+    analysis_result = simulate_analysis_with_toc(
+        UploadedBytes(file_name, data),
+        progress_callback=lambda prog, text: report(0.05 + prog * 0.95, text),
+        partial_callback=lambda toc_items: publish('toc_items', toc_items),
+    )
+    return {'analysis_result': analysis_result}
+
+
+def submit_paper_job(file_name: str, data: bytes) -> str:
+    """
+    提交论文处理任务；同一份文件已有排队或执行中的任务时返回该任务
+
+    Args:
+        file_name: 上传的文件名
+        data: 文件内容
+
+    Returns:
+        str: 任务ID
+    """
+    executor = _get_executor()
+    file_sha256 = hashlib.sha256(data).hexdigest()
+    with _executor_lock:
+        job_id = _store.find_active('paper', file_sha256)
+        if job_id:
+            logger.info(f"复用进行中的任务 {job_id}: {file_name}")
+            return job_id
+        job_id = _store.create('paper', file_name, file_sha256)
+    executor.submit(_run_job, job_id, lambda report, publish: _process_paper(file_name, data, report, publish))
+    logger.info(f"已提交任务 {job_id}: {file_name}")
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    读取任务状态
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        Optional[Dict[str, Any]]: 包含 status、progress、message、result、error、file_name 等字段，
+        任务不存在时返回 None
+    """
+    _get_executor()
+    return _store.get(job_id)
+
+
+def get_job_part(job_id: str, key: str) -> Any:
+    """
+    读取任务已发布的部分结果
+
+    Args:
+        job_id: 任务ID
+        key: 部分结果名称，论文处理任务发布 'word_html' 与 'toc_items'
+
+    Returns:
+        Any: 部分结果，尚未发布时返回 None
+    """
+    _get_executor()
+    return _store.get_part(job_id, key)
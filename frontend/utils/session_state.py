@@ -30,6 +30,14 @@ def init_session_state():
     # 如果消息轮播器不存在，初始化为None
     if 'message_rotator' not in st.session_state:
         st.session_state.message_rotator = None
+    
+    # 后台任务ID与文件名，刷新页面后从URL中的任务ID重新关联到进行中的任务
+    if 'job_id' not in st.session_state:
+        st.session_state.job_id = st.query_params.get('job')
+        if st.session_state.job_id:
+            st.session_state.current_page = 'processing'
+    if 'file_name' not in st.session_state:
+        st.session_state.file_name = None
 
 def reset_session_state():
     """重置会话状态"""
@@ -39,6 +47,9 @@ def reset_session_state():
     st.session_state.toc_items = []
     st.session_state.analysis_results = []
     st.session_state.structured_content = None
+    st.session_state.job_id = None
+    st.session_state.file_name = None
+    st.query_params.clear()
     
     # 重置轮播相关状态
     if 'carousel_index' in st.session_state: